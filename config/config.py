@@ -15,14 +15,15 @@
 
 import os
 from pathlib import Path
-from dotenv import load_dotenv
 
-# Загружаем переменные окружения из .env файла
-load_dotenv()
+from src._env import init_env
+
+# Загружаем переменные окружения из .env файла (один раз на процесс)
+init_env()
 
 # region Константы проекта
 PROJECT_ROOT = Path(__file__).parent.parent
-DATABASE_PATH = PROJECT_ROOT / "english_learning.db"
+DATABASE_PATH = PROJECT_ROOT / "english_learning.db"  # Единственный источник пути к БД
 LOGS_PATH = PROJECT_ROOT / "logs"
 # endregion
 
@@ -33,7 +34,7 @@ TELEGRAM_USER_ID = os.getenv("TELEGRAM_USER_ID")  # ID пользователя
 
 # region Настройки OpenAI
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_MODEL = "gpt-4"  # Модель для анализа ответов
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")  # Модель для анализа ответов
 OPENAI_MAX_TOKENS = 1000
 # endregion
 
@@ -43,10 +44,6 @@ GOOGLE_SHEETS_SPREADSHEET_ID = os.getenv("GOOGLE_SHEETS_SPREADSHEET_ID")
 GOOGLE_SHEETS_RANGE = "english!A:E"  # Диапазон с данными (A-D: фразы, E: Progress)
 # endregion
 
-# region Настройки базы данных
-DATABASE_NAME = "english_learning.db"
-# endregion
-
 # region Настройки уведомлений
 NOTIFICATION_TIMES = ["08:00", "18:00"]  # Время отправки уведомлений
 SYNC_INTERVAL_HOURS = 24  # Интервал синхронизации с Google Sheets (часы)
@@ -56,27 +53,10 @@ SYNC_INTERVAL_HOURS = 24  # Интервал синхронизации с Googl
 MAX_SCORE = 3  # Максимальный балл для выученной фразы
 PARTIAL_SCORE = 0.5  # Балл за частично правильный ответ
 
-# Новая гибридная система баллов
-SCORE_LEVELS = {
-    0: "неправильно",
-    0.3: "почти неправильно", 
-    0.5: "частично правильно",
-    0.7: "почти правильно",
-    1: "правильно"
-}
-
 # Настройки прогресса изучения
 LEARNED_SCORE_THRESHOLD = 3.0  # Балл для считания фразы изученной
 PROGRESS_COLUMN_INDEX = 4  # Индекс столбца Progress в Google Sheets (E = 4)
-
-# Пороговые значения для нормализации score
-SCORE_THRESHOLDS = {
-    0: (0.0, 0.2),    # 0.0-0.2 → 0
-    0.3: (0.21, 0.4), # 0.21-0.4 → 0.3
-    0.5: (0.41, 0.6), # 0.41-0.6 → 0.5
-    0.7: (0.61, 0.8), # 0.61-0.8 → 0.7
-    1: (0.81, 1.0)    # 0.81-1.0 → 1
-}
+# Шкала AI-оценки ответов (SCORE_LEVELS) находится в src/scoring.py
 # endregion
 
 # region Настройки логирования
@@ -102,7 +82,7 @@ def validate_config():
         "GOOGLE_SHEETS_SPREADSHEET_ID"
     ]
     
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
+    missing_vars = [var for var in required_vars if not os.environ.get(var)]
     
     if missing_vars:
         raise ValueError(f"Отсутствуют обязательные переменные окружения: {', '.join(missing_vars)}")
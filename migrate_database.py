@@ -4,78 +4,144 @@
 
 import sqlite3
 import logging
-from pathlib import Path
+
+from config.config import DATABASE_PATH
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Столбцы с датами, которые раньше хранились строками CURRENT_TIMESTAMP
+# и теперь хранятся как INTEGER unix timestamp
+TIMESTAMP_COLUMNS = {
+    'phrases': ('date_added',),
+    'user_progress': ('last_attempt',),
+    'answer_history': ('timestamp',),
+    'statistics': ('last_updated',),
+    'user_expected_answers': ('created_at',),
+}
+
+
+def migrate_timestamps(cursor: sqlite3.Cursor) -> None:
+    """
+    Переводит строковые даты в unix timestamp (INTEGER).
+    
+    Объявленный тип TIMESTAMP имеет NUMERIC affinity, поэтому целые числа
+    хранятся в тех же столбцах без пересоздания таблиц. Строки, которые
+    SQLite не смог разобрать как дату, остаются без изменений.
+    Триггеры статистики удаляются: DatabaseManager пересоздаст их
+    с unixepoch() и пересчитает таблицу statistics при следующем запуске.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    tables = {row[0] for row in cursor.fetchall()}
+    
+    for table, columns in TIMESTAMP_COLUMNS.items():
+        if table not in tables:
+            continue
+        for column in columns:
+            cursor.execute(f"""
+                UPDATE {table}
+                SET {column} = COALESCE(CAST(strftime('%s', {column}) AS INTEGER), {column})
+                WHERE typeof({column}) = 'text'
+            """)
+            print(f"🕒 {table}.{column}: переведено в unix timestamp {cursor.rowcount} значений")
+    
+    cursor.execute("DROP TRIGGER IF EXISTS trg_up_statistics_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS trg_up_statistics_update")
+
 def migrate_database():
     """Мигрирует базу данных, добавляя новые столбцы для системы прогресса."""
-    db_path = "english_learning.db"
+    # Тот же файл БД, с которым работает приложение
+    db_path = str(DATABASE_PATH)
     
     print("🔄 Начинаем миграцию базы данных...")
     
     try:
         with sqlite3.connect(db_path) as conn:
             cursor = conn.cursor()
+
+            # Одна явная транзакция на всю миграцию: один fsync вместо отдельного
+            # на каждый ALTER/UPDATE. PRAGMA выполняем до BEGIN - journal_mode
+            # нельзя менять внутри транзакции
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute("BEGIN IMMEDIATE")
             
-            # Проверяем существующие столбцы в таблице phrases
-            cursor.execute("PRAGMA table_info(phrases)")
-            columns = [column[1] for column in cursor.fetchall()]
-            print(f"📋 Существующие столбцы: {columns}")
-            
-            # Добавляем столбец is_learned если его нет
-            if 'is_learned' not in columns:
-                print("➕ Добавляем столбец 'is_learned'...")
-                cursor.execute("ALTER TABLE phrases ADD COLUMN is_learned BOOLEAN DEFAULT 0")
-                print("✅ Столбец 'is_learned' добавлен")
-            else:
-                print("✅ Столбец 'is_learned' уже существует")
-            
-            # Добавляем столбец total_progress_score если его нет
-            if 'total_progress_score' not in columns:
-                print("➕ Добавляем столбец 'total_progress_score'...")
-                cursor.execute("ALTER TABLE phrases ADD COLUMN total_progress_score REAL DEFAULT 0.0")
-                print("✅ Столбец 'total_progress_score' добавлен")
-            else:
-                print("✅ Столбец 'total_progress_score' уже существует")
-            
-            # Обновляем существующие записи
-            print("🔄 Обновляем существующие записи...")
+            try:
+                # Проверяем существующие столбцы в таблице phrases (один PRAGMA,
+                # дальше проверки идут по множеству)
+                cursor.execute("PRAGMA table_info(phrases)")
+                column_names = [column[1] for column in cursor.fetchall()]
+                columns = set(column_names)
+                print(f"📋 Существующие столбцы: {column_names}")
             
-            # Устанавливаем is_learned = 0 для всех существующих фраз
-            cursor.execute("UPDATE phrases SET is_learned = 0 WHERE is_learned IS NULL")
+                # Добавляем столбец is_learned если его нет
+                if 'is_learned' not in columns:
+                    print("➕ Добавляем столбец 'is_learned'...")
+                    cursor.execute("ALTER TABLE phrases ADD COLUMN is_learned INTEGER NOT NULL DEFAULT 0")
+                    column_names.append('is_learned')
+                    print("✅ Столбец 'is_learned' добавлен")
+                else:
+                    print("✅ Столбец 'is_learned' уже существует")
             
-            # Устанавливаем total_progress_score = 0.0 для всех существующих фраз
-            cursor.execute("UPDATE phrases SET total_progress_score = 0.0 WHERE total_progress_score IS NULL")
+                # Добавляем столбец total_progress_score если его нет
+                if 'total_progress_score' not in columns:
+                    print("➕ Добавляем столбец 'total_progress_score'...")
+                    cursor.execute("ALTER TABLE phrases ADD COLUMN total_progress_score REAL DEFAULT 0.0")
+                    column_names.append('total_progress_score')
+                    print("✅ Столбец 'total_progress_score' добавлен")
+                else:
+                    print("✅ Столбец 'total_progress_score' уже существует")
             
-            # Получаем количество обновленных записей
-            updated_rows = cursor.rowcount
-            print(f"✅ Обновлено {updated_rows} записей")
+                # Обновляем существующие записи
+                print("🔄 Обновляем существующие записи...")
             
-            # Проверяем финальную структуру
-            cursor.execute("PRAGMA table_info(phrases)")
-            final_columns = [column[1] for column in cursor.fetchall()]
-            print(f"📋 Финальная структура таблицы: {final_columns}")
+                # DEFAULT в ADD COLUMN уже заполняет существующие строки, поэтому
+                # дозаполняем только строки с NULL одним проходом по таблице
+                cursor.execute("""
+                    UPDATE phrases
+                    SET is_learned = COALESCE(is_learned, 0),
+                        total_progress_score = COALESCE(total_progress_score, 0.0)
+                    WHERE is_learned IS NULL OR total_progress_score IS NULL
+                """)
             
-            # Получаем статистику
-            cursor.execute("SELECT COUNT(*) FROM phrases")
-            total_phrases = cursor.fetchone()[0]
+                # Получаем количество обновленных записей
+                updated_rows = cursor.rowcount
+                print(f"✅ Обновлено {updated_rows} записей")
             
-            cursor.execute("SELECT COUNT(*) FROM phrases WHERE is_learned = 1")
-            learned_phrases = cursor.fetchone()[0]
+                # Финальная структура известна без повторного PRAGMA:
+                # ADD COLUMN всегда добавляет столбец в конец таблицы
+                print(f"📋 Финальная структура таблицы: {column_names}")
             
-            cursor.execute("SELECT COUNT(*) FROM phrases WHERE is_learned = 0")
-            active_phrases = cursor.fetchone()[0]
+                # Отдельный индекс по is_learned не нужен: выборки фраз обслуживает
+                # idx_phrases_active_learned_added, который создает DatabaseManager.
+                # Удаляем индекс, созданный прежней версией миграции
+                cursor.execute("DROP INDEX IF EXISTS ix_phrases_is_learned")
+                
+                # Получаем статистику одним проходом по таблице
+                cursor.execute("""
+                    SELECT
+                        COUNT(*),
+                        COALESCE(SUM(is_learned = 1), 0),
+                        COALESCE(SUM(is_learned = 0), 0)
+                    FROM phrases
+                """)
+                total_phrases, learned_phrases, active_phrases = cursor.fetchone()
             
-            print(f"\n📊 Статистика после миграции:")
-            print(f"  Всего фраз: {total_phrases}")
-            print(f"  Изучено: {learned_phrases}")
-            print(f"  Активно изучается: {active_phrases}")
+                print("\n📊 Статистика после миграции:")
+                print(f"  Всего фраз: {total_phrases}")
+                print(f"  Изучено: {learned_phrases}")
+                print(f"  Активно изучается: {active_phrases}")
+                
+                # Даты: строки CURRENT_TIMESTAMP -> INTEGER unix timestamp
+                migrate_timestamps(cursor)
             
-            conn.commit()
-            print("✅ Миграция завершена успешно!")
+                conn.commit()
+                print("✅ Миграция завершена успешно!")
+            except Exception:
+                conn.rollback()
+                raise
             
     except sqlite3.Error as e:
         print(f"❌ Ошибка миграции: {e}")
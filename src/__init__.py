@@ -4,6 +4,8 @@
 Содержит основные модули:
 - database: Работа с SQLite базой данных
 - ai_analyzer: AI-анализ ответов пользователя
+- ai_cache: Кэш результатов AI-анализа
+- scoring: Шкала баллов AI-оценки
 - google_sync: Синхронизация с Google Sheets
 - scheduler: Планировщик уведомлений
 - main: Основной файл Telegram бота
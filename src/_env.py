@@ -0,0 +1,18 @@
+"""
+Модуль: _env.py
+
+Назначение:
+    Однократная загрузка переменных окружения из .env файла.
+    config.config вызывает init_env() при импорте, AIAnalyzer - при создании,
+    но сам .env читается с диска только один раз за процесс.
+"""
+
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+
+@lru_cache(maxsize=1)
+def init_env() -> None:
+    """Загружает переменные окружения из .env (только при первом вызове)."""
+    load_dotenv()
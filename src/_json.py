@@ -0,0 +1,30 @@
+"""
+Модуль: _json.py
+
+Назначение:
+    Быстрая (де)сериализация JSON через orjson с откатом на стандартный json,
+    если orjson не установлен. Используется для разбора ответов OpenAI
+    и построения ключей кэша.
+"""
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson указан в requirements.txt
+    orjson = None
+    import json
+
+
+if orjson is not None:
+    loads = orjson.loads
+    
+    def dumps_sorted(obj) -> bytes:
+        """Сериализует объект в компактный JSON с отсортированными ключами."""
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+else:
+    loads = json.loads
+    
+    def dumps_sorted(obj) -> bytes:
+        """Сериализует объект в компактный JSON с отсортированными ключами."""
+        return json.dumps(
+            obj, sort_keys=True, ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8')
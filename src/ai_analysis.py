@@ -16,34 +16,41 @@
 """
 
 import os
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Optional, Tuple
+import re
+import string
+import time
+from collections import Counter
+from difflib import SequenceMatcher
+from functools import cached_property, lru_cache
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, Final, Iterable, List, Mapping, Optional, Tuple, Union
 from datetime import datetime
-from dotenv import load_dotenv
-from openai import OpenAI
 
-# Загружаем переменные окружения
-load_dotenv()
+import msgspec
 
-# Настраиваем логирование
-logging.basicConfig(level=logging.INFO)
+from . import _json
+from ._env import init_env
+from .ai_cache import AIResponseCache, SemanticAnswerCache, create_response_cache
+from .scoring import normalize_score
+
+# Значения по умолчанию для переменных окружения; сами переменные читаются
+# при создании AIAnalyzer, а не при импорте модуля
+DEFAULT_OPENAI_MODEL = 'gpt-4o-mini'
+# Повторы при 429/5xx/сетевых ошибках (экспоненциальная задержка внутри SDK)
+DEFAULT_OPENAI_MAX_RETRIES = 3
+DEFAULT_SEMANTIC_CACHE_THRESHOLD = 0.92
+# Через сколько секунд test_connection повторяет проверку после неудачи
+# (успешная проверка действует до конца процесса)
+CONNECTION_CHECK_RETRY_SECONDS = 60
+
+# Логирование настраивает точка входа приложения
 logger = logging.getLogger(__name__)
 
 # region Константы системы баллов
-SCORE_LEVELS = {
-    0.0: "неправильно",
-    0.1: "очень плохо",
-    0.2: "плохо", 
-    0.3: "почти неправильно",
-    0.4: "слабо",
-    0.5: "частично правильно",
-    0.6: "неплохо",
-    0.7: "почти правильно",
-    0.8: "хорошо",
-    0.9: "очень хорошо",
-    1.0: "правильно"
-}
-
+# Шкала баллов и пороги нормализации - в модуле scoring
 # Весовые коэффициенты для разных типов ошибок
 # ВАЖНО: Грамматика и пунктуация НЕ влияют на оценку - цель запомнить фразу, а не писать идеально
 ERROR_WEIGHTS = {
@@ -53,185 +60,99 @@ ERROR_WEIGHTS = {
     'punctuation': 0.0,  # Пунктуация НЕ влияет на оценку
     'style': 0.1         # Стилистические различия (синонимы допустимы)
 }
-
-# Пороги для мягкой нормализации
-SOFT_THRESHOLDS = {
-    0.0: (0.0, 0.1),     # 0.0-0.1 → 0.0
-    0.1: (0.11, 0.2),    # 0.11-0.2 → 0.1
-    0.2: (0.21, 0.3),    # 0.21-0.3 → 0.2
-    0.3: (0.31, 0.4),    # 0.31-0.4 → 0.3
-    0.4: (0.41, 0.5),    # 0.41-0.5 → 0.4
-    0.5: (0.51, 0.6),    # 0.51-0.6 → 0.5
-    0.6: (0.61, 0.7),    # 0.61-0.7 → 0.6
-    0.7: (0.71, 0.8),    # 0.71-0.8 → 0.7
-    0.8: (0.81, 0.9),    # 0.81-0.9 → 0.8
-    0.9: (0.91, 0.95),   # 0.91-0.95 → 0.9
-    1.0: (0.96, 1.0)     # 0.96-1.0 → 1.0
-}
 # endregion
 
-# region CLASS AIAnalyzer
-class AIAnalyzer:
-    """Класс для AI-анализа ответов пользователей."""
-    
-    def __init__(self):
-        """Инициализация AI анализатора."""
-        self.api_key = os.getenv('OPENAI_API_KEY')
-        if not self.api_key:
-            raise ValueError("OPENAI_API_KEY не найден в переменных окружения")
-        
-        # Создаем клиент OpenAI один раз при инициализации
-        # Используем только api_key, без других параметров для совместимости
-        # Откладываем создание клиента до первого использования (lazy initialization)
-        self.client = None  # Будем создавать клиент при первом запросе
-        self.model = "gpt-3.5-turbo"  # Можно изменить на более продвинутую модель
-        
-        logger.info("AI анализатор инициализирован")
-    
-    def analyze_answer(
-        self, 
-        english_phrase: str, 
-        russian_translation: str, 
-        user_answer: str,
-        context: Optional[str] = None
-    ) -> Dict[str, any]:
-        """
-        Анализирует ответ пользователя на английскую фразу.
-        
-        Args:
-            english_phrase: Английская фраза для перевода
-            russian_translation: Правильный русский перевод
-            user_answer: Ответ пользователя
-            context: Дополнительный контекст (опционально)
-            
-        Returns:
-            Словарь с результатами анализа:
-            - score: балл (0, 0.3, 0.5, 0.7, 1)
-            - feedback: комментарий к ответу
-            - confidence: уверенность в оценке (0-1)
-            - suggestions: предложения по улучшению
-        """
-        try:
-            # Формируем промпт для OpenAI
-            prompt = self._create_analysis_prompt(
-                english_phrase, 
-                russian_translation, 
-                user_answer, 
-                context
-            )
-            
-            # Отправляем запрос к OpenAI (lazy initialization клиента)
-            # Создаем клиент при первом использовании для избежания проблем с инициализацией
-            if self.client is None:
-                try:
-                    self.client = OpenAI(api_key=self.api_key)
-                except Exception as e:
-                    logger.error(f"Ошибка создания OpenAI клиента: {e}")
-                    raise
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,  # Более стабильная и мягкая оценка
-                max_tokens=500
-            )
-            
-            # Парсим ответ
-            analysis_result = self._parse_ai_response(response.choices[0].message.content)
-            
-            logger.info(f"Ответ проанализирован: {english_phrase} -> {analysis_result['score']}")
-            return analysis_result
-            
-        except Exception as e:
-            logger.error(f"Ошибка при анализе ответа: {e}")
-            # Возвращаем базовую оценку в случае ошибки
-            return self._get_fallback_analysis(user_answer, russian_translation)
-    
-    def analyze_reverse_answer(
-        self, 
-        russian_phrase: str, 
-        english_translation: str, 
-        user_answer: str,
-        context: Optional[str] = None
-    ) -> Dict[str, any]:
-        """
-        Анализирует ответ пользователя на русскую фразу (перевод на английский).
-        
-        Args:
-            russian_phrase: Русская фраза для перевода
-            english_translation: Правильный английский перевод
-            user_answer: Ответ пользователя на английском
-            context: Дополнительный контекст (опционально)
-            
-        Returns:
-            Словарь с результатами анализа:
-            - score: балл (0, 0.3, 0.5, 0.7, 1)
-            - feedback: комментарий к ответу
-            - confidence: уверенность в оценке (0-1)
-            - suggestions: предложения по улучшению
-        """
-        try:
-            # Формируем промпт для OpenAI
-            prompt = self._create_reverse_analysis_prompt(
-                russian_phrase, 
-                english_translation, 
-                user_answer, 
-                context
-            )
-            
-            # Отправляем запрос к OpenAI (lazy initialization клиента)
-            # Создаем клиент при первом использовании для избежания проблем с инициализацией
-            if self.client is None:
-                try:
-                    self.client = OpenAI(api_key=self.api_key)
-                except Exception as e:
-                    logger.error(f"Ошибка создания OpenAI клиента: {e}")
-                    raise
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self._get_reverse_system_prompt()},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,  # Более стабильная и мягкая оценка
-                max_tokens=500
-            )
-            
-            # Парсим ответ
-            analysis_result = self._parse_ai_response(response.choices[0].message.content)
-            
-            logger.info(f"Обратный ответ проанализирован: {russian_phrase} -> {analysis_result['score']}")
-            return analysis_result
-            
-        except Exception as e:
-            logger.error(f"Ошибка при анализе обратного ответа: {e}")
-            # Возвращаем базовую оценку в случае ошибки
-            return self._get_fallback_reverse_analysis(user_answer, english_translation)
-    
-    def _create_analysis_prompt(
-        self, 
-        english_phrase: str, 
-        russian_translation: str, 
-        user_answer: str, 
-        context: Optional[str] = None
-    ) -> str:
-        """Создает промпт для OpenAI API."""
-        prompt = f"""
+# region Промпты OpenAI
+# Статичные части промптов собираются один раз при импорте модуля;
+# на каждый запрос подставляются только фраза, перевод и ответ пользователя
+SYSTEM_PROMPT: Final[str] = """Ты - эксперт по английскому языку, который анализирует ответы студентов на перевод фраз.
+
+Твоя главная задача - оценить, насколько правильно студент понял СМЫСЛ фразы и запомнил её.
+
+ВАЖНО: Цель обучения - ЗАПОМНИТЬ фразу, а не писать идеально грамматически.
+ГРАММАТИКА И ПУНКТУАЦИЯ НЕ ВЛИЯЮТ НА ОЦЕНКУ - это не экзамен по грамматике!
+
+ПРИОРИТЕТЫ ОЦЕНКИ (по важности):
+1. Понимание основного смысла фразы (60% веса) - ГЛАВНОЕ!
+2. Точность перевода ключевых слов (30% веса)
+3. Стилистические различия (10% веса) - синонимы допустимы
+4. Грамматическая корректность (0% веса) - НЕ влияет на оценку
+5. Пунктуация (0% веса) - НЕ влияет на оценку
+
+ИСПОЛЬЗУЙ 11-БАЛЛЬНУЮ ШКАЛУ (0.0-1.0 с шагом 0.1):
+- 0.0-0.2: Серьезные ошибки в понимании смысла
+- 0.3-0.4: Частичное понимание с ошибками
+- 0.5-0.6: Смысл понят наполовину
+- 0.7-0.8: Хорошее понимание (даже с грамматическими ошибками)
+- 0.9-1.0: Отличное понимание (даже с грамматическими ошибками)
+
+АНАЛИЗИРУЙ ТОЛЬКО ВАЖНЫЕ ОШИБКИ:
+- Смысловые ошибки: полная потеря или искажение смысла - ВАЖНО!
+- Лексические ошибки: неправильный перевод ключевых слов - ВАЖНО!
+- Грамматические ошибки: НЕ снижай балл, только указывай в error_analysis для информации
+- Пунктуационные ошибки: НЕ снижай балл, только указывай в error_analysis для информации
+- Стилистические отличия: синонимы и перефразировки - это хорошо!
+
+БУДЬ МЯГКИМ И СПРАВЕДЛИВЫМ:
+- Если смысл понят правильно, ставь высокий балл (0.8-1.0) даже с грамматическими ошибками
+- За похожие переводы снижай балл минимально (0.1-0.2)
+- За ошибку в 1 слове снижай балл умеренно (0.2-0.3)
+- НЕ снижай балл за отсутствие точки, запятой, неправильное время глагола
+- НЕ снижай балл за грамматические ошибки - цель запомнить фразу, а не писать идеально
+
+Давай конкретные советы по исправлению ошибок, а не общие рекомендации.
+
+Отвечай ТОЛЬКО JSON-объектом, без текста до или после него."""
+
+REVERSE_SYSTEM_PROMPT: Final[str] = """Ты - эксперт по английскому языку, который анализирует ответы студентов на перевод фраз с русского на английский.
+
+Твоя главная задача - оценить, насколько правильно студент понял СМЫСЛ фразы и запомнил её.
+
+ВАЖНО: Цель обучения - ЗАПОМНИТЬ фразу, а не писать идеально грамматически.
+ГРАММАТИКА И ПУНКТУАЦИЯ НЕ ВЛИЯЮТ НА ОЦЕНКУ - это не экзамен по грамматике!
+
+ПРИОРИТЕТЫ ОЦЕНКИ (по важности):
+1. Понимание основного смысла фразы (60% веса) - ГЛАВНОЕ!
+2. Точность перевода ключевых слов (30% веса)
+3. Стилистические различия (10% веса) - синонимы допустимы
+4. Грамматическая корректность (0% веса) - НЕ влияет на оценку
+5. Пунктуация (0% веса) - НЕ влияет на оценку
+
+ИСПОЛЬЗУЙ 11-БАЛЛЬНУЮ ШКАЛУ (0.0-1.0 с шагом 0.1):
+- 0.0-0.2: Серьезные ошибки в понимании смысла
+- 0.3-0.4: Частичное понимание с ошибками
+- 0.5-0.6: Смысл понят наполовину
+- 0.7-0.8: Хорошее понимание (даже с грамматическими ошибками)
+- 0.9-1.0: Отличное понимание (даже с грамматическими ошибками)
+
+АНАЛИЗИРУЙ ТОЛЬКО ВАЖНЫЕ ОШИБКИ:
+- Смысловые ошибки: полная потеря или искажение смысла - ВАЖНО!
+- Лексические ошибки: неправильный перевод ключевых слов - ВАЖНО!
+- Грамматические ошибки: НЕ снижай балл, только указывай в error_analysis для информации
+- Пунктуационные ошибки: НЕ снижай балл, только указывай в error_analysis для информации
+- Стилистические отличия: синонимы и перефразировки - это хорошо!
+
+БУДЬ МЯГКИМ И СПРАВЕДЛИВЫМ:
+- Если смысл понят правильно, ставь высокий балл (0.8-1.0) даже с грамматическими ошибками
+- За похожие переводы снижай балл минимально (0.1-0.2)
+- За ошибку в 1 слове снижай балл умеренно (0.2-0.3)
+- НЕ снижай балл за отсутствие точки, запятой, неправильное время глагола
+- НЕ снижай балл за отсутствие артиклей (a/an/the)
+- НЕ снижай балл за грамматические ошибки - цель запомнить фразу, а не писать идеально
+
+Давай конкретные советы по исправлению ошибок, а не общие рекомендации.
+
+Отвечай ТОЛЬКО JSON-объектом, без текста до или после него."""
+
+ANALYSIS_PROMPT_HEADER: Final[str] = """
 Анализируй ответ пользователя на английскую фразу.
 
-Английская фраза: "{english_phrase}"
-Правильный перевод: "{russian_translation}"
+Английская фраза: "{phrase}"
+Правильный перевод: "{correct_answer}"
 Ответ пользователя: "{user_answer}"
 """
-        
-        if context:
-            prompt += f"Контекст: {context}\n"
-        
-        prompt += """
+
+ANALYSIS_PROMPT_RULES: Final[str] = """
 ВАЖНО: Используй мягкую систему оценки с фокусом на понимание СМЫСЛА фразы.
 
 ЦЕЛЬ ОЦЕНКИ: Проверить, запомнил ли человек фразу и понял ли её смысл.
@@ -273,7 +194,9 @@ class AIAnalyzer:
    - Различия в стиле - это нормально
    - Использование синонимов - это хорошо
    - Естественные перефразировки - это отлично
+"""
 
+ANALYSIS_RICH_FORMAT: Final[str] = """
 Верни ответ в формате JSON:
 {
     "score": число от 0.0 до 1.0 (с шагом 0.1),
@@ -293,28 +216,18 @@ class AIAnalyzer:
     "note": "краткая заметка по употреблению, коллокациям или типичным ошибкам"
 }
 """
-        return prompt
-    
-    def _create_reverse_analysis_prompt(
-        self, 
-        russian_phrase: str, 
-        english_translation: str, 
-        user_answer: str, 
-        context: Optional[str] = None
-    ) -> str:
-        """Создает промпт для OpenAI API для обратного анализа."""
-        prompt = f"""
+
+ANALYSIS_PROMPT_RUBRIC: Final[str] = ANALYSIS_PROMPT_RULES + ANALYSIS_RICH_FORMAT
+
+REVERSE_ANALYSIS_PROMPT_HEADER: Final[str] = """
 Анализируй ответ пользователя на русскую фразу (перевод на английский).
 
-Русская фраза: "{russian_phrase}"
-Правильный перевод: "{english_translation}"
+Русская фраза: "{phrase}"
+Правильный перевод: "{correct_answer}"
 Ответ пользователя: "{user_answer}"
 """
-        
-        if context:
-            prompt += f"Контекст: {context}\n"
-        
-        prompt += """
+
+REVERSE_ANALYSIS_PROMPT_RULES: Final[str] = """
 ВАЖНО: Используй мягкую систему оценки с фокусом на понимание СМЫСЛА фразы для перевода на английский.
 
 ЦЕЛЬ ОЦЕНКИ: Проверить, запомнил ли человек фразу и понял ли её смысл.
@@ -357,7 +270,9 @@ class AIAnalyzer:
    - Различия в стиле - это нормально
    - Использование синонимов - это хорошо
    - Естественные перефразировки - это отлично
+"""
 
+REVERSE_ANALYSIS_RICH_FORMAT: Final[str] = """
 Верни ответ в формате JSON:
 {
     "score": число от 0.0 до 1.0 (с шагом 0.1),
@@ -377,334 +292,1070 @@ class AIAnalyzer:
     "note": "краткая заметка по употреблению"
 }
 """
-        return prompt
-    
-    def _get_system_prompt(self) -> str:
-        """Возвращает системный промпт для OpenAI."""
-        return """Ты - эксперт по английскому языку, который анализирует ответы студентов на перевод фраз.
 
-Твоя главная задача - оценить, насколько правильно студент понял СМЫСЛ фразы и запомнил её.
+REVERSE_ANALYSIS_PROMPT_RUBRIC: Final[str] = REVERSE_ANALYSIS_PROMPT_RULES + REVERSE_ANALYSIS_RICH_FORMAT
 
-ВАЖНО: Цель обучения - ЗАПОМНИТЬ фразу, а не писать идеально грамматически.
-ГРАММАТИКА И ПУНКТУАЦИЯ НЕ ВЛИЯЮТ НА ОЦЕНКУ - это не экзамен по грамматике!
+# Сокращенный формат ответа для быстрой проверки (rich=False): без
+# разбора ошибок, примеров и диалога - меньше выходных токенов
+SLIM_RESPONSE_FORMAT: Final[str] = """
+Верни ответ в формате JSON:
+{
+    "score": число от 0.0 до 1.0 (с шагом 0.1),
+    "feedback": "краткий комментарий о понимании смысла (1-2 предложения)",
+    "confidence": число от 0 до 1,
+    "suggestions": ["1-2 конкретных предложения по исправлению ошибок"]
+}
+"""
 
-ПРИОРИТЕТЫ ОЦЕНКИ (по важности):
-1. Понимание основного смысла фразы (60% веса) - ГЛАВНОЕ!
-2. Точность перевода ключевых слов (30% веса)
-3. Стилистические различия (10% веса) - синонимы допустимы
-4. Грамматическая корректность (0% веса) - НЕ влияет на оценку
-5. Пунктуация (0% веса) - НЕ влияет на оценку
+ANALYSIS_PROMPT_SLIM_RUBRIC: Final[str] = ANALYSIS_PROMPT_RULES + SLIM_RESPONSE_FORMAT
+REVERSE_ANALYSIS_PROMPT_SLIM_RUBRIC: Final[str] = REVERSE_ANALYSIS_PROMPT_RULES + SLIM_RESPONSE_FORMAT
 
-ИСПОЛЬЗУЙ 11-БАЛЛЬНУЮ ШКАЛУ (0.0-1.0 с шагом 0.1):
-- 0.0-0.2: Серьезные ошибки в понимании смысла
-- 0.3-0.4: Частичное понимание с ошибками
-- 0.5-0.6: Смысл понят наполовину
-- 0.7-0.8: Хорошее понимание (даже с грамматическими ошибками)
-- 0.9-1.0: Отличное понимание (даже с грамматическими ошибками)
+# Необязательная строка контекста между заголовком и рубрикой
+CONTEXT_PROMPT_LINE: Final[str] = "Контекст: {context}\n"
 
-АНАЛИЗИРУЙ ТОЛЬКО ВАЖНЫЕ ОШИБКИ:
-- Смысловые ошибки: полная потеря или искажение смысла - ВАЖНО!
-- Лексические ошибки: неправильный перевод ключевых слов - ВАЖНО!
-- Грамматические ошибки: НЕ снижай балл, только указывай в error_analysis для информации
-- Пунктуационные ошибки: НЕ снижай балл, только указывай в error_analysis для информации
-- Стилистические отличия: синонимы и перефразировки - это хорошо!
+# Пакетный анализ: несколько ответов в одном запросе, рубрика отправляется один раз
+BATCH_PROMPT_HEADER: Final[str] = """
+Оцени каждый из следующих {count} ответов пользователя по правилам ниже.
+"""
 
-БУДЬ МЯГКИМ И СПРАВЕДЛИВЫМ:
-- Если смысл понят правильно, ставь высокий балл (0.8-1.0) даже с грамматическими ошибками
-- За похожие переводы снижай балл минимально (0.1-0.2)
-- За ошибку в 1 слове снижай балл умеренно (0.2-0.3)
-- НЕ снижай балл за отсутствие точки, запятой, неправильное время глагола
-- НЕ снижай балл за грамматические ошибки - цель запомнить фразу, а не писать идеально
+BATCH_PROMPT_ITEM: Final[str] = """
+{index}) Фраза: "{phrase}"
+   Правильный перевод: "{correct_answer}"
+   Ответ пользователя: "{user_answer}"
+"""
 
-Давай конкретные советы по исправлению ошибок, а не общие рекомендации."""
-    
-    def _get_reverse_system_prompt(self) -> str:
-        """Возвращает системный промпт для обратного анализа."""
-        return """Ты - эксперт по английскому языку, который анализирует ответы студентов на перевод фраз с русского на английский.
+BATCH_PROMPT_FOOTER: Final[str] = """
+Для КАЖДОГО ответа составь JSON-объект в формате выше и добавь в него поле
+"index" с номером ответа. Верни один JSON-объект вида {{"results": [...]}},
+где results - массив из {count} таких объектов в том же порядке.
+"""
 
-Твоя главная задача - оценить, насколько правильно студент понял СМЫСЛ фразы и запомнил её.
+SUGGESTIONS_SYSTEM_PROMPT: Final[str] = "Ты - опытный преподаватель английского языка."
 
-ВАЖНО: Цель обучения - ЗАПОМНИТЬ фразу, а не писать идеально грамматически.
-ГРАММАТИКА И ПУНКТУАЦИЯ НЕ ВЛИЯЮТ НА ОЦЕНКУ - это не экзамен по грамматике!
+SUGGESTIONS_PROMPT_TEMPLATE: Final[str] = """
+Дай 3-5 конкретных рекомендаций для изучения фразы сложности "{phrase_difficulty}" 
+для пользователя уровня "{user_level}".
 
-ПРИОРИТЕТЫ ОЦЕНКИ (по важности):
-1. Понимание основного смысла фразы (60% веса) - ГЛАВНОЕ!
-2. Точность перевода ключевых слов (30% веса)
-3. Стилистические различия (10% веса) - синонимы допустимы
-4. Грамматическая корректность (0% веса) - НЕ влияет на оценку
-5. Пунктуация (0% веса) - НЕ влияет на оценку
+Формат: простой список рекомендаций на русском языке.
+"""
 
-ИСПОЛЬЗУЙ 11-БАЛЛЬНУЮ ШКАЛУ (0.0-1.0 с шагом 0.1):
-- 0.0-0.2: Серьезные ошибки в понимании смысла
-- 0.3-0.4: Частичное понимание с ошибками
-- 0.5-0.6: Смысл понят наполовину
-- 0.7-0.8: Хорошее понимание (даже с грамматическими ошибками)
-- 0.9-1.0: Отличное понимание (даже с грамматическими ошибками)
+# Версия промптов для ключа кэша: при изменении текста промптов
+# ранее сохраненные результаты перестают совпадать
+PROMPT_VERSION: Final[str] = hashlib.sha256(
+    (SYSTEM_PROMPT + REVERSE_SYSTEM_PROMPT + ANALYSIS_PROMPT_HEADER + ANALYSIS_PROMPT_RUBRIC
+     + REVERSE_ANALYSIS_PROMPT_HEADER + REVERSE_ANALYSIS_PROMPT_RUBRIC
+     + SLIM_RESPONSE_FORMAT).encode('utf-8')
+).hexdigest()[:16]
 
-АНАЛИЗИРУЙ ТОЛЬКО ВАЖНЫЕ ОШИБКИ:
-- Смысловые ошибки: полная потеря или искажение смысла - ВАЖНО!
-- Лексические ошибки: неправильный перевод ключевых слов - ВАЖНО!
-- Грамматические ошибки: НЕ снижай балл, только указывай в error_analysis для информации
-- Пунктуационные ошибки: НЕ снижай балл, только указывай в error_analysis для информации
-- Стилистические отличия: синонимы и перефразировки - это хорошо!
+# Низкая температура - стабильная и мягкая оценка; при ней ответы модели
+# практически детерминированы, поэтому их можно кэшировать
+ANALYSIS_TEMPERATURE = 0.1
 
-БУДЬ МЯГКИМ И СПРАВЕДЛИВЫМ:
-- Если смысл понят правильно, ставь высокий балл (0.8-1.0) даже с грамматическими ошибками
-- За похожие переводы снижай балл минимально (0.1-0.2)
-- За ошибку в 1 слове снижай балл умеренно (0.2-0.3)
-- НЕ снижай балл за отсутствие точки, запятой, неправильное время глагола
-- НЕ снижай балл за отсутствие артиклей (a/an/the)
-- НЕ снижай балл за грамматические ошибки - цель запомнить фразу, а не писать идеально
+# Параметры HTTP-клиента OpenAI: соединения с keep-alive переиспользуются
+# между запросами, поэтому TLS-рукопожатие выполняется один раз
+OPENAI_TIMEOUT_SECONDS = 30.0
+OPENAI_CONNECT_TIMEOUT_SECONDS = 5.0
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 32
+OPENAI_MAX_CONNECTIONS = 64
+
+# Знаки препинания, которые не учитываются при сравнении ответа с правильным
+PUNCTUATION_TABLE: Final[Dict[int, None]] = str.maketrans(
+    '', '', string.punctuation + '«»„“”‘’—–…'
+)
+
+# Поле score в еще не завершенном JSON потокового ответа; score идет первым
+# в формате ответа, поэтому оценка известна задолго до конца генерации
+SCORE_FIELD_PATTERN = re.compile(r'"score"\s*:\s*"?(-?\d+(?:\.\d+)?)"?\s*[,}\n]')
+
+# Максимум одновременных запросов к OpenAI при пакетном анализе
+DEFAULT_BATCH_CONCURRENCY = 20
+# Ответов в одном запросе analyze_answers_batch
+DEFAULT_BATCH_SIZE = 10
+
+# Лимит выходных токенов на один ответ: полный разбор (rich=True) и
+# сокращенный формат SLIM_RESPONSE_FORMAT
+RICH_ANALYSIS_MAX_TOKENS = 500
+SLIM_ANALYSIS_MAX_TOKENS = 200
+
+# Готовые system-сообщения: в каждом запросе создается только user-сообщение
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+REVERSE_SYSTEM_MESSAGE = {"role": "system", "content": REVERSE_SYSTEM_PROMPT}
+SUGGESTIONS_SYSTEM_MESSAGE = {"role": "system", "content": SUGGESTIONS_SYSTEM_PROMPT}
+
+# Все различия двух направлений перевода: 'direct' - английская фраза и
+# русский ответ, 'reverse' - русская фраза и английский ответ
+ANALYSIS_DIRECTIONS: Final[Mapping[str, Mapping[str, Any]]] = MappingProxyType({
+    'direct': MappingProxyType({
+        'system_message': SYSTEM_MESSAGE,
+        'header': ANALYSIS_PROMPT_HEADER,
+        'rubric': ANALYSIS_PROMPT_RUBRIC,
+        'slim_rubric': ANALYSIS_PROMPT_SLIM_RUBRIC,
+        'label': "Ответ"
+    }),
+    'reverse': MappingProxyType({
+        'system_message': REVERSE_SYSTEM_MESSAGE,
+        'header': REVERSE_ANALYSIS_PROMPT_HEADER,
+        'rubric': REVERSE_ANALYSIS_PROMPT_RUBRIC,
+        'slim_rubric': REVERSE_ANALYSIS_PROMPT_SLIM_RUBRIC,
+        'label': "Обратный ответ"
+    })
+})
+# endregion
 
-Давай конкретные советы по исправлению ошибок, а не общие рекомендации."""
+# region Схема ответа AI
+class ErrorAnalysis(msgspec.Struct):
+    """Разбор ошибок в ответе пользователя (поле error_analysis)."""
+    meaning_errors: List[str] = []
+    lexical_errors: List[str] = []
+    grammar_errors: List[str] = []
+    punctuation_errors: List[str] = []
+    style_differences: List[str] = []
+
+
+class AnalysisResponse(msgspec.Struct):
+    """
+    JSON-ответ модели на анализ одного ответа.
     
-    def _parse_ai_response(self, response_text: str) -> Dict[str, any]:
-        """Парсит ответ от OpenAI API."""
-        try:
-            import json
-            # Ищем JSON в ответе
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
+    Разбор и проверка типов выполняются за один проход msgspec; лишние поля
+    (например, index в пакетном ответе) игнорируются, отсутствующие
+    заполняются значениями по умолчанию.
+    """
+    score: float
+    feedback: str = 'Комментарий не предоставлен'
+    confidence: float = 0.8
+    error_analysis: ErrorAnalysis = msgspec.field(default_factory=ErrorAnalysis)
+    suggestions: List[str] = []
+    alternatives: List[str] = []
+    usage_examples: List[str] = []
+    mini_dialogue: List[str] = []
+    note: str = ''
+
+
+# strict=False: модель иногда присылает числа строками ("0.8")
+ANALYSIS_RESPONSE_DECODER: Final = msgspec.json.Decoder(AnalysisResponse, strict=False)
+# endregion
+
+# region Готовые результаты анализа
+# Неизменяемые результаты для очевидных случаев возвращаются без создания
+# новых словарей; вызывающий код только читает их
+EMPTY_ERROR_ANALYSIS: Final[Mapping[str, tuple]] = MappingProxyType({
+    'meaning_errors': (),
+    'lexical_errors': (),
+    'grammar_errors': (),
+    'punctuation_errors': (),
+    'style_differences': ()
+})
+
+
+def _frozen_analysis(score: float, feedback: str, confidence: float, suggestions: tuple) -> Mapping[str, Any]:
+    """Создает неизменяемый результат анализа без ошибок и доп. материалов."""
+    return MappingProxyType({
+        'score': score,
+        'feedback': feedback,
+        'confidence': confidence,
+        'error_analysis': EMPTY_ERROR_ANALYSIS,
+        'suggestions': suggestions,
+        'alternatives': (),
+        'usage_examples': (),
+        'mini_dialogue': (),
+        'note': ''
+    })
+
+
+# Очевидные случаи без запроса к OpenAI (_get_shortcut_analysis)
+SHORTCUT_CORRECT_ANALYSIS: Final = _frozen_analysis(1.0, "Правильный перевод!", 1.0, ())
+SHORTCUT_EMPTY_ANALYSIS: Final = _frozen_analysis(0.0, "Ответ не получен", 1.0, ('Попробуйте перевести фразу',))
+
+# Fallback-оценка при ошибке AI (_get_fallback_analysis)
+FALLBACK_SUGGESTIONS: Final[tuple] = ('Проверьте правильность перевода',)
+FALLBACK_CORRECT_ANALYSIS: Final = _frozen_analysis(1.0, "Правильный перевод!", 0.6, FALLBACK_SUGGESTIONS)
+FALLBACK_EMPTY_ANALYSIS: Final = _frozen_analysis(0.0, "Ответ не получен", 0.6, FALLBACK_SUGGESTIONS)
+
+# Размеры кэшей fallback-оценки: разобранные ответы и готовые результаты
+FALLBACK_TOKENS_CACHE_SIZE = 4096
+FALLBACK_CACHE_SIZE = 8192
+# endregion
+
+# region FUNCTION _build_fallback_analysis
+@lru_cache(maxsize=FALLBACK_TOKENS_CACHE_SIZE)
+def _fold_answer(text: str) -> Tuple[str, Counter]:
+    """Возвращает ответ без регистра и крайних пробелов и мультимножество его слов."""
+    # casefold корректнее lower() для регистронезависимого сравнения
+    folded = text.casefold().strip()
+    return folded, Counter(folded.split())
+
+
+@lru_cache(maxsize=FALLBACK_CACHE_SIZE)
+def _build_fallback_analysis(user_answer: str, correct_answer: str) -> Mapping[str, Any]:
+    """
+    Оценивает непустой ответ без AI по сходству с правильным вариантом.
+    
+    Кэшируется: одна и та же фраза повторяется в течение сессии, поэтому
+    правильный вариант разбирается на слова один раз.
+    """
+    user_folded, user_counts = _fold_answer(user_answer)
+    correct_folded, correct_counts = _fold_answer(correct_answer)
+    
+    # Улучшенный анализ
+    if user_folded == correct_folded:
+        return FALLBACK_CORRECT_ANALYSIS
+    
+    # Анализируем различия: доля совпавших слов учитывает перестановки,
+    # посимвольное сходство - опечатки и другие формы слов.
+    # Слова сравниваются как мультимножества: повторы учитываются
+    common_words = user_counts & correct_counts
+    common_ratio = sum(common_words.values()) / max(sum(correct_counts.values()), 1)
+    
+    char_ratio = SequenceMatcher(None, user_folded, correct_folded).ratio()
+    similarity = max(common_ratio, char_ratio)
+    
+    # Определяем тип ошибок; грамматика и пунктуация не влияют на оценку
+    # и в fallback-анализе не проверяются
+    if similarity < 0.5:
+        error_type, error_text = 'meaning_errors', "Значительные различия в понимании смысла"
+    elif similarity < 0.8:
+        error_type, error_text = 'lexical_errors', "Некоторые ключевые слова переведены неправильно"
+    else:
+        error_type, error_text = 'style_differences', "Незначительные стилистические различия"
+    
+    error_analysis = dict(EMPTY_ERROR_ANALYSIS)
+    error_analysis[error_type] = (error_text,)
+    
+    # Определяем балл по той же шкале, что и для оценок AI
+    score = normalize_score(similarity)
+    if score >= 0.9:
+        feedback = "Отличный перевод с незначительными отличиями"
+    elif score >= 0.7:
+        feedback = "Хороший перевод с небольшими ошибками"
+    elif score >= 0.5:
+        feedback = "Частично правильный перевод"
+    elif score >= 0.3:
+        feedback = "Перевод с серьезными ошибками"
+    else:
+        feedback = "Неправильный перевод"
+    
+    # Результат разделяется между вызовами через кэш - только для чтения
+    return MappingProxyType({
+        'score': score,
+        'feedback': feedback,
+        'confidence': 0.6,
+        'error_analysis': MappingProxyType(error_analysis),
+        'suggestions': FALLBACK_SUGGESTIONS,
+        'alternatives': (),
+        'usage_examples': (),
+        'mini_dialogue': (),
+        'note': ''
+    })
+# endregion FUNCTION _build_fallback_analysis
+
+
+# region CLASS AIAnalyzer
+class AIAnalyzer:
+    """Класс для AI-анализа ответов пользователей."""
+    
+    def __init__(self):
+        """Инициализация AI анализатора."""
+        # .env читается с диска один раз на процесс - при создании первого
+        # анализатора (или раньше, при импорте config.config)
+        init_env()
+        
+        self.api_key = os.environ.get('OPENAI_API_KEY')
+        # Клиенты OpenAI создаются при первом запросе к API (см. client и
+        # async_client): fallback-оценка и нормализация работают без ключа
+        self.model = os.environ.get('OPENAI_MODEL', DEFAULT_OPENAI_MODEL)
+        self.max_retries = int(os.environ.get('OPENAI_MAX_RETRIES', DEFAULT_OPENAI_MAX_RETRIES))
+        self.batch_concurrency = int(os.environ.get('OPENAI_BATCH_CONCURRENCY', DEFAULT_BATCH_CONCURRENCY))
+        
+        # Кэш разобранных результатов: повторные попытки с тем же ответом
+        # не уходят в API (в Redis, если задан REDIS_URL, иначе в памяти)
+        self.response_cache = create_response_cache(os.environ.get('REDIS_URL'))
+        # Семантический кэш для перефразированных ответов (опционально)
+        self.semantic_cache = None
+        if os.environ.get('SEMANTIC_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes'):
+            threshold = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', DEFAULT_SEMANTIC_CACHE_THRESHOLD))
+            try:
+                self.semantic_cache = SemanticAnswerCache(threshold=threshold)
+            except ImportError:
+                logger.warning("sentence-transformers не установлен, семантический кэш отключен")
+        
+        # Результат test_connection и момент проверки (time.monotonic())
+        self._connection_ok: Optional[bool] = None
+        self._connection_checked_at = 0.0
+        
+        logger.info("AI анализатор инициализирован")
+    
+    @cached_property
+    def client(self):
+        """
+        Синхронный клиент OpenAI, создается один раз при первом обращении.
+        
+        Клиент переиспользуется во всех запросах (пул HTTP-соединений
+        с keep-alive внутри SDK).
+        
+        Raises:
+            ValueError: Если OPENAI_API_KEY не задан
+        """
+        # openai тянет httpx/pydantic/anyio - импортируем только когда
+        # действительно нужен запрос к API
+        from openai import DefaultHttpxClient, OpenAI
+        return OpenAI(
+            api_key=self._require_api_key(),
+            http_client=DefaultHttpxClient(limits=self._http_limits()),
+            **self._client_options()
+        )
+    
+    @cached_property
+    def async_client(self):
+        """
+        Асинхронный клиент OpenAI для aanalyze_* - не блокирует event loop бота.
+        
+        Raises:
+            ValueError: Если OPENAI_API_KEY не задан
+        """
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        return AsyncOpenAI(
+            api_key=self._require_api_key(),
+            http_client=DefaultAsyncHttpxClient(limits=self._http_limits()),
+            **self._client_options()
+        )
+    
+    @staticmethod
+    def _http_limits():
+        """Лимиты пула соединений HTTP-клиента OpenAI."""
+        import httpx
+        return httpx.Limits(
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            max_connections=OPENAI_MAX_CONNECTIONS
+        )
+    
+    def _client_options(self) -> Dict[str, Any]:
+        """
+        Таймауты и повторы клиента OpenAI.
+        
+        SDK сам повторяет запрос с экспоненциальной задержкой при 429, 5xx,
+        таймаутах и обрывах соединения, поэтому временные сбои не приводят
+        к fallback-оценке.
+        """
+        import httpx
+        return {
+            'timeout': httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+            'max_retries': self.max_retries
+        }
+    
+    def _require_api_key(self) -> str:
+        """Возвращает ключ OpenAI или выбрасывает ValueError, если он не задан."""
+        if not self.api_key:
+            raise ValueError("OPENAI_API_KEY не найден в переменных окружения")
+        return self.api_key
+    
+    def analyze_answer(
+        self, 
+        english_phrase: str, 
+        russian_translation: str, 
+        user_answer: str,
+        context: Optional[str] = None,
+        rich: bool = False
+    ) -> Mapping[str, Any]:
+        """
+        Анализирует ответ пользователя на английскую фразу.
+        
+        Args:
+            english_phrase: Английская фраза для перевода
+            russian_translation: Правильный русский перевод
+            user_answer: Ответ пользователя
+            context: Дополнительный контекст (опционально)
+            rich: Запросить полный разбор (error_analysis, alternatives,
+                usage_examples, mini_dialogue, note); иначе только score,
+                feedback, confidence и suggestions - быстрее и дешевле
             
-            if start_idx != -1 and end_idx != -1:
-                json_str = response_text[start_idx:end_idx]
-                result = json.loads(json_str)
-                
-                # Валидируем результат
-                if 'score' not in result:
-                    raise ValueError("Отсутствует score в ответе AI")
-                
-                # Нормализуем score с новой гибридной системой
-                score = float(result['score'])
-                logger.info(f"[START_FUNCTION][_parse_ai_response] Исходный score: {score}")
-                
-                normalized_score = self._normalize_score(score)
-                logger.info(f"[END_FUNCTION][_parse_ai_response] Нормализованный score: {normalized_score}")
-                
-                return {
-                    'score': normalized_score,
-                    'feedback': result.get('feedback', 'Комментарий не предоставлен'),
-                    'confidence': result.get('confidence', 0.8),
-                    'error_analysis': result.get('error_analysis', {
-                        'meaning_errors': [],
-                        'lexical_errors': [],
-                        'grammar_errors': [],
-                        'punctuation_errors': [],
-                        'style_differences': []
-                    }),
-                    'suggestions': result.get('suggestions', []),
-                    'alternatives': result.get('alternatives', [])[:3],
-                    'usage_examples': result.get('usage_examples', [])[:2],
-                    'mini_dialogue': result.get('mini_dialogue', [])[:4],
-                    'note': result.get('note', '').strip()
-                }
-            else:
-                raise ValueError("JSON не найден в ответе")
-                
-        except Exception as e:
-            logger.warning(f"Ошибка парсинга ответа AI: {e}")
-            return self._get_fallback_analysis("", "")
+        Returns:
+            Словарь с результатами анализа (только для чтения: очевидные случаи
+            и запасная оценка - общие неизменяемые объекты, списки в них - кортежи):
+            - score: балл (0, 0.3, 0.5, 0.7, 1)
+            - feedback: комментарий к ответу
+            - confidence: уверенность в оценке (0-1)
+            - suggestions: предложения по улучшению
+        """
+        return self._analyze('direct', english_phrase, russian_translation, user_answer, context, rich)
     
-    def _normalize_score(self, score: float) -> float:
+    def analyze_reverse_answer(
+        self, 
+        russian_phrase: str, 
+        english_translation: str, 
+        user_answer: str,
+        context: Optional[str] = None,
+        rich: bool = False
+    ) -> Mapping[str, Any]:
         """
-        Нормализует score к ближайшему допустимому значению с мягкой системой.
+        Анализирует ответ пользователя на русскую фразу (перевод на английский).
         
         Args:
-            score: Исходный score от AI (0.0-1.0)
+            russian_phrase: Русская фраза для перевода
+            english_translation: Правильный английский перевод
+            user_answer: Ответ пользователя на английском
+            context: Дополнительный контекст (опционально)
+            rich: Запросить полный разбор (error_analysis, alternatives,
+                usage_examples, mini_dialogue, note); иначе только score,
+                feedback, confidence и suggestions - быстрее и дешевле
             
         Returns:
-            Нормализованный score (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
-        """
-        logger.info(f"[START_FUNCTION][_normalize_score] Нормализация score: {score}")
-        
-        # Проверяем, является ли score уже допустимым значением
-        if score in SCORE_LEVELS:
-            logger.info(f"[_normalize_score] Score {score} уже в допустимых значениях")
-            return score
-        
-        # Используем мягкие пороговые диапазоны для нормализации
-        for normalized_score, (min_val, max_val) in SOFT_THRESHOLDS.items():
-            if min_val <= score <= max_val:
-                logger.info(f"[_normalize_score] Score {score} нормализован к {normalized_score} ({SCORE_LEVELS[normalized_score]})")
-                logger.info(f"[END_FUNCTION][_normalize_score] Результат: {normalized_score}")
-                return normalized_score
-        
-        # Если score выходит за пределы (0.0-1.0), ограничиваем
-        if score < 0.0:
-            logger.warning(f"[_normalize_score] Score {score} меньше 0, устанавливаем 0.0")
-            return 0.0
-        elif score > 1.0:
-            logger.warning(f"[_normalize_score] Score {score} больше 1, устанавливаем 1.0")
-            return 1.0
-        
-        # Fallback (не должно происходить)
-        logger.warning(f"[_normalize_score] Неожиданный score {score}, возвращаем 0.5")
-        return 0.5
-    
-    def _get_fallback_analysis(self, user_answer: str, correct_answer: str) -> Dict[str, any]:
-        """Возвращает улучшенную оценку в случае ошибки AI."""
-        user_lower = user_answer.lower().strip()
-        correct_lower = correct_answer.lower().strip()
-        
-        # Улучшенный анализ
-        if user_lower == correct_lower:
-            score = 1.0
-            feedback = "Правильный перевод!"
-            error_analysis = {
-                'meaning_errors': [],
-                'lexical_errors': [],
-                'grammar_errors': [],
-                'punctuation_errors': [],
-                'style_differences': []
-            }
-        else:
-            # Анализируем различия
-            user_words = set(user_lower.split())
-            correct_words = set(correct_lower.split())
+            Словарь с результатами анализа:
+            - score: балл (0, 0.3, 0.5, 0.7, 1)
+            - feedback: комментарий к ответу
+            - confidence: уверенность в оценке (0-1)
+            - suggestions: предложения по улучшению
+        """
+        return self._analyze('reverse', russian_phrase, english_translation, user_answer, context, rich)
+    
+    async def aanalyze_answer(
+        self, 
+        english_phrase: str, 
+        russian_translation: str, 
+        user_answer: str,
+        context: Optional[str] = None,
+        rich: bool = False,
+        on_score: Optional[Callable[[float], Awaitable[None]]] = None
+    ) -> Mapping[str, Any]:
+        """
+        Асинхронный вариант analyze_answer на AsyncOpenAI.
+        
+        Не блокирует event loop на время запроса к OpenAI, поэтому несколько
+        ответов можно анализировать параллельно через asyncio.gather.
+        
+        Args:
+            english_phrase: Английская фраза для перевода
+            russian_translation: Правильный русский перевод
+            user_answer: Ответ пользователя
+            context: Дополнительный контекст (опционально)
+            rich: Запросить полный разбор (как у analyze_answer)
+            on_score: Корутина, которой передается оценка, как только она
+                появится в потоковом ответе OpenAI - до конца генерации
+                разбора. Вызывается только при запросе к API
             
-            common_words = user_words.intersection(correct_words)
-            total_words = len(correct_words)
-            common_ratio = len(common_words) / total_words if total_words > 0 else 0
+        Returns:
+            Словарь с результатами анализа (как у analyze_answer)
+        """
+        return await self._aanalyze(
+            'direct', english_phrase, russian_translation, user_answer, context, rich, on_score
+        )
+    
+    async def aanalyze_reverse_answer(
+        self, 
+        russian_phrase: str, 
+        english_translation: str, 
+        user_answer: str,
+        context: Optional[str] = None,
+        rich: bool = False,
+        on_score: Optional[Callable[[float], Awaitable[None]]] = None
+    ) -> Mapping[str, Any]:
+        """
+        Асинхронный вариант analyze_reverse_answer на AsyncOpenAI.
+        
+        Args:
+            russian_phrase: Русская фраза для перевода
+            english_translation: Правильный английский перевод
+            user_answer: Ответ пользователя на английском
+            context: Дополнительный контекст (опционально)
+            rich: Запросить полный разбор (как у analyze_answer)
+            on_score: Корутина, которой передается оценка, как только она
+                появится в потоковом ответе OpenAI - до конца генерации
+                разбора. Вызывается только при запросе к API
             
-            # Определяем тип ошибок
-            meaning_errors = []
-            lexical_errors = []
-            grammar_errors = []  # Только для информации, не влияет на оценку
-            punctuation_errors = []  # Только для информации, не влияет на оценку
-            style_differences = []
+        Returns:
+            Словарь с результатами анализа (как у analyze_reverse_answer)
+        """
+        return await self._aanalyze(
+            'reverse', russian_phrase, english_translation, user_answer, context, rich, on_score
+        )
+    
+    def _analyze(
+        self,
+        direction: str,
+        phrase: str,
+        correct_answer: str,
+        user_answer: str,
+        context: Optional[str] = None,
+        rich: bool = False
+    ) -> Mapping[str, Any]:
+        """
+        Общая реализация analyze_answer и analyze_reverse_answer.
+        
+        Args:
+            direction: Направление перевода ('direct' или 'reverse')
+            phrase: Фраза для перевода
+            correct_answer: Правильный перевод
+            user_answer: Ответ пользователя
+            context: Дополнительный контекст (опционально)
+            rich: Запросить полный разбор ответа
+        """
+        try:
+            analysis_result, cache_key, bucket_key = self._lookup_analysis(
+                direction, phrase, correct_answer, user_answer, context, rich
+            )
+            if analysis_result is not None:
+                return analysis_result
             
-            # Пунктуация НЕ влияет на оценку - только для информации
-            # (убрана проверка пунктуации)
+            response = self.client.chat.completions.create(
+                **self._build_analysis_request(direction, phrase, correct_answer, user_answer, context, rich)
+            )
+            return self._finish_analysis(
+                direction, phrase, response.choices[0].message.content, cache_key, bucket_key, user_answer
+            )
             
-            # Проверяем лексические различия
-            if common_ratio < 0.5:
-                meaning_errors.append("Значительные различия в понимании смысла")
-            elif common_ratio < 0.8:
-                lexical_errors.append("Некоторые ключевые слова переведены неправильно")
-            else:
-                style_differences.append("Незначительные стилистические различия")
+        except Exception as e:
+            logger.error("Ошибка при анализе ответа (%s): %s", direction, e)
+            # Возвращаем базовую оценку в случае ошибки
+            return self._get_fallback_analysis(user_answer, correct_answer)
+    
+    async def _aanalyze(
+        self,
+        direction: str,
+        phrase: str,
+        correct_answer: str,
+        user_answer: str,
+        context: Optional[str] = None,
+        rich: bool = False,
+        on_score: Optional[Callable[[float], Awaitable[None]]] = None
+    ) -> Mapping[str, Any]:
+        """
+        Асинхронный вариант _analyze на AsyncOpenAI (с потоковым ответом при on_score).
+        
+        Кэши опрашиваются через aget/aset, чтобы медленный Redis не блокировал цикл событий.
+        """
+        try:
+            analysis_result, cache_key, bucket_key = await self._alookup_analysis(
+                direction, phrase, correct_answer, user_answer, context, rich
+            )
+            if analysis_result is not None:
+                return analysis_result
             
-            # Определяем балл на основе анализа
-            if common_ratio >= 0.9:
-                score = 0.9
-                feedback = "Отличный перевод с незначительными отличиями"
-            elif common_ratio >= 0.7:
-                score = 0.7
-                feedback = "Хороший перевод с небольшими ошибками"
-            elif common_ratio >= 0.5:
-                score = 0.5
-                feedback = "Частично правильный перевод"
-            elif common_ratio >= 0.3:
-                score = 0.3
-                feedback = "Перевод с серьезными ошибками"
+            request = self._build_analysis_request(direction, phrase, correct_answer, user_answer, context, rich)
+            if on_score is None:
+                response = await self.async_client.chat.completions.create(**request)
+                response_text = response.choices[0].message.content
             else:
-                score = 0.1
-                feedback = "Неправильный перевод"
+                response_text = await self._stream_analysis(request, on_score)
+            
+            return await self._afinish_analysis(
+                direction, phrase, response_text, cache_key, bucket_key, user_answer
+            )
             
-            error_analysis = {
-                'meaning_errors': meaning_errors,
-                'lexical_errors': lexical_errors,
-                'grammar_errors': grammar_errors,
-                'punctuation_errors': punctuation_errors,
-                'style_differences': style_differences
-            }
+        except Exception as e:
+            logger.error("Ошибка при анализе ответа (%s): %s", direction, e)
+            # Возвращаем базовую оценку в случае ошибки
+            return self._get_fallback_analysis(user_answer, correct_answer)
+    
+    def _lookup_analysis(
+        self,
+        direction: str,
+        phrase: str,
+        correct_answer: str,
+        user_answer: str,
+        context: Optional[str],
+        rich: bool = False
+    ) -> Tuple[Optional[Mapping[str, Any]], str, str]:
+        """
+        Ищет результат без запроса к OpenAI: очевидные случаи, затем кэши.
         
+        Returns:
+            (результат или None, ключ кэша, ключ корзины семантического кэша)
+        """
+        # Точное совпадение и пустой ответ оцениваем без запроса к OpenAI
+        shortcut_result = self._get_shortcut_analysis(user_answer, correct_answer)
+        if shortcut_result is not None:
+            return shortcut_result, '', ''
+        
+        cache_key = self._make_cache_key(direction, phrase, correct_answer, user_answer, context, rich)
+        bucket_key = self._make_semantic_bucket_key(direction, phrase, correct_answer, context, rich)
+        return self._get_cached_analysis(cache_key, bucket_key, user_answer), cache_key, bucket_key
+    
+    async def _alookup_analysis(
+        self,
+        direction: str,
+        phrase: str,
+        correct_answer: str,
+        user_answer: str,
+        context: Optional[str],
+        rich: bool = False
+    ) -> Tuple[Optional[Mapping[str, Any]], str, str]:
+        """Асинхронный вариант _lookup_analysis для анализа на цикле событий."""
+        shortcut_result = self._get_shortcut_analysis(user_answer, correct_answer)
+        if shortcut_result is not None:
+            return shortcut_result, '', ''
+        
+        cache_key = self._make_cache_key(direction, phrase, correct_answer, user_answer, context, rich)
+        bucket_key = self._make_semantic_bucket_key(direction, phrase, correct_answer, context, rich)
+        return await self._aget_cached_analysis(cache_key, bucket_key, user_answer), cache_key, bucket_key
+    
+    def _build_analysis_request(
+        self,
+        direction: str,
+        phrase: str,
+        correct_answer: str,
+        user_answer: str,
+        context: Optional[str],
+        rich: bool = False
+    ) -> Dict[str, Any]:
+        """Формирует параметры chat.completions.create для анализа одного ответа."""
         return {
-            'score': score,
-            'feedback': feedback,
-            'confidence': 0.6,
-            'error_analysis': error_analysis,
-            'suggestions': ['Проверьте правильность перевода'],
-            'alternatives': [],
-            'usage_examples': [],
-            'mini_dialogue': [],
-            'note': ''
+            'model': self.model,
+            'messages': [
+                ANALYSIS_DIRECTIONS[direction]['system_message'],
+                {"role": "user", "content": self._create_analysis_prompt(
+                    direction, phrase, correct_answer, user_answer, context, rich
+                )}
+            ],
+            'temperature': ANALYSIS_TEMPERATURE,
+            'max_tokens': RICH_ANALYSIS_MAX_TOKENS if rich else SLIM_ANALYSIS_MAX_TOKENS,
+            'response_format': {"type": "json_object"}  # Ответ гарантированно валидный JSON
         }
     
-    def _get_fallback_reverse_analysis(self, user_answer: str, correct_answer: str) -> Dict[str, any]:
-        """Возвращает улучшенную оценку в случае ошибки AI для обратного анализа."""
-        user_lower = user_answer.lower().strip()
-        correct_lower = correct_answer.lower().strip()
-        
-        # Улучшенный анализ для английского языка
-        if user_lower == correct_lower:
-            score = 1.0
-            feedback = "Правильный перевод!"
-            error_analysis = {
-                'meaning_errors': [],
-                'lexical_errors': [],
-                'grammar_errors': [],
-                'punctuation_errors': [],
-                'style_differences': []
-            }
-        else:
-            # Анализируем различия
-            user_words = set(user_lower.split())
-            correct_words = set(correct_lower.split())
-            
-            common_words = user_words.intersection(correct_words)
-            total_words = len(correct_words)
-            common_ratio = len(common_words) / total_words if total_words > 0 else 0
+    def _finish_analysis(
+        self,
+        direction: str,
+        phrase: str,
+        response_text: str,
+        cache_key: str,
+        bucket_key: str,
+        user_answer: str
+    ) -> Dict[str, Any]:
+        """Разбирает ответ OpenAI и сохраняет результат в кэш."""
+        analysis_result = self._parse_ai_response(response_text)
+        # В кэш попадают только ответы, которые удалось разобрать
+        self._store_analysis(cache_key, bucket_key, user_answer, analysis_result)
+        
+        logger.info(
+            "%s проанализирован: %s -> %s",
+            ANALYSIS_DIRECTIONS[direction]['label'], phrase, analysis_result['score']
+        )
+        return analysis_result
+    
+    async def _afinish_analysis(
+        self,
+        direction: str,
+        phrase: str,
+        response_text: str,
+        cache_key: str,
+        bucket_key: str,
+        user_answer: str
+    ) -> Dict[str, Any]:
+        """Асинхронный вариант _finish_analysis."""
+        analysis_result = self._parse_ai_response(response_text)
+        await self._astore_analysis(cache_key, bucket_key, user_answer, analysis_result)
+        
+        logger.info(
+            "%s проанализирован: %s -> %s",
+            ANALYSIS_DIRECTIONS[direction]['label'], phrase, analysis_result['score']
+        )
+        return analysis_result
+    
+    async def _stream_analysis(
+        self,
+        request: Dict[str, Any],
+        on_score: Callable[[float], Awaitable[None]]
+    ) -> str:
+        """
+        Получает ответ OpenAI потоком и передает оценку в on_score сразу,
+        как только поле score появится в тексте.
+        
+        Returns:
+            Полный текст ответа модели
+        """
+        stream = await self.async_client.chat.completions.create(**request, stream=True)
+        chunks = []
+        score_sent = False
+        
+        async for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            chunks.append(chunk.choices[0].delta.content)
             
-            # Определяем тип ошибок
-            meaning_errors = []
-            lexical_errors = []
-            grammar_errors = []  # Только для информации, не влияет на оценку
-            punctuation_errors = []  # Только для информации, не влияет на оценку
-            style_differences = []
+            if not score_sent:
+                match = SCORE_FIELD_PATTERN.search("".join(chunks))
+                if match:
+                    score_sent = True
+                    try:
+                        await on_score(self._normalize_score(float(match.group(1))))
+                    except Exception as e:
+                        # Ошибка показа предварительной оценки не должна
+                        # прерывать получение полного разбора
+                        logger.warning("Ошибка обработчика предварительной оценки: %s", e)
+        
+        return "".join(chunks)
+    
+    async def analyze_answer_many(
+        self,
+        items: Iterable[Dict[str, str]],
+        concurrency: Optional[int] = None,
+        rich: bool = False
+    ) -> List[Mapping[str, Any]]:
+        """
+        Параллельный анализ нескольких ответов (итоги урока, пересчет оценок).
+        
+        Запросы к OpenAI идут одновременно, но не более concurrency за раз,
+        поэтому K ответов анализируются примерно за время самого долгого
+        запроса, а не за сумму всех.
+        
+        Args:
+            items: Ответы для анализа, каждый - словарь с ключами
+                phrase, correct_answer, user_answer, context (опционально)
+                и direction ('direct' или 'reverse', по умолчанию 'direct')
+            concurrency: Максимум одновременных запросов к OpenAI
+                (по умолчанию OPENAI_BATCH_CONCURRENCY)
+            rich: Запросить полный разбор каждого ответа
             
-            # Грамматика НЕ влияет на оценку - только для информации
-            # (убрана проверка артиклей)
+        Returns:
+            Результаты анализа в порядке items
+        """
+        items = list(items)
+        semaphore = asyncio.Semaphore(concurrency or self.batch_concurrency)
+        
+        async def analyze_one(item: Dict[str, str]) -> Mapping[str, Any]:
+            direction = 'reverse' if item.get('direction') == 'reverse' else 'direct'
+            async with semaphore:
+                return await self._aanalyze(
+                    direction,
+                    item['phrase'],
+                    item['correct_answer'],
+                    item['user_answer'],
+                    item.get('context'),
+                    rich
+                )
+        
+        results = await asyncio.gather(
+            *(analyze_one(item) for item in items),
+            return_exceptions=True
+        )
+        
+        # aanalyze_* сами возвращают fallback при ошибках API, здесь ловим
+        # только некорректные элементы items
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                logger.error("Ошибка при пакетном анализе ответа #%s: %s", index, result)
+                results[index] = self._get_fallback_analysis(
+                    items[index].get('user_answer', ''),
+                    items[index].get('correct_answer', '')
+                )
+        
+        logger.info("Пакетный анализ завершен: %s ответов", len(results))
+        return results
+    
+    async def analyze_answers_batch(
+        self,
+        items: Iterable[Dict[str, str]],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        concurrency: Optional[int] = None,
+        rich: bool = False
+    ) -> List[Mapping[str, Any]]:
+        """
+        Пакетный анализ: до batch_size ответов в одном запросе к OpenAI.
+        
+        System-промпт и рубрика отправляются один раз на пакет, поэтому при
+        ограничении по RPM за минуту проверяется примерно в batch_size раз
+        больше ответов. Пакеты одного направления перевода отправляются
+        параллельно (не более concurrency одновременно).
+        
+        Args:
+            items: Ответы для анализа в формате analyze_answer_many
+            batch_size: Максимум ответов в одном запросе
+            concurrency: Максимум одновременных запросов к OpenAI
+                (по умолчанию OPENAI_BATCH_CONCURRENCY)
+            rich: Запросить полный разбор каждого ответа
             
-            # Пунктуация НЕ влияет на оценку - только для информации
-            # (убрана проверка пунктуации)
+        Returns:
+            Результаты анализа в порядке items
+        """
+        items = list(items)
+        results: List[Optional[Mapping[str, Any]]] = [None] * len(items)
+        pending = {'direct': [], 'reverse': []}
+        
+        # Очевидные случаи и кэш обрабатываем без запроса к OpenAI
+        for index, item in enumerate(items):
+            direction = 'reverse' if item.get('direction') == 'reverse' else 'direct'
+            results[index], cache_key, bucket_key = await self._alookup_analysis(
+                direction, item['phrase'], item['correct_answer'], item['user_answer'], item.get('context'), rich
+            )
+            if results[index] is None:
+                pending[direction].append((index, cache_key, bucket_key))
+        
+        semaphore = asyncio.Semaphore(concurrency or self.batch_concurrency)
+        
+        async def analyze_chunk(direction: str, chunk: List[Tuple[int, str, str]]) -> None:
+            async with semaphore:
+                chunk_results = await self._request_batch_analysis(
+                    direction, [items[index] for index, _, _ in chunk], rich
+                )
+            for (index, cache_key, bucket_key), analysis_result in zip(chunk, chunk_results):
+                if analysis_result is None:
+                    item = items[index]
+                    results[index] = self._get_fallback_analysis(item['user_answer'], item['correct_answer'])
+                else:
+                    await self._astore_analysis(cache_key, bucket_key, items[index]['user_answer'], analysis_result)
+                    results[index] = analysis_result
+        
+        await asyncio.gather(*(
+            analyze_chunk(direction, entries[start:start + batch_size])
+            for direction, entries in pending.items()
+            for start in range(0, len(entries), batch_size)
+        ))
+        
+        logger.info(
+            "Пакетный анализ завершен: %s ответов, %s отправлено в OpenAI",
+            len(items), len(pending['direct']) + len(pending['reverse'])
+        )
+        return results
+    
+    async def _request_batch_analysis(
+        self,
+        direction: str,
+        chunk: List[Dict[str, str]],
+        rich: bool = False
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Отправляет один пакетный запрос и разбирает массив results.
+        
+        Returns:
+            Результаты в порядке chunk; None для ответов, которые не удалось разобрать
+        """
+        count = len(chunk)
+        parts = [BATCH_PROMPT_HEADER.format(count=count)]
+        for number, item in enumerate(chunk, start=1):
+            parts.append(BATCH_PROMPT_ITEM.format(
+                index=number,
+                phrase=item['phrase'],
+                correct_answer=item['correct_answer'],
+                user_answer=item['user_answer']
+            ))
+            if item.get('context'):
+                parts.append("   " + CONTEXT_PROMPT_LINE.format(context=item['context']))
+        parts.append(ANALYSIS_DIRECTIONS[direction]['rubric' if rich else 'slim_rubric'])
+        parts.append(BATCH_PROMPT_FOOTER.format(count=count))
+        
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    ANALYSIS_DIRECTIONS[direction]['system_message'],
+                    {"role": "user", "content": "".join(parts)}
+                ],
+                temperature=ANALYSIS_TEMPERATURE,
+                max_tokens=(RICH_ANALYSIS_MAX_TOKENS if rich else SLIM_ANALYSIS_MAX_TOKENS) * count,
+                response_format={"type": "json_object"}
+            )
+            raw_results = _json.loads(response.choices[0].message.content)['results']
+        except Exception as e:
+            logger.error("Ошибка пакетного запроса (%s ответов): %s", count, e)
+            return [None] * count
+        
+        # Сопоставляем по полю index, а если модель его не вернула - по позиции
+        by_index: Dict[int, Dict[str, Any]] = {}
+        for position, raw_result in enumerate(raw_results, start=1):
+            if not isinstance(raw_result, dict):
+                continue
+            number = raw_result.get('index', position)
+            if isinstance(number, int) and 1 <= number <= count:
+                by_index.setdefault(number, raw_result)
+        
+        chunk_results: List[Optional[Dict[str, Any]]] = []
+        for number in range(1, count + 1):
+            try:
+                chunk_results.append(self._build_analysis_result(by_index[number]))
+            except Exception as e:
+                logger.warning("Нет корректной оценки для ответа #%s в пакете: %s", number, e)
+                chunk_results.append(None)
+        return chunk_results
+    
+    def _get_shortcut_analysis(self, user_answer: str, correct_answer: str) -> Optional[Mapping[str, Any]]:
+        """
+        Возвращает оценку для очевидных случаев без обращения к OpenAI.
+        
+        Args:
+            user_answer: Ответ пользователя
+            correct_answer: Правильный перевод
             
-            # Проверяем лексические различия
-            if common_ratio < 0.5:
-                meaning_errors.append("Значительные различия в понимании смысла")
-            elif common_ratio < 0.8:
-                lexical_errors.append("Некоторые ключевые слова переведены неправильно")
-            else:
-                style_differences.append("Незначительные стилистические различия")
+        Returns:
+            Неизменяемый результат анализа для точного совпадения (1.0)
+            или пустого ответа (0.0), иначе None
+        """
+        user_normalized = self._normalize_answer_text(user_answer)
+        
+        if user_normalized == self._normalize_answer_text(correct_answer):
+            analysis_result = SHORTCUT_CORRECT_ANALYSIS
+        elif not user_normalized:
+            analysis_result = SHORTCUT_EMPTY_ANALYSIS
+        else:
+            return None
+        
+        logger.debug("Ответ оценен без запроса к AI: %s", analysis_result['score'])
+        return analysis_result
+    
+    @staticmethod
+    def _normalize_answer_text(text: str) -> str:
+        """
+        Приводит ответ к виду для сравнения: без регистра, пунктуации и лишних пробелов.
+        
+        Пунктуация и регистр не влияют на оценку (см. SYSTEM_PROMPT), поэтому
+        "Hello, world!" и "hello world" считаются одинаковыми ответами.
+        """
+        return ' '.join(text.casefold().translate(PUNCTUATION_TABLE).split())
+    
+    def _make_cache_key(
+        self,
+        direction: str,
+        phrase: str,
+        correct_answer: str,
+        user_answer: str,
+        context: Optional[str] = None,
+        rich: bool = False
+    ) -> str:
+        """
+        Формирует ключ кэша результатов (без учета регистра и крайних пробелов).
+        
+        Ответ пользователя нормализуется как в _get_shortcut_analysis: ответы,
+        отличающиеся только пунктуацией и пробелами, попадают в точный кэш
+        без обращения к семантическому.
+        """
+        return AIResponseCache.make_key(
+            direction=direction,
+            model=self.model,
+            prompt_version=PROMPT_VERSION,
+            rich=rich,
+            phrase=phrase.strip().lower(),
+            correct_answer=correct_answer.strip().lower(),
+            user_answer=self._normalize_answer_text(user_answer),
+            context=(context or '').strip().lower()
+        )
+    
+    def _make_semantic_bucket_key(
+        self,
+        direction: str,
+        phrase: str,
+        correct_answer: str,
+        context: Optional[str] = None,
+        rich: bool = False
+    ) -> str:
+        """Формирует ключ корзины семантического кэша (все, кроме ответа пользователя)."""
+        return AIResponseCache.make_key(
+            direction=direction,
+            model=self.model,
+            prompt_version=PROMPT_VERSION,
+            rich=rich,
+            phrase=phrase.strip().lower(),
+            correct_answer=correct_answer.strip().lower(),
+            context=(context or '').strip().lower()
+        )
+    
+    def _get_cached_analysis(self, cache_key: str, bucket_key: str, user_answer: str) -> Optional[Dict[str, Any]]:
+        """Ищет результат сначала по точному ключу, затем в семантическом кэше."""
+        analysis_result = self.response_cache.get(cache_key)
+        if analysis_result is None and self.semantic_cache is not None:
+            analysis_result = self.semantic_cache.get(bucket_key, user_answer)
+        return analysis_result
+    
+    def _store_analysis(self, cache_key: str, bucket_key: str, user_answer: str, analysis_result: Dict[str, Any]) -> None:
+        """Сохраняет разобранный результат во все включенные кэши."""
+        self.response_cache.set(cache_key, analysis_result)
+        if self.semantic_cache is not None:
+            self.semantic_cache.set(bucket_key, user_answer, analysis_result)
+    
+    async def _aget_cached_analysis(self, cache_key: str, bucket_key: str, user_answer: str) -> Optional[Dict[str, Any]]:
+        """Асинхронный вариант _get_cached_analysis."""
+        analysis_result = await self.response_cache.aget(cache_key)
+        if analysis_result is None and self.semantic_cache is not None:
+            analysis_result = await self.semantic_cache.aget(bucket_key, user_answer)
+        return analysis_result
+    
+    async def _astore_analysis(self, cache_key: str, bucket_key: str, user_answer: str, analysis_result: Dict[str, Any]) -> None:
+        """Асинхронный вариант _store_analysis."""
+        await self.response_cache.aset(cache_key, analysis_result)
+        if self.semantic_cache is not None:
+            await self.semantic_cache.aset(bucket_key, user_answer, analysis_result)
+    
+    def _create_analysis_prompt(
+        self, 
+        direction: str,
+        phrase: str, 
+        correct_answer: str, 
+        user_answer: str, 
+        context: Optional[str] = None,
+        rich: bool = False
+    ) -> str:
+        """Создает промпт для OpenAI API для заданного направления перевода."""
+        prompts = ANALYSIS_DIRECTIONS[direction]
+        header = prompts['header'].format(
+            phrase=phrase,
+            correct_answer=correct_answer,
+            user_answer=user_answer
+        )
+        context_line = CONTEXT_PROMPT_LINE.format(context=context) if context else ""
+        return header + context_line + prompts['rubric' if rich else 'slim_rubric']
+    
+    def _parse_ai_response(self, response_text: str) -> Dict[str, Any]:
+        """
+        Парсит ответ от OpenAI API.
+        
+        Raises:
+            msgspec.DecodeError: Если ответ не является корректным JSON
+            msgspec.ValidationError: Если в ответе нет score или поля имеют неверный тип
+        """
+        try:
+            # Запросы идут в JSON mode (response_format=json_object),
+            # поэтому ответ целиком является JSON-объектом
+            return self._build_analysis_result(ANALYSIS_RESPONSE_DECODER.decode(response_text))
             
-            # Определяем балл на основе анализа
-            if common_ratio >= 0.9:
-                score = 0.9
-                feedback = "Отличный перевод с незначительными отличиями"
-            elif common_ratio >= 0.7:
-                score = 0.7
-                feedback = "Хороший перевод с небольшими ошибками"
-            elif common_ratio >= 0.5:
-                score = 0.5
-                feedback = "Частично правильный перевод"
-            elif common_ratio >= 0.3:
-                score = 0.3
-                feedback = "Перевод с серьезными ошибками"
-            else:
-                score = 0.1
-                feedback = "Неправильный перевод"
+        except Exception as e:
+            # Вызывающий метод сам вернет fallback-оценку по реальному ответу пользователя
+            logger.warning("Ошибка парсинга ответа AI: %s", e)
+            raise
+    
+    def _build_analysis_result(self, result: Union[AnalysisResponse, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Приводит ответ модели по одному ответу пользователя к формату анализа.
+        
+        Args:
+            result: Разобранный AnalysisResponse или словарь из пакетного ответа
             
-            error_analysis = {
-                'meaning_errors': meaning_errors,
-                'lexical_errors': lexical_errors,
-                'grammar_errors': grammar_errors,
-                'punctuation_errors': punctuation_errors,
-                'style_differences': style_differences
-            }
+        Raises:
+            msgspec.ValidationError: Если в ответе нет score или поля имеют неверный тип
+        """
+        if not isinstance(result, AnalysisResponse):
+            result = msgspec.convert(result, AnalysisResponse, strict=False)
+        
+        # Нормализуем score с новой гибридной системой
+        logger.debug("[START_FUNCTION][_build_analysis_result] Исходный score: %s", result.score)
+        normalized_score = self._normalize_score(result.score)
+        logger.debug("[END_FUNCTION][_build_analysis_result] Нормализованный score: %s", normalized_score)
         
         return {
-            'score': score,
-            'feedback': feedback,
-            'confidence': 0.6,
-            'error_analysis': error_analysis,
-            'suggestions': ['Проверьте правильность перевода'],
-            'alternatives': [],
-            'usage_examples': [],
-            'mini_dialogue': [],
-            'note': ''
+            'score': normalized_score,
+            'feedback': result.feedback,
+            'confidence': result.confidence,
+            'error_analysis': msgspec.structs.asdict(result.error_analysis),
+            'suggestions': result.suggestions,
+            'alternatives': result.alternatives[:3],
+            'usage_examples': result.usage_examples[:2],
+            'mini_dialogue': result.mini_dialogue[:4],
+            'note': result.note.strip()
         }
     
-    def get_learning_suggestions(self, phrase_difficulty: str, user_level: str) -> list:
+    def _normalize_score(self, score: float) -> float:
+        """Нормализует score к шкале SCORE_LEVELS (см. scoring.normalize_score)."""
+        return normalize_score(score)
+    
+    def _get_fallback_analysis(self, user_answer: str, correct_answer: str) -> Mapping[str, Any]:
+        """
+        Возвращает улучшенную оценку в случае ошибки AI.
+        
+        Используется для обоих направлений перевода: сравнение идет по словам
+        ответа и правильного варианта, язык значения не имеет. Результат
+        неизменяемый и кэшируется по паре (ответ, правильный вариант).
+        """
+        # Пустой ответ: не строим нормализованные копии строк
+        if not user_answer or not user_answer.strip():
+            return FALLBACK_EMPTY_ANALYSIS
+        return _build_fallback_analysis(user_answer, correct_answer)
+    
+    def get_learning_suggestions(self, phrase_difficulty: str, user_level: str) -> List[str]:
         """
         Получает персональные рекомендации по изучению.
         
@@ -716,39 +1367,39 @@ class AIAnalyzer:
             Список рекомендаций
         """
         try:
-            prompt = f"""
-Дай 3-5 конкретных рекомендаций для изучения фразы сложности "{phrase_difficulty}" 
-для пользователя уровня "{user_level}".
-
-Формат: простой список рекомендаций на русском языке.
-"""
+            prompt = SUGGESTIONS_PROMPT_TEMPLATE.format(
+                phrase_difficulty=phrase_difficulty,
+                user_level=user_level
+            )
             
             # Используем клиент из __init__
-            # Если клиент не создан, создаем его здесь
-            if self.client is None:
-                self.client = OpenAI(api_key=self.api_key)
-            
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "Ты - опытный преподаватель английского языка."},
+                    SUGGESTIONS_SYSTEM_MESSAGE,
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
                 max_tokens=500
             )
             
-            suggestions = response.choices[0].message.content.strip().split('\n')
-            # Фильтруем пустые строки и форматируем
-            suggestions = [s.strip() for s in suggestions if s.strip() and not s.startswith('-')]
+            lines = response.choices[0].message.content.strip().split('\n')
+            # Фильтруем пустые строки и маркеры списка (strip один раз на строку)
+            suggestions = []
+            for line in lines:
+                text = line.strip()
+                if text and not text.startswith(('-', '*', '•')):
+                    suggestions.append(text)
+                    if len(suggestions) == 5:  # Максимум 5 рекомендаций
+                        break
             
-            return suggestions[:5]  # Максимум 5 рекомендаций
+            return suggestions
             
         except Exception as e:
-            logger.error(f"Ошибка при получении рекомендаций: {e}")
+            logger.error("Ошибка при получении рекомендаций: %s", e)
             return self._get_default_suggestions(phrase_difficulty)
     
-    def _get_default_suggestions(self, difficulty: str) -> list:
+    def _get_default_suggestions(self, difficulty: str) -> List[str]:
         """Возвращает стандартные рекомендации по сложности."""
         suggestions = {
             'easy': [
@@ -770,28 +1421,40 @@ class AIAnalyzer:
         
         return suggestions.get(difficulty, suggestions['medium'])
     
-    def test_connection(self) -> bool:
-        """Тестирует подключение к OpenAI API."""
+    def test_connection(self, force: bool = False) -> bool:
+        """
+        Тестирует подключение к OpenAI API.
+        
+        Запрос к API выполняется только при первой проверке: успешный результат
+        запоминается до конца процесса, неудачный - на CONNECTION_CHECK_RETRY_SECONDS.
+        
+        Args:
+            force: Выполнить запрос к API, не используя сохраненный результат
+        """
+        if not force and self._connection_ok is not None:
+            if self._connection_ok or time.monotonic() - self._connection_checked_at < CONNECTION_CHECK_RETRY_SECONDS:
+                return self._connection_ok
+        
         try:
-            # Используем клиент из __init__
-            # Если клиент не создан, создаем его здесь
-            if self.client is None:
-                self.client = OpenAI(api_key=self.api_key)
-            
-            response = self.client.chat.completions.create(
+            self.client.chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": "Hello"}],
                 max_tokens=5
             )
             logger.info("Подключение к OpenAI API успешно")
-            return True
+            self._connection_ok = True
         except Exception as e:
-            logger.error(f"Ошибка подключения к OpenAI API: {e}")
-            return False
+            logger.error("Ошибка подключения к OpenAI API: %s", e)
+            self._connection_ok = False
+        
+        self._connection_checked_at = time.monotonic()
+        return self._connection_ok
 # endregion CLASS AIAnalyzer
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    
     # Тестирование модуля
     analyzer = AIAnalyzer()
     
@@ -0,0 +1,447 @@
+"""
+Модуль: ai_cache.py
+
+Назначение:
+    Кэш результатов AI-анализа ответов пользователей.
+    Повторный анализ того же ответа на ту же фразу возвращается из памяти
+    без запроса к OpenAI API.
+
+Классы:
+    - CacheBackend: Интерфейс кэша результатов (get/set)
+    - AIResponseCache: LRU-кэш в памяти процесса с ограничением времени жизни записей
+    - RedisResponseCache: Общий для всех процессов бота кэш в Redis (опционально)
+    - SemanticAnswerCache: Кэш по смысловой близости ответов (опционально)
+
+Функции:
+    - create_response_cache: Выбирает Redis или память в зависимости от настроек
+"""
+
+import asyncio
+import copy
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Protocol, Tuple
+
+from . import _json
+
+logger = logging.getLogger(__name__)
+
+# region Константы
+DEFAULT_MAX_SIZE = 10000  # Максимум записей в кэше (LRU-вытеснение)
+DEFAULT_TTL_SECONDS = 86400  # Время жизни записи (24 часа)
+REDIS_KEY_PREFIX = "ai:exact:"  # Префикс ключей результатов в Redis
+# Таймауты Redis: недоступный кэш должен давать промах за доли секунды,
+# а не держать обработку ответа до системного таймаута TCP
+REDIS_SOCKET_TIMEOUT_SECONDS = 0.5
+REDIS_CONNECT_TIMEOUT_SECONDS = 0.5
+
+# Семантический кэш: строгий порог, чтобы не путать близкие синонимы при оценке
+DEFAULT_SEMANTIC_THRESHOLD = 0.92
+# Многоязычная модель: в направлении 'direct' оцениваются ответы на русском
+DEFAULT_EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+DEFAULT_MAX_BUCKETS = 1000  # Максимум фраз в семантическом кэше
+DEFAULT_MAX_ENTRIES_PER_BUCKET = 50  # Максимум ответов на одну фразу
+EMBEDDING_MEMO_SIZE = 1024  # Последние эмбеддинги ответов
+# endregion
+
+
+# region CLASS CacheBackend
+class CacheBackend(Protocol):
+    """
+    Интерфейс кэша результатов: AIResponseCache и RedisResponseCache взаимозаменяемы.
+    
+    aget/aset вызываются из асинхронного анализа и не блокируют цикл событий.
+    """
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Возвращает сохраненный результат или None."""
+        ...
+    
+    def set(self, key: str, result: Dict) -> None:
+        """Сохраняет результат анализа."""
+        ...
+    
+    async def aget(self, key: str) -> Optional[Dict]:
+        """Асинхронный вариант get."""
+        ...
+    
+    async def aset(self, key: str, result: Dict) -> None:
+        """Асинхронный вариант set."""
+        ...
+# endregion CLASS CacheBackend
+
+
+# region CLASS AIResponseCache
+class AIResponseCache:
+    """
+    LRU-кэш результатов AI-анализа с точным совпадением ключа.
+    
+    Ключ - SHA256 от нормализованных входных данных запроса,
+    значение - уже разобранный и нормализованный словарь с результатом.
+    """
+    
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        """
+        Инициализация кэша.
+        
+        Args:
+            max_size: Максимальное количество записей
+            ttl_seconds: Время жизни записи в секундах
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # ключ -> (время сохранения, результат анализа)
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+    
+    @staticmethod
+    def make_key(**parts: str) -> str:
+        """
+        Формирует ключ кэша из частей запроса.
+        
+        Args:
+            **parts: Части запроса (модель, версия промпта, фраза, ответ и т.д.)
+            
+        Returns:
+            Hex-строка SHA256 от частей запроса
+        """
+        payload = _json.dumps_sorted(parts)
+        return hashlib.sha256(payload).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Возвращает копию сохраненного результата или None.
+        
+        Args:
+            key: Ключ, полученный из make_key
+            
+        Returns:
+            Результат анализа или None, если записи нет или она устарела
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        stored_at, result = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        
+        self._entries.move_to_end(key)
+        logger.debug("Результат анализа взят из кэша")
+        # Копия, чтобы вызывающий код не мог изменить сохраненный результат
+        return copy.deepcopy(result)
+    
+    def set(self, key: str, result: Dict) -> None:
+        """
+        Сохраняет результат анализа.
+        
+        Args:
+            key: Ключ, полученный из make_key
+            result: Разобранный результат анализа
+        """
+        self._entries[key] = (time.monotonic(), copy.deepcopy(result))
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    async def aget(self, key: str) -> Optional[Dict]:
+        """Асинхронный вариант get: словарь в памяти не блокирует цикл событий."""
+        return self.get(key)
+    
+    async def aset(self, key: str, result: Dict) -> None:
+        """Асинхронный вариант set."""
+        self.set(key, result)
+    
+    def clear(self) -> None:
+        """Очищает кэш."""
+        self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+# endregion CLASS AIResponseCache
+
+
+# region CLASS RedisResponseCache
+class RedisResponseCache:
+    """
+    Кэш результатов AI-анализа в Redis, общий для всех процессов и реплик бота.
+    
+    Ключи совпадают с AIResponseCache.make_key (с префиксом REDIS_KEY_PREFIX),
+    значения хранятся как JSON со сроком жизни ttl_seconds. Ошибки и таймауты
+    Redis не прерывают анализ: get возвращает None, set пропускается.
+    Асинхронный анализ использует отдельный клиент redis.asyncio (aget/aset).
+    
+    Требует опциональной зависимости redis.
+    
+    Raises:
+        ImportError: Если пакет redis не установлен
+    """
+    
+    def __init__(self, url: str, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        """
+        Инициализация кэша.
+        
+        Args:
+            url: Адрес Redis (redis://host:port/db)
+            ttl_seconds: Время жизни записи в секундах
+        """
+        import redis
+        import redis.asyncio
+        
+        self.ttl_seconds = int(ttl_seconds)
+        timeouts = {
+            'socket_timeout': REDIS_SOCKET_TIMEOUT_SECONDS,
+            'socket_connect_timeout': REDIS_CONNECT_TIMEOUT_SECONDS,
+        }
+        # Пул соединений внутри клиента переиспользуется всеми запросами
+        self._redis = redis.Redis.from_url(url, **timeouts)
+        self._async_redis = redis.asyncio.Redis.from_url(url, **timeouts)
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Возвращает сохраненный результат или None.
+        
+        Args:
+            key: Ключ, полученный из AIResponseCache.make_key
+        """
+        try:
+            payload = self._redis.get(REDIS_KEY_PREFIX + key)
+        except Exception as e:
+            logger.warning("Ошибка чтения кэша Redis: %s", e)
+            return None
+        
+        if payload is None:
+            return None
+        return _json.loads(payload)
+    
+    def set(self, key: str, result: Dict) -> None:
+        """
+        Сохраняет результат со сроком жизни ttl_seconds.
+        
+        Args:
+            key: Ключ, полученный из AIResponseCache.make_key
+            result: Разобранный результат анализа
+        """
+        try:
+            self._redis.set(REDIS_KEY_PREFIX + key, _json.dumps_sorted(result), ex=self.ttl_seconds)
+        except Exception as e:
+            logger.warning("Ошибка записи в кэш Redis: %s", e)
+    
+    async def aget(self, key: str) -> Optional[Dict]:
+        """Асинхронный вариант get на клиенте redis.asyncio."""
+        try:
+            payload = await self._async_redis.get(REDIS_KEY_PREFIX + key)
+        except Exception as e:
+            logger.warning("Ошибка чтения кэша Redis: %s", e)
+            return None
+        
+        if payload is None:
+            return None
+        return _json.loads(payload)
+    
+    async def aset(self, key: str, result: Dict) -> None:
+        """Асинхронный вариант set на клиенте redis.asyncio."""
+        try:
+            await self._async_redis.set(REDIS_KEY_PREFIX + key, _json.dumps_sorted(result), ex=self.ttl_seconds)
+        except Exception as e:
+            logger.warning("Ошибка записи в кэш Redis: %s", e)
+    
+    def delete(self, key: str) -> None:
+        """Удаляет запись из кэша."""
+        try:
+            self._redis.delete(REDIS_KEY_PREFIX + key)
+        except Exception as e:
+            logger.warning("Ошибка удаления из кэша Redis: %s", e)
+# endregion CLASS RedisResponseCache
+
+
+# region FUNCTION create_response_cache
+def create_response_cache(redis_url: Optional[str] = None) -> CacheBackend:
+    """
+    Создает кэш результатов: Redis, если задан адрес и установлен пакет redis,
+    иначе LRU-кэш в памяти процесса.
+    
+    Args:
+        redis_url: Адрес Redis (REDIS_URL) или None
+    """
+    if redis_url:
+        try:
+            cache = RedisResponseCache(redis_url)
+            logger.info("Кэш результатов AI: Redis")
+            return cache
+        except ImportError:
+            logger.warning("Пакет redis не установлен, используется кэш в памяти")
+    return AIResponseCache()
+# endregion FUNCTION create_response_cache
+
+
+# region CLASS SemanticAnswerCache
+class SemanticAnswerCache:
+    """
+    Семантический кэш результатов анализа для близких по смыслу ответов.
+    
+    Ответы группируются по корзинам (фраза + направление перевода + модель),
+    внутри корзины ищется сохраненный ответ с косинусным сходством
+    эмбеддингов не ниже порога. Между разными фразами результаты
+    никогда не переиспользуются.
+    
+    Требует опциональных зависимостей sentence-transformers и numpy.
+    
+    Raises:
+        ImportError: Если sentence-transformers или numpy не установлены
+    """
+    
+    def __init__(
+        self,
+        threshold: float = DEFAULT_SEMANTIC_THRESHOLD,
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        max_buckets: int = DEFAULT_MAX_BUCKETS,
+        max_entries_per_bucket: int = DEFAULT_MAX_ENTRIES_PER_BUCKET
+    ):
+        """
+        Инициализация семантического кэша.
+        
+        Args:
+            threshold: Минимальное косинусное сходство для попадания в кэш
+            model_name: Имя модели sentence-transformers
+            max_buckets: Максимум корзин (фраз) в кэше (LRU-вытеснение)
+            max_entries_per_bucket: Максимум ответов в одной корзине
+        """
+        import numpy
+        from sentence_transformers import SentenceTransformer
+        
+        self._np = numpy
+        self._model = SentenceTransformer(model_name)
+        self.threshold = threshold
+        self.max_buckets = max_buckets
+        self.max_entries_per_bucket = max_entries_per_bucket
+        # корзина -> (матрица нормализованных эмбеддингов, список результатов)
+        self._buckets: "OrderedDict[str, Tuple[object, List[Dict]]]" = OrderedDict()
+        # текст -> эмбеддинг: get и set для одного ответа кодируют его один раз
+        self._embeddings: "OrderedDict[str, object]" = OrderedDict()
+        
+        logger.info("Семантический кэш инициализирован: модель %s, порог %s", model_name, threshold)
+    
+    def _encode(self, normalized_text: str):
+        """Кодирует текст моделью: нормализованный эмбеддинг float32."""
+        return self._model.encode(
+            normalized_text,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype(self._np.float32)
+    
+    def _remember(self, normalized_text: str, embedding) -> None:
+        """Сохраняет эмбеддинг в memo последних ответов."""
+        self._embeddings[normalized_text] = embedding
+        while len(self._embeddings) > EMBEDDING_MEMO_SIZE:
+            self._embeddings.popitem(last=False)
+    
+    def _embed(self, text: str):
+        """Возвращает нормализованный эмбеддинг текста (float32)."""
+        normalized_text = text.strip().casefold()
+        embedding = self._embeddings.get(normalized_text)
+        if embedding is not None:
+            self._embeddings.move_to_end(normalized_text)
+            return embedding
+        
+        embedding = self._encode(normalized_text)
+        self._remember(normalized_text, embedding)
+        return embedding
+    
+    async def _aembed(self, text: str):
+        """
+        Асинхронный вариант _embed: модель считает эмбеддинг в отдельном потоке,
+        memo меняется только на цикле событий.
+        """
+        normalized_text = text.strip().casefold()
+        embedding = self._embeddings.get(normalized_text)
+        if embedding is not None:
+            self._embeddings.move_to_end(normalized_text)
+            return embedding
+        
+        embedding = await asyncio.to_thread(self._encode, normalized_text)
+        self._remember(normalized_text, embedding)
+        return embedding
+    
+    def get(self, bucket_key: str, user_answer: str) -> Optional[Dict]:
+        """
+        Ищет результат анализа для близкого по смыслу ответа.
+        
+        Args:
+            bucket_key: Ключ корзины (фраза + направление + модель)
+            user_answer: Ответ пользователя
+            
+        Returns:
+            Копия результата анализа или None
+        """
+        if bucket_key not in self._buckets:
+            return None
+        return self._match(bucket_key, self._embed(user_answer))
+    
+    async def aget(self, bucket_key: str, user_answer: str) -> Optional[Dict]:
+        """Асинхронный вариант get: кодирование ответа не блокирует цикл событий."""
+        if bucket_key not in self._buckets:
+            return None
+        embedding = await self._aembed(user_answer)
+        return self._match(bucket_key, embedding)
+    
+    def _match(self, bucket_key: str, embedding) -> Optional[Dict]:
+        """Ищет в корзине результат, сходство эмбеддинга с которым не ниже порога."""
+        bucket = self._buckets.get(bucket_key)
+        # Корзину могли вытеснить, пока эмбеддинг считался в потоке
+        if bucket is None:
+            return None
+        
+        matrix, results = bucket
+        similarities = matrix @ embedding
+        best_index = int(similarities.argmax())
+        
+        if similarities[best_index] < self.threshold:
+            return None
+        
+        self._buckets.move_to_end(bucket_key)
+        logger.debug("Семантический кэш: сходство %.3f", similarities[best_index])
+        return copy.deepcopy(results[best_index])
+    
+    def set(self, bucket_key: str, user_answer: str, result: Dict) -> None:
+        """
+        Сохраняет результат анализа ответа в корзину.
+        
+        Args:
+            bucket_key: Ключ корзины (фраза + направление + модель)
+            user_answer: Ответ пользователя
+            result: Разобранный результат анализа
+        """
+        self._add(bucket_key, self._embed(user_answer), result)
+    
+    async def aset(self, bucket_key: str, user_answer: str, result: Dict) -> None:
+        """Асинхронный вариант set: кодирование ответа не блокирует цикл событий."""
+        embedding = await self._aembed(user_answer)
+        self._add(bucket_key, embedding, result)
+    
+    def _add(self, bucket_key: str, embedding, result: Dict) -> None:
+        """Добавляет эмбеддинг ответа и результат в корзину."""
+        embedding = embedding[self._np.newaxis, :]
+        bucket = self._buckets.get(bucket_key)
+        
+        if bucket is None:
+            matrix, results = embedding, [copy.deepcopy(result)]
+        else:
+            matrix, results = bucket
+            matrix = self._np.vstack((matrix, embedding))[-self.max_entries_per_bucket:]
+            results = (results + [copy.deepcopy(result)])[-self.max_entries_per_bucket:]
+        
+        self._buckets[bucket_key] = (matrix, results)
+        self._buckets.move_to_end(bucket_key)
+        
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Очищает кэш."""
+        self._buckets.clear()
+        self._embeddings.clear()
+# endregion CLASS SemanticAnswerCache
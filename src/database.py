@@ -14,30 +14,226 @@
 Функции:
     - create_tables(): Создает все необходимые таблицы
     - add_phrase(): Добавляет новую фразу в БД
+    - add_phrases(): Добавляет несколько фраз одной транзакцией
+    - bulk_load_phrases(): Массовая загрузка фраз с перестроением индексов после вставки
+    - sync_phrases(): Добавляет и обновляет фразы из Google Sheets одной транзакцией
     - get_random_phrase(): Получает случайную фразу для изучения
     - update_progress(): Обновляет прогресс пользователя
     - update_phrase_progress(): Обновляет общий прогресс изучения фразы
     - get_statistics(): Получает статистику обучения
     - get_learning_progress(): Получает прогресс по конкретной фразе
+    - get_phrase(): Получает фразу по ID
+    - count_phrases(): Считает все фразы в БД
+    - get_phrase_progress_many(): Получает прогресс нескольких фраз пачками
+    - iter_phrases(): Выдает фразы по одной без построения списка
     - get_learned_phrases_stats(): Получает статистику изученных фраз
 
 Константы:
-    - DATABASE_NAME: Имя файла базы данных
     - MAX_SCORE: Максимальный балл для выученной фразы
 """
 
 import sqlite3
 import logging
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
 import math
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, List, Dict, Tuple
-from datetime import datetime, timedelta
+from typing import Deque, Optional, List, Dict, Set, Tuple, Iterable, Iterator, Sequence
 import random
 
+from cachetools import TTLCache
+
+from config.config import DATABASE_PATH, LEARNED_SCORE_THRESHOLD
+
 # region Константы
-DATABASE_NAME = "english_learning.db"
 MAX_SCORE = 3
 PARTIAL_SCORE = 0.5
+# Таймаут ожидания блокировки БД другим процессом (например, синхронизацией), сек
+CONNECTION_TIMEOUT_SECONDS = 10
+# Настройки соединения: WAL не блокирует чтения во время записи,
+# synchronous=NORMAL в режиме WAL не теряет целостность, кэш страниц ~64 МБ,
+# чтения страниц через mmap (до 256 МБ) без копирования в кэш SQLite
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA temp_store=MEMORY;",
+    "PRAGMA cache_size=-64000;",
+    f"PRAGMA mmap_size={MMAP_SIZE_BYTES};",
+    "PRAGMA busy_timeout=10000;",
+)
+# Применяются только при создании нового файла БД (до первой таблицы):
+# страница 8 КБ - меньше обращений к B-дереву при чтении, incremental auto_vacuum
+# позволяет возвращать место после удалений через incremental_vacuum()
+NEW_DATABASE_PRAGMAS = (
+    "PRAGMA page_size=8192;",
+    "PRAGMA auto_vacuum=INCREMENTAL;",
+)
+# Сколько страниц освобождает incremental_vacuum() за один вызов
+INCREMENTAL_VACUUM_PAGES = 1000
+# Пул соединений только для чтения: в режиме WAL читатели не блокируют
+# друг друга и единственного писателя
+READ_POOL_SIZE = 4
+READ_CONNECTION_PRAGMAS = (
+    "PRAGMA temp_store=MEMORY;",
+    "PRAGMA cache_size=-64000;",
+    f"PRAGMA mmap_size={MMAP_SIZE_BYTES};",
+    "PRAGMA busy_timeout=10000;",
+)
+# Размер кэша подготовленных выражений на соединение: все запросы модуля
+# помещаются в кэш, повторный вызов не разбирает и не планирует SQL заново
+STATEMENT_CACHE_SIZE = 256
+# Кэш результатов get_learning_progress / get_all_phrases: сбрасывается при каждой
+# записи через DatabaseManager, TTL ограничивает устаревание от записей других процессов
+READ_CACHE_SIZE = 1024
+READ_CACHE_TTL_SECONDS = 5
+# Сколько секунд get_random_phrase переиспользует подсчитанное число доступных фраз
+ELIGIBLE_COUNT_TTL_SECONDS = 5.0
+# Строк в одном многострочном INSERT фраз: 3 параметра на строку, в пределах
+# лимита 999 параметров старых сборок SQLite
+PHRASE_INSERT_BATCH_ROWS = 300
+# Сколько значений передается в одном IN (...) при пакетном чтении (_lookup_batches).
+# Пачки дополняются NULL до степени двойки, поэтому текстов запроса не больше
+# log2(PHRASE_LOOKUP_BATCH_SIZE) + 1 и они не вытесняют из кэша выражений остальные
+PHRASE_LOOKUP_BATCH_SIZE = 512
+# Сколько случайных фраз get_random_phrase выбирает за один запрос к БД
+RANDOM_PHRASE_PREFETCH = 16
+# Случайные фразы по номерам строк среди доступных пользователю (_pick_eligible_phrases).
+# Окно нумерует только id, тексты читаются лишь для выбранных строк
+PICK_ELIGIBLE_PHRASES_SQL = f"""
+    SELECT p.id, p.english_text, p.russian_text
+    FROM (
+        SELECT p.id,
+               ROW_NUMBER() OVER (ORDER BY p.id) - 1 AS row_offset
+        FROM phrases p
+        LEFT JOIN user_progress up ON p.id = up.phrase_id AND up.user_id = ?
+        WHERE p.is_active = 1
+        AND (up.status IS NULL OR up.status != 'learned')
+        AND (up.current_score IS NULL OR up.current_score < ?)
+    ) numbered
+    JOIN phrases p ON p.id = numbered.id
+    WHERE numbered.row_offset IN ({", ".join("?" * RANDOM_PHRASE_PREFETCH)})
+"""
+# Вес фразы для get_weighted_random_phrase (параметры: new_phrase_priority, decay_days):
+# max(1, new_phrase_priority * exp(-age_days / decay_days)). Дата - unix time или строка
+# из БД, не прошедшей migrate_database.py; без даты (или с неразборчивой строкой)
+# фраза считается новой
+PHRASE_WEIGHT_SQL = """
+    MAX(1.0, ? * exp(-(unixepoch() - COALESCE(
+        CASE WHEN typeof(p.date_added) = 'text' THEN unixepoch(p.date_added)
+             ELSE p.date_added END,
+        unixepoch()
+    )) / 86400.0 / ?))
+"""
+# Доступные пользователю фразы (параметры: user_id, MAX_SCORE)
+WEIGHTED_ELIGIBLE_FROM_SQL = """
+    FROM phrases p
+    LEFT JOIN user_progress up ON p.id = up.phrase_id AND up.user_id = ?
+    WHERE p.is_active = 1
+    AND p.is_learned = 0
+    AND (up.status IS NULL OR up.status != 'learned')
+    AND (up.current_score IS NULL OR up.current_score < ?)
+"""
+WEIGHTED_PHRASE_WEIGHTS_SQL = f"SELECT p.id, {PHRASE_WEIGHT_SQL} AS weight {WEIGHTED_ELIGIBLE_FROM_SQL}"
+# Взвешенный выбор одним запросом (экспоненциальные часы): у каждой фразы ключ
+# -ln(U) / weight, U ~ (0, 1); фраза с минимальным ключом выбрана с вероятностью
+# weight / sum(weight)
+PICK_WEIGHTED_PHRASE_SQL = f"""
+    SELECT p.id, p.english_text, p.russian_text
+    {WEIGHTED_ELIGIBLE_FROM_SQL}
+    ORDER BY -ln((ABS(random() % 1000000) + 1) / 1000001.0) / {PHRASE_WEIGHT_SQL}
+    LIMIT 1
+"""
+# Сколько секунд живет таблица псевдонимов get_weighted_random_phrase: веса зависят
+# от возраста фраз, а записи из других соединений (синхронизация) не сбрасывают кэш
+WEIGHTED_ALIAS_TTL_SECONDS = 300
+# Сколько раз get_weighted_random_phrase перестраивает таблицу, если выбранная фраза
+# уже недоступна, прежде чем выбрать фразу запросом PICK_WEIGHTED_PHRASE_SQL
+WEIGHTED_PICK_ATTEMPTS = 3
+# До скольки доступных фраз get_weighted_random_phrase выбирает бинарным поиском по
+# накопленным весам (O(log n), построение - один accumulate) вместо таблицы псевдонимов
+WEIGHTED_BISECT_MAX_PHRASES = 64
+# Сколько дней хранится история ответов (prune_history)
+ANSWER_HISTORY_RETENTION_DAYS = 90
+
+# Неизменяемая часть схемы: все операторы идемпотентны и выполняются одним executescript
+SCHEMA_SCRIPT = """
+    BEGIN IMMEDIATE;
+
+    -- Таблица фраз
+    CREATE TABLE IF NOT EXISTS phrases (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        english_text TEXT NOT NULL UNIQUE,
+        russian_text TEXT NOT NULL,
+        difficulty TEXT DEFAULT 'medium',
+        context TEXT DEFAULT '',
+        date_added INTEGER DEFAULT (unixepoch()),
+        is_active BOOLEAN DEFAULT 1,
+        is_learned BOOLEAN DEFAULT 0,
+        total_progress_score REAL DEFAULT 0.0
+    );
+
+    -- Таблица прогресса пользователя
+    CREATE TABLE IF NOT EXISTS user_progress (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        phrase_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        current_score REAL DEFAULT 0,
+        attempts INTEGER DEFAULT 0,
+        last_attempt INTEGER,
+        status TEXT DEFAULT 'learning',
+        FOREIGN KEY (phrase_id) REFERENCES phrases (id)
+    );
+
+    -- Покрывающий индекс для LEFT JOIN в выборке фраз: поиск по (user_id, phrase_id)
+    -- и проверка status/current_score без обращения к таблице
+    CREATE INDEX IF NOT EXISTS idx_progress_user_phrase_status
+    ON user_progress (user_id, phrase_id, status, current_score);
+
+    -- Таблица истории ответов
+    CREATE TABLE IF NOT EXISTS answer_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        phrase_id INTEGER NOT NULL,
+        user_answer TEXT NOT NULL,
+        ai_score REAL NOT NULL,
+        timestamp INTEGER DEFAULT (unixepoch()),
+        FOREIGN KEY (phrase_id) REFERENCES phrases (id)
+    );
+
+    -- Очистка старой истории (prune_history) удаляет диапазон по индексу
+    CREATE INDEX IF NOT EXISTS idx_ah_timestamp ON answer_history (timestamp);
+
+    -- Таблица статистики
+    CREATE TABLE IF NOT EXISTS statistics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        total_phrases INTEGER DEFAULT 0,
+        learned_phrases INTEGER DEFAULT 0,
+        learning_rate REAL DEFAULT 0.0,
+        last_updated INTEGER DEFAULT (unixepoch()),
+        avg_score REAL DEFAULT 0.0
+    );
+
+    -- Таблица для хранения ожидаемых ответов (состояние пользователей)
+    CREATE TABLE IF NOT EXISTS user_expected_answers (
+        user_id INTEGER PRIMARY KEY,
+        phrase_id INTEGER NOT NULL,
+        english_phrase TEXT NOT NULL,
+        russian_translation TEXT NOT NULL,
+        exercise_type TEXT DEFAULT 'translate_to_russian',
+        created_at INTEGER DEFAULT (unixepoch()),
+        FOREIGN KEY (phrase_id) REFERENCES phrases (id)
+    );
+
+    COMMIT;
+"""
 # endregion
 
 # region Настройка логирования
@@ -54,20 +250,184 @@ class DatabaseManager:
     - Аналитику и статистику обучения
     """
     
-    def __init__(self, db_path: str = DATABASE_NAME):
+    # Файлы БД (абсолютные пути), для которых схема уже создана в этом процессе
+    _schema_ready: Set[str] = set()
+    
+    def __init__(self, db_path: str = str(DATABASE_PATH)):
         """
         Инициализация менеджера БД.
         
         Args:
-            db_path: Путь к файлу базы данных
+            db_path: Путь к файлу базы данных (по умолчанию config.DATABASE_PATH)
         """
         self.db_path = db_path
-        self.connection = None
-        logger.info(f"[START_FUNCTION][__init__] Инициализация БД: {db_path}")
+        logger.debug("[START_FUNCTION][__init__] Инициализация БД: %s", db_path)
+        
+        # Существование файла проверяем до подключения: connect создает пустой файл
+        schema_key = str(Path(db_path).resolve())
+        schema_ready = schema_key in DatabaseManager._schema_ready and Path(db_path).exists()
+        
+        # Одно долгоживущее соединение: кэш страниц SQLite сохраняется между вызовами.
+        # Соединение используется из разных потоков, поэтому доступ к нему сериализуется.
+        # Блокировка нереентерабельна: вложенная _transaction() все равно невозможна
+        # (BEGIN внутри открытой транзакции)
+        self._lock = threading.Lock()
+        self.connection = self._connect()
+        # user_id -> (число доступных для изучения фраз, момент подсчета по time.monotonic())
+        self._eligible_counts: Dict[int, Tuple[int, float]] = {}
+        # user_id -> заранее выбранные случайные фразы (phrase_id, english_text, russian_text)
+        self._phrase_queues: Dict[int, Deque[Tuple[int, str, str]]] = {}
+        # (user_id, new_phrase_priority, decay_days) -> (момент построения, phrase_id[], prob[], alias[])
+        # для взвешенной выборки методом псевдонимов (get_weighted_random_phrase);
+        # для малых наборов alias - None, а prob - накопленные веса
+        self._alias_tables: Dict[Tuple[int, float, int], Tuple[float, array, array, Optional[array]]] = {}
+        # TTLCache не потокобезопасен - доступ под отдельной блокировкой
+        self._read_cache: TTLCache = TTLCache(maxsize=READ_CACHE_SIZE, ttl=READ_CACHE_TTL_SECONDS)
+        self._read_cache_lock = threading.Lock()
+        
+        # Создаем таблицы при инициализации; повторный экземпляр для того же файла
+        # пропускает проверку схемы
+        if not schema_ready:
+            self.create_tables()
+            DatabaseManager._schema_ready.add(schema_key)
         
-        # Создаем таблицы при инициализации
-        self.create_tables()
-        logger.info(f"[END_FUNCTION][__init__] БД инициализирована")
+        # Читатели открываются после создания таблиц: в режиме ro файл БД должен существовать
+        self._read_pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(READ_POOL_SIZE):
+            self._read_pool.put(self._connect_reader())
+        logger.debug("[END_FUNCTION][__init__] БД инициализирована")
+    
+    # region FUNCTION _connect
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Открывает соединение с БД и применяет CONNECTION_PRAGMAS.
+        
+        Соединение работает в режиме autocommit (isolation_level=None),
+        транзакции записи открываются явно в _transaction().
+        """
+        new_database = not Path(self.db_path).exists()
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=CONNECTION_TIMEOUT_SECONDS,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        # Строки как sqlite3.Row: доступ и по индексу, и по имени столбца, dict(row) на стороне C
+        conn.row_factory = sqlite3.Row
+        # page_size и auto_vacuum нужно задать до того, как в файле появятся
+        # таблицы и журнал WAL - поэтому раньше CONNECTION_PRAGMAS
+        pragmas = (NEW_DATABASE_PRAGMAS + CONNECTION_PRAGMAS) if new_database else CONNECTION_PRAGMAS
+        for pragma in pragmas:
+            try:
+                conn.execute(pragma)
+            except sqlite3.Error as e:
+                # Например, WAL недоступен на сетевой файловой системе
+                logger.warning("[WARNING][_connect] Не удалось применить %r: %s", pragma, e)
+        return conn
+    # endregion FUNCTION _connect
+    
+    # region FUNCTION _connect_reader
+    def _connect_reader(self) -> sqlite3.Connection:
+        """Открывает соединение только для чтения (mode=ro) для пула читателей."""
+        uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            timeout=CONNECTION_TIMEOUT_SECONDS,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in READ_CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        self._ensure_math_functions(conn)
+        return conn
+    # endregion FUNCTION _connect_reader
+    
+    # region FUNCTION _ensure_math_functions
+    @staticmethod
+    def _ensure_math_functions(conn: sqlite3.Connection) -> None:
+        """
+        Регистрирует exp() и ln() на Python, если SQLite собран без математических функций.
+        
+        Встроенные функции есть начиная с SQLite 3.35 при SQLITE_ENABLE_MATH_FUNCTIONS;
+        они нужны взвешенной выборке в get_weighted_random_phrase.
+        """
+        try:
+            conn.execute("SELECT exp(0), ln(1)")
+        except sqlite3.OperationalError:
+            conn.create_function("exp", 1, math.exp, deterministic=True)
+            conn.create_function("ln", 1, math.log, deterministic=True)
+    # endregion FUNCTION _ensure_math_functions
+    
+    # region FUNCTION _transaction
+    @contextmanager
+    def _transaction(self, invalidate_reads: bool = True) -> Iterator[sqlite3.Cursor]:
+        """
+        Выполняет запись в одной транзакции на общем соединении.
+        
+        BEGIN IMMEDIATE сразу берет блокировку записи, поэтому чтение перед
+        обновлением (SELECT ... UPDATE) не упирается в SQLITE_BUSY посреди транзакции.
+        При исключении - в том числе из самого COMMIT (SQLITE_BUSY, ошибка ввода-вывода) -
+        транзакция откатывается: общее соединение не должно остаться внутри открытой
+        транзакции, иначе каждый следующий BEGIN завершится ошибкой.
+        
+        Args:
+            invalidate_reads: Сбрасывать ли кэш чтений после фиксации; False - для таблиц,
+                              которые в кэш не попадают (user_expected_answers)
+        """
+        with self._lock:
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+                yield cursor
+                self.connection.commit()
+            except BaseException:
+                if self.connection.in_transaction:
+                    self.connection.rollback()
+                raise
+            finally:
+                cursor.close()
+            if invalidate_reads:
+                self._clear_read_cache()
+    # endregion FUNCTION _transaction
+    
+    # region FUNCTION _read_cache
+    def _get_cached(self, key: Tuple):
+        """Возвращает значение из кэша чтений или None."""
+        with self._read_cache_lock:
+            return self._read_cache.get(key)
+    
+    def _set_cached(self, key: Tuple, value) -> None:
+        """Сохраняет значение в кэш чтений."""
+        with self._read_cache_lock:
+            self._read_cache[key] = value
+    
+    def _clear_read_cache(self) -> None:
+        """Сбрасывает кэш чтений после записи в БД."""
+        with self._read_cache_lock:
+            self._read_cache.clear()
+    # endregion FUNCTION _read_cache
+    
+    # region FUNCTION _read_cursor
+    @contextmanager
+    def _read_cursor(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Выдает курсор соединения из пула читателей.
+        
+        Соединение возвращается в пул после выхода из блока; если все
+        соединения заняты, вызов ждет освобождения одного из них.
+        """
+        conn = self._read_pool.get()
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+            self._read_pool.put(conn)
+    # endregion FUNCTION _read_cursor
     
     # region FUNCTION create_tables
     # CONTRACT
@@ -76,7 +436,8 @@ class DatabaseManager:
     # Returns:
     #   - None
     # Side Effects:
-    #   - Создает файл БД и таблицы если они не существуют
+    #   - Создает файл БД, таблицы и индексы если они не существуют
+    #   - При первом создании индексов удаляет дубли (user_id, phrase_id) из user_progress
     # Raises:
     #   - sqlite3.Error: при ошибках создания таблиц
     # Tests:
@@ -85,94 +446,196 @@ class DatabaseManager:
     
     def create_tables(self) -> None:
         """Создает все необходимые таблицы в базе данных."""
-        logger.info("[START_FUNCTION][create_tables] Создание таблиц БД")
+        logger.debug("[START_FUNCTION][create_tables] Создание таблиц БД")
         
         try:
-            with sqlite3.connect(self.db_path, timeout=10) as conn:
-                cursor = conn.cursor()
-                # Включаем WAL для снижения блокировок при одновременных чтениях/записях
+            # Таблицы и покрывающий индекс - одним скриптом на общем соединении.
+            # executescript сам завершает открытую транзакцию, поэтому BEGIN/COMMIT внутри скрипта
+            with self._lock:
                 try:
-                    cursor.execute("PRAGMA journal_mode=WAL;")
-                    cursor.execute("PRAGMA synchronous=NORMAL;")
-                    cursor.execute("PRAGMA busy_timeout=10000;")
-                except Exception:
-                    pass
-                
-                # Таблица фраз
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS phrases (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        english_text TEXT NOT NULL UNIQUE,
-                        russian_text TEXT NOT NULL,
-                        difficulty TEXT DEFAULT 'medium',
-                        context TEXT DEFAULT '',
-                        date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        is_active BOOLEAN DEFAULT 1,
-                        is_learned BOOLEAN DEFAULT 0,
-                        total_progress_score REAL DEFAULT 0.0
-                    )
-                """)
-                
-                # Таблица прогресса пользователя
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS user_progress (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        phrase_id INTEGER NOT NULL,
-                        user_id INTEGER NOT NULL,
-                        current_score REAL DEFAULT 0,
-                        attempts INTEGER DEFAULT 0,
-                        last_attempt TIMESTAMP,
-                        status TEXT DEFAULT 'learning',
-                        FOREIGN KEY (phrase_id) REFERENCES phrases (id)
-                    )
-                """)
+                    self.connection.executescript(SCHEMA_SCRIPT)
+                except sqlite3.Error:
+                    if self.connection.in_transaction:
+                        self.connection.rollback()
+                    raise
+            
+            with self._transaction() as cursor:
+                # Индексы для точечного поиска прогресса и агрегатов по пользователю
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_up_user_phrase'")
+                indexes_missing = cursor.fetchone() is None
+                if indexes_missing:
+                    # В старых БД пара (user_id, phrase_id) могла задублироваться;
+                    # оставляем первую запись - именно ее читал update_progress
+                    cursor.execute("""
+                        DELETE FROM user_progress
+                        WHERE id NOT IN (
+                            SELECT MIN(id) FROM user_progress GROUP BY user_id, phrase_id
+                        )
+                    """)
+                cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_up_user_phrase ON user_progress (user_id, phrase_id)")
+                # Выборки по (user_id, status) и (user_id, phrase_id) обслуживает покрывающий
+                # idx_progress_user_phrase_status, а answer_history по пользователю не читается:
+                # лишние индексы, созданные прежними версиями, только замедляют запись
+                cursor.execute("DROP INDEX IF EXISTS idx_up_user_status")
+                cursor.execute("DROP INDEX IF EXISTS idx_ah_user_phrase")
                 
-                # Таблица истории ответов
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS answer_history (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        phrase_id INTEGER NOT NULL,
-                        user_answer TEXT NOT NULL,
-                        ai_score REAL NOT NULL,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (phrase_id) REFERENCES phrases (id)
-                    )
-                """)
+                # Выборки невыученных фраз (is_active = 1 AND is_learned = 0) без полного просмотра phrases.
+                # date_added в индексе делает его покрывающим для расчета весов
+                # get_weighted_random_phrase: id - это rowid, строки таблицы не читаются.
+                # Индекс заменяет прежний idx_phrases_active_learned (is_active, is_learned)
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_phrases_active_learned_added'")
+                phrases_index_missing = cursor.fetchone() is None
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_phrases_active_learned_added ON phrases (is_active, is_learned, date_added)")
+                cursor.execute("DROP INDEX IF EXISTS idx_phrases_active_learned")
                 
-                # Таблица статистики
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS statistics (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        total_phrases INTEGER DEFAULT 0,
-                        learned_phrases INTEGER DEFAULT 0,
-                        learning_rate REAL DEFAULT 0.0,
-                        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
+                # Статистика пользователя поддерживается триггерами на user_progress
+                self._create_statistics_triggers(cursor)
+                self._create_phrase_totals(cursor)
                 
-                # Таблица для хранения ожидаемых ответов (состояние пользователей)
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS user_expected_answers (
-                        user_id INTEGER PRIMARY KEY,
-                        phrase_id INTEGER NOT NULL,
-                        english_phrase TEXT NOT NULL,
-                        russian_translation TEXT NOT NULL,
-                        exercise_type TEXT DEFAULT 'translate_to_russian',
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (phrase_id) REFERENCES phrases (id)
-                    )
-                """)
+                # Собираем статистику один раз, чтобы планировщик выбирал новые индексы
+                if indexes_missing or phrases_index_missing:
+                    cursor.execute("ANALYZE")
                 
-                conn.commit()
-                logger.info("[END_FUNCTION][create_tables] Таблицы созданы успешно")
+                logger.debug("[END_FUNCTION][create_tables] Таблицы созданы успешно")
                 
         except sqlite3.Error as e:
-            logger.error(f"[ERROR][create_tables] Ошибка создания таблиц: {e}")
+            logger.error("[ERROR][create_tables] Ошибка создания таблиц: %s", e)
             raise
     # endregion FUNCTION create_tables
     
+    # region FUNCTION _create_statistics_triggers
+    def _create_statistics_triggers(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Создает триггеры, которые держат таблицу statistics в актуальном состоянии.
+        
+        После каждой вставки или обновления user_progress строка пользователя
+        в statistics пересчитывается по индексу (user_id, ...), поэтому
+        get_statistics читает готовые значения вместо JOIN и агрегатов.
+        Выключение или удаление фразы пересчитывает строки затронутых пользователей.
+        При первом создании триггеров statistics заполняется по текущим данным.
+        """
+        # В старых БД нет столбца avg_score
+        cursor.execute("PRAGMA table_info(statistics)")
+        if 'avg_score' not in {column[1] for column in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE statistics ADD COLUMN avg_score REAL DEFAULT 0.0")
+        
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_up_statistics_insert'")
+        if cursor.fetchone() is None:
+            # Таблица раньше не заполнялась - строим ее заново, по строке на пользователя
+            cursor.execute("DELETE FROM statistics")
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_statistics_user ON statistics (user_id)")
+            cursor.execute("""
+                INSERT INTO statistics (user_id, learned_phrases, avg_score, last_updated)
+                SELECT
+                    up.user_id,
+                    COUNT(CASE WHEN up.status = 'learned' THEN 1 END),
+                    AVG(up.current_score),
+                    unixepoch()
+                FROM user_progress up
+                JOIN phrases p ON p.id = up.phrase_id AND p.is_active = 1
+                GROUP BY up.user_id
+            """)
+        
+        # Фраза выключена, включена или удалена: пересчитываем строки пользователей,
+        # у которых есть по ней прогресс (статистика учитывает только активные фразы)
+        for name, event, row in (
+            ("trg_phrases_statistics_active", "UPDATE OF is_active", "NEW"),
+            ("trg_phrases_statistics_delete", "DELETE", "OLD"),
+        ):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {name}
+                AFTER {event} ON phrases
+                WHEN EXISTS (SELECT 1 FROM user_progress WHERE phrase_id = {row}.id)
+                BEGIN
+                    UPDATE statistics SET
+                        learned_phrases = (
+                            SELECT COUNT(CASE WHEN up.status = 'learned' THEN 1 END)
+                            FROM user_progress up
+                            JOIN phrases p ON p.id = up.phrase_id AND p.is_active = 1
+                            WHERE up.user_id = statistics.user_id
+                        ),
+                        avg_score = (
+                            SELECT AVG(up.current_score)
+                            FROM user_progress up
+                            JOIN phrases p ON p.id = up.phrase_id AND p.is_active = 1
+                            WHERE up.user_id = statistics.user_id
+                        ),
+                        last_updated = unixepoch()
+                    WHERE user_id IN (SELECT user_id FROM user_progress WHERE phrase_id = {row}.id);
+                END
+            """)
+        
+        for event in ("INSERT", "UPDATE"):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_up_statistics_{event.lower()}
+                AFTER {event} ON user_progress
+                BEGIN
+                    INSERT INTO statistics (user_id, learned_phrases, avg_score, last_updated)
+                    SELECT
+                        NEW.user_id,
+                        COUNT(CASE WHEN up.status = 'learned' THEN 1 END),
+                        AVG(up.current_score),
+                        unixepoch()
+                    FROM user_progress up
+                    JOIN phrases p ON p.id = up.phrase_id AND p.is_active = 1
+                    WHERE up.user_id = NEW.user_id
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        learned_phrases = excluded.learned_phrases,
+                        avg_score = excluded.avg_score,
+                        last_updated = excluded.last_updated;
+                END
+            """)
+    # endregion FUNCTION _create_statistics_triggers
+    
+    # region FUNCTION _create_phrase_totals
+    def _create_phrase_totals(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Создает счетчик активных фраз phrase_totals (одна строка) и триггеры на phrases.
+        
+        Общее число фраз одинаково для всех пользователей, поэтому хранится
+        отдельно от статистики пользователя; get_statistics читает его
+        вместо COUNT(*) по таблице phrases.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'phrase_totals'")
+        if cursor.fetchone() is not None:
+            return
+        
+        cursor.execute("""
+            CREATE TABLE phrase_totals (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                active_phrases INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            INSERT INTO phrase_totals (id, active_phrases)
+            SELECT 1, COUNT(*) FROM phrases WHERE is_active = 1
+        """)
+        
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_phrases_totals_insert
+            AFTER INSERT ON phrases WHEN NEW.is_active = 1
+            BEGIN
+                UPDATE phrase_totals SET active_phrases = active_phrases + 1 WHERE id = 1;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_phrases_totals_delete
+            AFTER DELETE ON phrases WHEN OLD.is_active = 1
+            BEGIN
+                UPDATE phrase_totals SET active_phrases = active_phrases - 1 WHERE id = 1;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_phrases_totals_active
+            AFTER UPDATE OF is_active ON phrases WHEN OLD.is_active IS NOT NEW.is_active
+            BEGIN
+                UPDATE phrase_totals
+                SET active_phrases = active_phrases + (CASE WHEN NEW.is_active = 1 THEN 1 ELSE -1 END)
+                WHERE id = 1;
+            END
+        """)
+    # endregion FUNCTION _create_phrase_totals
+    
     # region FUNCTION add_phrase
     # CONTRACT
     # Args:
@@ -204,31 +667,263 @@ class DatabaseManager:
         Raises:
             sqlite3.IntegrityError: Если фраза уже существует
         """
-        logger.info(f"[START_FUNCTION][add_phrase] Добавление фразы: {english_text[:30]}...")
+        logger.debug("[START_FUNCTION][add_phrase] Добавление фразы: %.30s...", english_text)
         
         try:
-            with sqlite3.connect(self.db_path, timeout=10) as conn:
-                cursor = conn.cursor()
-                
+            with self._transaction() as cursor:
                 cursor.execute("""
-                    INSERT INTO phrases (english_text, russian_text, difficulty)
-                    VALUES (?, ?, ?)
+                    INSERT INTO phrases (english_text, russian_text, difficulty, date_added)
+                    VALUES (?, ?, ?, unixepoch())
                 """, (english_text, russian_text, difficulty))
                 
                 phrase_id = cursor.lastrowid
-                conn.commit()
-                
-                logger.info(f"[END_FUNCTION][add_phrase] Фраза добавлена с ID: {phrase_id}")
-                return phrase_id
+            
+            # Новая фраза должна попадать во взвешенную и случайную выборку сразу
+            self._forget_alias_tables()
+            self._forget_phrase_queues()
+            logger.debug("[END_FUNCTION][add_phrase] Фраза добавлена с ID: %s", phrase_id)
+            return phrase_id
                 
         except sqlite3.IntegrityError as e:
-            logger.warning(f"[WARNING][add_phrase] Фраза уже существует: {english_text}")
+            logger.warning("[WARNING][add_phrase] Фраза уже существует: %s", english_text)
             raise
         except sqlite3.Error as e:
-            logger.error(f"[ERROR][add_phrase] Ошибка добавления фразы: {e}")
+            logger.error("[ERROR][add_phrase] Ошибка добавления фразы: %s", e)
             raise
     # endregion FUNCTION add_phrase
     
+    # region FUNCTION add_phrases
+    # CONTRACT
+    # Args:
+    #   - rows: Список кортежей (english_text, russian_text, difficulty)
+    # Returns:
+    #   - int: Количество реально добавленных фраз
+    # Side Effects:
+    #   - Добавляет записи в таблицу phrases одной транзакцией
+    # Raises:
+    #   - sqlite3.Error: при ошибках записи в БД (транзакция откатывается)
+    # Tests:
+    #   - rows=[("Hello", "Привет", "easy"), ("Bye", "Пока", "easy")]: возвращает 2
+    #   - rows с уже существующей фразой: дубликат пропускается, возвращает 0 за него
+    
+    def add_phrases(self, rows: List[Tuple[str, str, str]]) -> int:
+        """
+        Добавляет несколько фраз в базу данных одной транзакцией.
+        
+        Фразы, которые уже есть в БД (english_text UNIQUE), пропускаются
+        и не прерывают пакет.
+        
+        Args:
+            rows: Список кортежей (english_text, russian_text, difficulty)
+            
+        Returns:
+            Количество добавленных фраз
+        """
+        logger.debug("[START_FUNCTION][add_phrases] Пакетное добавление фраз: %s", len(rows))
+        
+        if not rows:
+            return 0
+        
+        try:
+            with self._transaction() as cursor:
+                added = self._insert_phrase_rows(cursor, rows)
+            
+            self._forget_alias_tables()
+            self._forget_phrase_queues()
+            logger.debug("[END_FUNCTION][add_phrases] Добавлено фраз: %s, пропущено дубликатов: %s", added, len(rows) - added)
+            return added
+            
+        except sqlite3.Error as e:
+            logger.error("[ERROR][add_phrases] Ошибка пакетного добавления фраз: %s", e)
+            raise
+    # endregion FUNCTION add_phrases
+    
+    # region FUNCTION _insert_phrase_rows
+    def _insert_phrase_rows(self, cursor: sqlite3.Cursor, rows: List[Tuple[str, str, str]]) -> int:
+        """
+        Вставляет фразы многострочными INSERT по PHRASE_INSERT_BATCH_ROWS строк.
+        
+        Один оператор на пачку вместо шага executemany на каждую строку; текст
+        полной пачки постоянен и берется из кэша подготовленных выражений.
+        Дубликаты english_text пропускаются (INSERT OR IGNORE).
+        
+        Returns:
+            Количество добавленных фраз
+        """
+        added = 0
+        for start in range(0, len(rows), PHRASE_INSERT_BATCH_ROWS):
+            batch = rows[start:start + PHRASE_INSERT_BATCH_ROWS]
+            values = ", ".join(["(?, ?, ?, unixepoch())"] * len(batch))
+            cursor.execute(
+                f"INSERT OR IGNORE INTO phrases (english_text, russian_text, difficulty, date_added) VALUES {values}",
+                [value for row in batch for value in row]
+            )
+            added += cursor.rowcount
+        return added
+    # endregion FUNCTION _insert_phrase_rows
+    
+    # region FUNCTION _lookup_batches
+    @staticmethod
+    def _lookup_batches(values: List) -> Iterator[Tuple[str, List]]:
+        """
+        Делит значения на пачки для IN (...) по PHRASE_LOOKUP_BATCH_SIZE.
+        
+        Пачка дополняется NULL до степени двойки (NULL в IN ничего не находит):
+        так число различных текстов запроса ограничено и они берутся из кэша
+        подготовленных выражений, а не разбираются заново для каждой длины.
+        
+        Yields:
+            (строка плейсхолдеров "?, ?, ...", значения пачки)
+        """
+        for start in range(0, len(values), PHRASE_LOOKUP_BATCH_SIZE):
+            batch = values[start:start + PHRASE_LOOKUP_BATCH_SIZE]
+            size = 1 << (len(batch) - 1).bit_length()
+            batch += [None] * (size - len(batch))
+            yield ", ".join("?" * size), batch
+    # endregion FUNCTION _lookup_batches
+    
+    # region FUNCTION bulk_load_phrases
+    # CONTRACT
+    # Args:
+    #   - rows: Итерируемый набор кортежей (english_text, russian_text, difficulty)
+    # Returns:
+    #   - int: Количество реально добавленных фраз
+    # Side Effects:
+    #   - Удаляет и пересоздает вторичные индексы таблицы phrases в той же транзакции
+    # Raises:
+    #   - sqlite3.Error: при ошибках записи в БД (транзакция откатывается, индексы остаются)
+    # Tests:
+    #   - 10 000 новых фраз: возвращает 10000, индексы phrases на месте
+    #   - rows с дубликатами: дубликаты пропускаются
+    
+    def bulk_load_phrases(self, rows: Iterable[Tuple[str, str, str]]) -> int:
+        """
+        Загружает большой набор фраз (первичное наполнение, импорт корпуса).
+        
+        Вторичные индексы phrases удаляются на время вставки и строятся заново
+        один раз после нее. Уникальный индекс english_text (ограничение UNIQUE
+        таблицы) удалить нельзя, поэтому строки вставляются отсортированными
+        по english_text - новые ключи дописываются в конец B-дерева.
+        
+        Args:
+            rows: Кортежи (english_text, russian_text, difficulty)
+            
+        Returns:
+            Количество добавленных фраз
+        """
+        # Стабильная сортировка: из дубликатов во входных данных побеждает первый, как в add_phrases
+        rows = sorted(rows, key=lambda row: row[0])
+        logger.debug("[START_FUNCTION][bulk_load_phrases] Массовая загрузка фраз: %s", len(rows))
+        
+        if not rows:
+            return 0
+        
+        try:
+            with self._transaction() as cursor:
+                # У автоиндексов UNIQUE sql равен NULL - их не трогаем
+                cursor.execute("""
+                    SELECT name, sql FROM sqlite_master
+                    WHERE type = 'index' AND tbl_name = 'phrases' AND sql IS NOT NULL
+                """)
+                indexes = cursor.fetchall()
+                for index in indexes:
+                    cursor.execute(f'DROP INDEX "{index["name"]}"')
+                
+                added = self._insert_phrase_rows(cursor, rows)
+                
+                for index in indexes:
+                    cursor.execute(index["sql"])
+            
+            self._forget_alias_tables()
+            self._forget_phrase_queues()
+            logger.debug("[END_FUNCTION][bulk_load_phrases] Добавлено фраз: %s, пересоздано индексов: %s", added, len(indexes))
+            return added
+            
+        except sqlite3.Error as e:
+            logger.error("[ERROR][bulk_load_phrases] Ошибка массовой загрузки фраз: %s", e)
+            raise
+    # endregion FUNCTION bulk_load_phrases
+    
+    # region FUNCTION sync_phrases
+    # CONTRACT
+    # Args:
+    #   - rows: Кортежи (english_text, russian_text, difficulty, date_added, progress_score)
+    # Returns:
+    #   - Tuple[int, int]: (добавлено, обновлено)
+    # Side Effects:
+    #   - Добавляет новые фразы, обновляет перевод, сложность и прогресс существующих
+    # Raises:
+    #   - sqlite3.Error: при ошибках записи в БД (транзакция откатывается целиком)
+    # Tests:
+    #   - Новая фраза: добавляется с переданной датой, (1, 0)
+    #   - Существующая фраза: меняются russian_text и difficulty, (0, 1)
+    #   - progress_score=3.0: фраза помечается выученной
+    
+    def sync_phrases(
+        self,
+        rows: Iterable[Tuple[str, str, str, Optional[int], Optional[float]]]
+    ) -> Tuple[int, int]:
+        """
+        Переносит фразы из внешнего источника (Google Sheets) одной транзакцией.
+        
+        Новые фразы добавляются, у существующих (по english_text) обновляются
+        перевод и сложность - одним UPSERT через executemany. Прогресс
+        записывается только для строк с progress_score > 0.
+        
+        Args:
+            rows: Кортежи (english_text, russian_text, difficulty, date_added, progress_score);
+                  date_added - unix timestamp или None (текущее время)
+            
+        Returns:
+            Кортеж (добавлено, обновлено)
+        """
+        rows = list(rows)
+        logger.debug("[START_FUNCTION][sync_phrases] Синхронизация фраз: %s", len(rows))
+        
+        if not rows:
+            return 0, 0
+        
+        texts = list(dict.fromkeys(row[0] for row in rows))
+        try:
+            with self._transaction() as cursor:
+                known: Set[str] = set()
+                for placeholders, batch in self._lookup_batches(texts):
+                    cursor.execute(f"SELECT english_text FROM phrases WHERE english_text IN ({placeholders})", batch)
+                    known.update(row[0] for row in cursor.fetchall())
+                
+                cursor.executemany("""
+                    INSERT INTO phrases (english_text, russian_text, difficulty, total_progress_score, is_learned, date_added)
+                    VALUES (?, ?, ?, 0.0, 0, COALESCE(?, unixepoch()))
+                    ON CONFLICT(english_text) DO UPDATE SET
+                        russian_text = excluded.russian_text,
+                        difficulty = excluded.difficulty
+                """, [row[:4] for row in rows])
+                cursor.executemany("""
+                    UPDATE phrases
+                    SET total_progress_score = ?, is_learned = ? >= ?
+                    WHERE english_text = ?
+                """, [
+                    (row[4], row[4], LEARNED_SCORE_THRESHOLD, row[0])
+                    for row in rows if row[4] and row[4] > 0
+                ])
+            
+            # Повтор english_text во входных данных считается обновлением, как при построчной записи
+            added = 0
+            for row in rows:
+                if row[0] not in known:
+                    known.add(row[0])
+                    added += 1
+            
+            self._forget_alias_tables()
+            self._forget_phrase_queues()
+            logger.debug("[END_FUNCTION][sync_phrases] Добавлено: %s, обновлено: %s", added, len(rows) - added)
+            return added, len(rows) - added
+            
+        except sqlite3.Error as e:
+            logger.error("[ERROR][sync_phrases] Ошибка синхронизации фраз: %s", e)
+            raise
+    # endregion FUNCTION sync_phrases
+    
     # region FUNCTION get_random_phrase
     # CONTRACT
     # Args:
@@ -247,44 +942,105 @@ class DatabaseManager:
         """
         Получает случайную фразу для изучения пользователем.
         
+        Фразы выбираются пачками по RANDOM_PHRASE_PREFETCH без повторов
+        и выдаются из очереди пользователя; к БД обращается только пустая очередь.
+        
         Args:
             user_id: ID пользователя
             
         Returns:
             Кортеж (phrase_id, english_text, russian_text) или None
         """
-        logger.info(f"[START_FUNCTION][get_random_phrase] Поиск фразы для пользователя {user_id}")
+        logger.debug("[START_FUNCTION][get_random_phrase] Поиск фразы для пользователя %s", user_id)
         
         try:
-            with sqlite3.connect(self.db_path, timeout=10) as conn:
-                cursor = conn.cursor()
-                
-                # Получаем фразы, которые пользователь еще не выучил
-                cursor.execute("""
-                    SELECT p.id, p.english_text, p.russian_text
-                    FROM phrases p
-                    LEFT JOIN user_progress up ON p.id = up.phrase_id AND up.user_id = ?
-                    WHERE p.is_active = 1
-                    AND (up.status IS NULL OR up.status != 'learned')
-                    AND (up.current_score IS NULL OR up.current_score < ?)
-                    ORDER BY RANDOM()
-                    LIMIT 1
-                """, (user_id, MAX_SCORE))
-                
-                result = cursor.fetchone()
-                
-                if result:
-                    logger.info(f"[END_FUNCTION][get_random_phrase] Найдена фраза ID: {result[0]}")
-                    return result
-                else:
-                    logger.info(f"[END_FUNCTION][get_random_phrase] Фразы для изучения не найдены")
-                    return None
+            pending = self._phrase_queues.get(user_id)
+            if not pending:
+                with self._read_cursor() as cursor:
+                    phrases = self._pick_eligible_phrases(cursor, user_id, fresh_count=False)
+                    if not phrases:
+                        # Подсчет из кэша мог устареть (фразы выучены или добавлены) - пересчитываем
+                        phrases = self._pick_eligible_phrases(cursor, user_id, fresh_count=True)
+                pending = self._phrase_queues[user_id] = deque(phrases)
+            
+            try:
+                result = pending.popleft()
+            except IndexError:
+                # Очередь пуста: фраз нет или ее одновременно опустошил другой поток
+                result = None
+            
+            if result:
+                logger.debug("[END_FUNCTION][get_random_phrase] Найдена фраза ID: %s", result[0])
+                return result
+            else:
+                logger.debug("[END_FUNCTION][get_random_phrase] Фразы для изучения не найдены")
+                return None
                     
         except sqlite3.Error as e:
-            logger.error(f"[ERROR][get_random_phrase] Ошибка получения фразы: {e}")
+            logger.error("[ERROR][get_random_phrase] Ошибка получения фразы: %s", e)
             raise
     # endregion FUNCTION get_random_phrase
     
+    # region FUNCTION _pick_eligible_phrases
+    def _pick_eligible_phrases(
+        self,
+        cursor: sqlite3.Cursor,
+        user_id: int,
+        fresh_count: bool
+    ) -> List[Tuple[int, str, str]]:
+        """
+        Выбирает до RANDOM_PHRASE_PREFETCH случайных невыученных фраз за один запрос.
+        
+        В отличие от ORDER BY RANDOM() не сортирует все подходящие строки:
+        случайные номера строк без повторов выбираются в Python, строки нумеруются
+        в порядке первичного ключа. Число подходящих фраз кэшируется
+        на ELIGIBLE_COUNT_TTL_SECONDS.
+        
+        Args:
+            cursor: Курсор для чтения
+            user_id: ID пользователя
+            fresh_count: Пересчитать число фраз, не используя кэш
+            
+        Returns:
+            Список кортежей (phrase_id, english_text, russian_text) в случайном порядке
+        """
+        cached = self._eligible_counts.get(user_id)
+        if not fresh_count and cached and time.monotonic() - cached[1] < ELIGIBLE_COUNT_TTL_SECONDS:
+            count = cached[0]
+        else:
+            # Доступные = активные (счетчик phrase_totals) минус выученные пользователем
+            # активные фразы: читаются только строки пользователя по индексу user_progress,
+            # а не весь каталог phrases
+            cursor.execute("""
+                SELECT t.active_phrases - (
+                    SELECT COUNT(*)
+                    FROM user_progress up
+                    JOIN phrases p ON p.id = up.phrase_id AND p.is_active = 1
+                    WHERE up.user_id = ?
+                    AND (up.status = 'learned' OR up.current_score >= ?)
+                )
+                FROM phrase_totals t
+                WHERE t.id = 1
+            """, (user_id, MAX_SCORE))
+            count = cursor.fetchone()[0]
+            self._eligible_counts[user_id] = (count, time.monotonic())
+        
+        if not count:
+            return []
+        
+        # Получаем фразы, которые пользователь еще не выучил, по случайным номерам строк
+        offsets = random.sample(range(count), min(RANDOM_PHRASE_PREFETCH, count))
+        # Недостающие номера дополняются -1 (не совпадает ни с одной строкой),
+        # чтобы текст запроса не менялся и оставался в кэше подготовленных выражений
+        offsets += [-1] * (RANDOM_PHRASE_PREFETCH - len(offsets))
+        cursor.execute(PICK_ELIGIBLE_PHRASES_SQL, (user_id, MAX_SCORE, *offsets))
+        
+        phrases = [tuple(row) for row in cursor.fetchall()]
+        # Строки приходят в порядке id - перемешиваем
+        random.shuffle(phrases)
+        return phrases
+    # endregion FUNCTION _pick_eligible_phrases
+    
     # region FUNCTION update_progress
     # CONTRACT
     # Args:
@@ -316,57 +1072,47 @@ class DatabaseManager:
         Returns:
             True если фраза выучена (достигнут MAX_SCORE)
         """
-        logger.info(f"[START_FUNCTION][update_progress] Обновление прогресса: user={user_id}, phrase={phrase_id}, score={ai_score}")
+        logger.debug("[START_FUNCTION][update_progress] Обновление прогресса: user=%s, phrase=%s, score=%s", user_id, phrase_id, ai_score)
         
         try:
-            with sqlite3.connect(self.db_path, timeout=10) as conn:
-                cursor = conn.cursor()
-                
+            with self._transaction() as cursor:
                 # Добавляем запись в историю ответов
                 cursor.execute("""
-                    INSERT INTO answer_history (user_id, phrase_id, user_answer, ai_score)
-                    VALUES (?, ?, ?, ?)
+                    INSERT INTO answer_history (user_id, phrase_id, user_answer, ai_score, timestamp)
+                    VALUES (?, ?, ?, ?, unixepoch())
                 """, (user_id, phrase_id, user_answer, ai_score))
                 
-                # Получаем текущий прогресс
+                # Создаем или обновляем запись прогресса одним UPSERT (уникальный индекс
+                # idx_up_user_phrase); в DO UPDATE current_score - это старое значение
                 cursor.execute("""
-                    SELECT current_score, attempts FROM user_progress
-                    WHERE user_id = ? AND phrase_id = ?
-                """, (user_id, phrase_id))
-                
-                progress = cursor.fetchone()
-                
-                if progress:
-                    current_score, attempts = progress
-                    new_score = min(current_score + ai_score, MAX_SCORE)
-                    new_attempts = attempts + 1
-                    
-                    # Обновляем прогресс
-                    cursor.execute("""
-                        UPDATE user_progress
-                        SET current_score = ?, attempts = ?, last_attempt = CURRENT_TIMESTAMP,
-                            status = CASE WHEN ? >= ? THEN 'learned' ELSE 'learning' END
-                        WHERE user_id = ? AND phrase_id = ?
-                    """, (new_score, new_attempts, new_score, MAX_SCORE, user_id, phrase_id))
-                else:
-                    # Создаем новую запись прогресса
-                    new_score = ai_score
-                    new_attempts = 1
-                    status = 'learned' if ai_score >= MAX_SCORE else 'learning'
-                    
-                    cursor.execute("""
-                        INSERT INTO user_progress (user_id, phrase_id, current_score, attempts, last_attempt, status)
-                        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
-                    """, (user_id, phrase_id, new_score, new_attempts, status))
-                
-                conn.commit()
+                    INSERT INTO user_progress (user_id, phrase_id, current_score, attempts, last_attempt, status)
+                    VALUES (?, ?, ?, 1, unixepoch(), CASE WHEN ? >= ? THEN 'learned' ELSE 'learning' END)
+                    ON CONFLICT (user_id, phrase_id) DO UPDATE SET
+                        current_score = MIN(current_score + excluded.current_score, ?),
+                        attempts = attempts + 1,
+                        last_attempt = unixepoch(),
+                        status = CASE WHEN current_score + excluded.current_score >= ? THEN 'learned' ELSE 'learning' END
+                    RETURNING current_score
+                """, (user_id, phrase_id, ai_score, ai_score, MAX_SCORE, MAX_SCORE, MAX_SCORE))
+                new_score = cursor.fetchone()[0]
                 
                 is_learned = new_score >= MAX_SCORE
-                logger.info(f"[END_FUNCTION][update_progress] Прогресс обновлен: score={new_score}, learned={is_learned}")
+                if is_learned:
+                    # Выученных фраз стало больше: кэшированное число доступных фраз
+                    # больше не совпадает с выборкой в _pick_eligible_phrases
+                    self._eligible_counts.pop(user_id, None)
+                    self._forget_alias_tables(user_id)
+                    # Выученная фраза не должна выдаваться из заранее выбранной очереди
+                    pending = self._phrase_queues.get(user_id)
+                    if pending:
+                        self._phrase_queues[user_id] = deque(
+                            phrase for phrase in pending if phrase[0] != phrase_id
+                        )
+                logger.debug("[END_FUNCTION][update_progress] Прогресс обновлен: score=%s, learned=%s", new_score, is_learned)
                 return is_learned
                 
         except sqlite3.Error as e:
-            logger.error(f"[ERROR][update_progress] Ошибка обновления прогресса: {e}")
+            logger.error("[ERROR][update_progress] Ошибка обновления прогресса: %s", e)
             raise
     # endregion FUNCTION update_progress
     
@@ -396,55 +1142,47 @@ class DatabaseManager:
         Returns:
             True если фраза стала изученной (достигла порога)
         """
-        logger.info(f"[START_FUNCTION][update_phrase_progress] Обновление прогресса фразы {phrase_id}, балл: {score}")
+        logger.debug("[START_FUNCTION][update_phrase_progress] Обновление прогресса фразы %s, балл: %s", phrase_id, score)
         
         try:
-            with sqlite3.connect(self.db_path, timeout=10) as conn:
-                cursor = conn.cursor()
-                
-                # Получаем текущий прогресс
-                cursor.execute(
-                    "SELECT total_progress_score, is_learned FROM phrases WHERE id = ?",
-                    (phrase_id,)
-                )
+            with self._transaction() as cursor:
+                # Добавляем балл к общему прогрессу и проверяем порог изучения одним UPDATE;
+                # уже изученные фразы не обновляются
+                cursor.execute("""
+                    UPDATE phrases SET
+                        total_progress_score = COALESCE(total_progress_score, 0) + ?,
+                        is_learned = COALESCE(total_progress_score, 0) + ? >= ?
+                    WHERE id = ? AND COALESCE(is_learned, 0) = 0
+                    RETURNING total_progress_score, is_learned
+                """, (score, score, LEARNED_SCORE_THRESHOLD, phrase_id))
                 result = cursor.fetchone()
                 
                 if not result:
-                    logger.warning(f"[WARNING][update_phrase_progress] Фраза {phrase_id} не найдена")
-                    return False
-                
-                current_progress, is_learned = result
-                
-                # Если фраза уже изучена, не обновляем
-                if is_learned:
-                    logger.info(f"[INFO][update_phrase_progress] Фраза {phrase_id} уже изучена")
+                    # Строка не обновлена: фраза уже изучена или не существует
+                    cursor.execute("SELECT 1 FROM phrases WHERE id = ?", (phrase_id,))
+                    if cursor.fetchone() is None:
+                        logger.warning("[WARNING][update_phrase_progress] Фраза %s не найдена", phrase_id)
+                        return False
+                    logger.debug("[INFO][update_phrase_progress] Фраза %s уже изучена", phrase_id)
                     return True
                 
-                # Добавляем новый балл к общему прогрессу
-                new_total_progress = current_progress + score
-                
-                # Проверяем, достиг ли прогресс порога изучения
-                from config.config import LEARNED_SCORE_THRESHOLD
-                became_learned = new_total_progress >= LEARNED_SCORE_THRESHOLD
-                
-                # Обновляем прогресс и статус изучения
-                cursor.execute(
-                    "UPDATE phrases SET total_progress_score = ?, is_learned = ? WHERE id = ?",
-                    (new_total_progress, became_learned, phrase_id)
-                )
-                
-                conn.commit()
+                new_total_progress, became_learned = result
+                became_learned = bool(became_learned)
                 
                 if became_learned:
-                    logger.info(f"[INFO][update_phrase_progress] Фраза {phrase_id} стала изученной! Прогресс: {new_total_progress}")
+                    # Фраза выпадает из взвешенной выборки (p.is_learned = 0) всех
+                    # пользователей - заранее построенные выборки больше не актуальны
+                    self._forget_alias_tables()
+                    self._forget_phrase_queues()
+                    logger.info("[INFO][update_phrase_progress] Фраза %s стала изученной! Прогресс: %s", phrase_id, new_total_progress)
                 else:
-                    logger.info(f"[INFO][update_phrase_progress] Прогресс фразы {phrase_id}: {new_total_progress}")
+                    logger.debug("[INFO][update_phrase_progress] Прогресс фразы %s: %s", phrase_id, new_total_progress)
                 
-                logger.info(f"[END_FUNCTION][update_phrase_progress] Прогресс фразы {phrase_id} обновлен")
+                logger.debug("[END_FUNCTION][update_phrase_progress] Прогресс фразы %s обновлен", phrase_id)
                 return became_learned
                 
         except sqlite3.Error as e:
-            logger.error(f"[ERROR][update_phrase_progress] Ошибка обновления прогресса фразы {phrase_id}: {e}")
+            logger.error("[ERROR][update_phrase_progress] Ошибка обновления прогресса фразы %s: %s", phrase_id, e)
             raise
     # endregion FUNCTION update_phrase_progress
     
@@ -472,14 +1210,12 @@ class DatabaseManager:
         Returns:
             Текущий прогресс фразы (total_progress_score)
         """
-        logger.info(f"[START_FUNCTION][get_phrase_progress] Получение прогресса фразы {phrase_id}")
+        logger.debug("[START_FUNCTION][get_phrase_progress] Получение прогресса фразы %s", phrase_id)
         
         try:
-            with sqlite3.connect(self.db_path, timeout=10) as conn:
-                cursor = conn.cursor()
-                
+            with self._read_cursor() as cursor:
                 cursor.execute("""
-                    SELECT total_progress_score
+                    SELECT COALESCE(total_progress_score, 0.0)
                     FROM phrases
                     WHERE id = ?
                 """, (phrase_id,))
@@ -487,19 +1223,89 @@ class DatabaseManager:
                 result = cursor.fetchone()
                 
                 if result:
-                    progress = result[0] or 0.0
-                    logger.info(f"[END_FUNCTION][get_phrase_progress] Прогресс фразы {phrase_id}: {progress}")
+                    (progress,) = result
+                    logger.debug("[END_FUNCTION][get_phrase_progress] Прогресс фразы %s: %s", phrase_id, progress)
                     return progress
                 else:
-                    logger.warning(f"[WARNING][get_phrase_progress] Фраза {phrase_id} не найдена")
+                    logger.warning("[WARNING][get_phrase_progress] Фраза %s не найдена", phrase_id)
                     return 0.0
                     
         except sqlite3.Error as e:
-            logger.error(f"[ERROR][get_phrase_progress] Ошибка получения прогресса: {e}")
+            logger.error("[ERROR][get_phrase_progress] Ошибка получения прогресса: %s", e)
             return 0.0
     
     # endregion FUNCTION get_phrase_progress
     
+    # region FUNCTION get_phrase
+    def get_phrase(self, phrase_id: int) -> Optional[Dict]:
+        """Получает фразу по ID: словарь id, english_text, russian_text, difficulty или None."""
+        logger.debug("[START_FUNCTION][get_phrase] Получение фразы %s", phrase_id)
+        
+        try:
+            with self._read_cursor() as cursor:
+                cursor.execute("""
+                    SELECT id, english_text, russian_text, difficulty
+                    FROM phrases
+                    WHERE id = ?
+                """, (phrase_id,))
+                row = cursor.fetchone()
+            
+            logger.debug("[END_FUNCTION][get_phrase] Фраза %s найдена: %s", phrase_id, row is not None)
+            return dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.error("[ERROR][get_phrase] Ошибка получения фразы %s: %s", phrase_id, e)
+            raise
+    # endregion FUNCTION get_phrase
+    
+    # region FUNCTION count_phrases
+    def count_phrases(self) -> int:
+        """Возвращает число всех фраз в БД, включая выключенные и выученные."""
+        logger.debug("[START_FUNCTION][count_phrases] Подсчет фраз")
+        
+        try:
+            with self._read_cursor() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM phrases")
+                (count,) = cursor.fetchone()
+            
+            logger.debug("[END_FUNCTION][count_phrases] Фраз в БД: %s", count)
+            return count
+        except sqlite3.Error as e:
+            logger.error("[ERROR][count_phrases] Ошибка подсчета фраз: %s", e)
+            raise
+    # endregion FUNCTION count_phrases
+    
+    # region FUNCTION get_phrase_progress_many
+    def get_phrase_progress_many(self, phrase_ids: Iterable[int]) -> Dict[int, float]:
+        """
+        Получает прогресс изучения нескольких фраз пачками по PHRASE_LOOKUP_BATCH_SIZE.
+        
+        Args:
+            phrase_ids: ID фраз
+            
+        Returns:
+            Словарь phrase_id -> total_progress_score; отсутствующих фраз в нем нет
+        """
+        phrase_ids = list(dict.fromkeys(phrase_ids))
+        logger.debug("[START_FUNCTION][get_phrase_progress_many] Получение прогресса %s фраз", len(phrase_ids))
+        
+        progress: Dict[int, float] = {}
+        try:
+            with self._read_cursor() as cursor:
+                for placeholders, batch in self._lookup_batches(phrase_ids):
+                    cursor.execute(
+                        f"SELECT id, COALESCE(total_progress_score, 0.0) FROM phrases WHERE id IN ({placeholders})",
+                        batch
+                    )
+                    progress.update(cursor.fetchall())
+            
+            logger.debug("[END_FUNCTION][get_phrase_progress_many] Найдено фраз: %s", len(progress))
+            return progress
+            
+        except sqlite3.Error as e:
+            logger.error("[ERROR][get_phrase_progress_many] Ошибка получения прогресса: %s", e)
+            raise
+    # endregion FUNCTION get_phrase_progress_many
+    
     # region FUNCTION get_statistics
     # CONTRACT
     # Args:
@@ -524,21 +1330,19 @@ class DatabaseManager:
         Returns:
             Словарь со статистикой
         """
-        logger.info(f"[START_FUNCTION][get_statistics] Получение статистики для пользователя {user_id}")
+        logger.debug("[START_FUNCTION][get_statistics] Получение статистики для пользователя %s", user_id)
         
         try:
-            with sqlite3.connect(self.db_path, timeout=10) as conn:
-                cursor = conn.cursor()
-                
-                # Общая статистика
+            with self._read_cursor() as cursor:
+                # Готовые значения: счетчик фраз из phrase_totals и строка пользователя из statistics
                 cursor.execute("""
-                    SELECT 
-                        COUNT(DISTINCT p.id) as total_phrases,
-                        COUNT(CASE WHEN up.status = 'learned' THEN 1 END) as learned_phrases,
-                        AVG(up.current_score) as avg_score
-                    FROM phrases p
-                    LEFT JOIN user_progress up ON p.id = up.phrase_id AND up.user_id = ?
-                    WHERE p.is_active = 1
+                    SELECT
+                        t.active_phrases,
+                        COALESCE(s.learned_phrases, 0),
+                        s.avg_score
+                    FROM phrase_totals t
+                    LEFT JOIN statistics s ON s.user_id = ?
+                    WHERE t.id = 1
                 """, (user_id,))
                 
                 stats = cursor.fetchone()
@@ -561,11 +1365,11 @@ class DatabaseManager:
                         'avg_score': 0.0
                     }
                 
-                logger.info(f"[END_FUNCTION][get_statistics] Статистика получена: {result}")
+                logger.debug("[END_FUNCTION][get_statistics] Статистика получена: %s", result)
                 return result
                 
         except sqlite3.Error as e:
-            logger.error(f"[ERROR][get_statistics] Ошибка получения статистики: {e}")
+            logger.error("[ERROR][get_statistics] Ошибка получения статистики: %s", e)
             raise
     # endregion FUNCTION get_statistics
     
@@ -595,12 +1399,17 @@ class DatabaseManager:
         Returns:
             Словарь с прогрессом или None
         """
-        logger.info(f"[START_FUNCTION][get_learning_progress] Получение прогресса: user={user_id}, phrase={phrase_id}")
+        logger.debug("[START_FUNCTION][get_learning_progress] Получение прогресса: user=%s, phrase=%s", user_id, phrase_id)
+        
+        cache_key = ('learning_progress', user_id, phrase_id)
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            logger.debug("[END_FUNCTION][get_learning_progress] Прогресс взят из кэша")
+            # В кэше неизменяемая sqlite3.Row - вызывающий код получает свой словарь
+            return dict(cached)
         
         try:
-            with sqlite3.connect(self.db_path, timeout=10) as conn:
-                cursor = conn.cursor()
-                
+            with self._read_cursor() as cursor:
                 cursor.execute("""
                     SELECT 
                         up.current_score,
@@ -617,26 +1426,82 @@ class DatabaseManager:
                 result = cursor.fetchone()
                 
                 if result:
-                    progress = {
-                        'current_score': result[0],
-                        'attempts': result[1],
-                        'last_attempt': result[2],
-                        'status': result[3],
-                        'english_text': result[4],
-                        'russian_text': result[5]
-                    }
-                    
-                    logger.info(f"[END_FUNCTION][get_learning_progress] Прогресс получен: {progress}")
+                    # Строка неизменяема, поэтому кэшируется без копии; словарь строится один раз
+                    self._set_cached(cache_key, result)
+                    progress = dict(result)
+                    logger.debug("[END_FUNCTION][get_learning_progress] Прогресс получен: %s", progress)
                     return progress
                 else:
-                    logger.info(f"[END_FUNCTION][get_learning_progress] Прогресс не найден")
+                    logger.debug("[END_FUNCTION][get_learning_progress] Прогресс не найден")
                     return None
                     
         except sqlite3.Error as e:
-            logger.error(f"[ERROR][get_learning_progress] Ошибка получения прогресса: {e}")
+            logger.error("[ERROR][get_learning_progress] Ошибка получения прогресса: %s", e)
             raise
     # endregion FUNCTION get_learning_progress
     
+    # region FUNCTION iter_phrases
+    # CONTRACT
+    # Args:
+    #   - include_learned: Включать ли изученные фразы
+    # Returns:
+    #   - Iterator[Dict]: Фразы по одной, в порядке id
+    # Side Effects:
+    #   - Пока итератор не исчерпан или не закрыт, он занимает соединение из пула читателей
+    # Raises:
+    #   - sqlite3.Error: при ошибках запроса к БД
+    # Tests:
+    #   - БД содержит фразы: выдает словари фраз по одной
+    #   - БД пуста: не выдает ничего
+    
+    def iter_phrases(self, include_learned: bool = False) -> Iterator[Dict]:
+        """
+        Выдает фразы из базы данных по мере чтения строк, не собирая весь список.
+        
+        Args:
+            include_learned: Включать ли изученные фразы (по умолчанию False)
+            
+        Yields:
+            Словарь с информацией о фразе (тот же формат, что в get_all_phrases)
+        """
+        with self._read_cursor() as cursor:
+            # Словари строит фабрика этого курсора по фиксированному списку столбцов;
+            # row_factory соединения из пула не меняется
+            cursor.row_factory = self._phrase_from_row
+            if include_learned:
+                # Получаем все фразы, включая изученные
+                cursor.execute("""
+                    SELECT id, english_text AS phrase, COALESCE(russian_text, '') AS context,
+                           is_learned, COALESCE(total_progress_score, 0.0) AS total_progress_score, date_added
+                    FROM phrases
+                    WHERE is_active = 1
+                    ORDER BY id
+                """)
+            else:
+                # Получаем только не изученные фразы
+                cursor.execute("""
+                    SELECT id, english_text AS phrase, COALESCE(russian_text, '') AS context,
+                           is_learned, COALESCE(total_progress_score, 0.0) AS total_progress_score, date_added
+                    FROM phrases
+                    WHERE is_active = 1 AND is_learned = 0
+                    ORDER BY id
+                """)
+            
+            yield from cursor
+    
+    @staticmethod
+    def _phrase_from_row(cursor: sqlite3.Cursor, row: Tuple) -> Dict:
+        """Фабрика строк iter_phrases: phrase - english_text, context - russian_text."""
+        return {
+            'id': row[0],
+            'phrase': row[1],
+            'context': row[2],
+            'is_learned': bool(row[3]),
+            'total_progress_score': row[4],
+            'date_added': row[5],
+        }
+    # endregion FUNCTION iter_phrases
+    
     # region FUNCTION get_all_phrases
     # CONTRACT
     # Args:
@@ -655,54 +1520,31 @@ class DatabaseManager:
         """
         Получает фразы из базы данных.
         
+        Для обхода большого набора фраз без построения списка используйте iter_phrases().
+        
         Args:
             include_learned: Включать ли изученные фразы (по умолчанию False)
             
         Returns:
             Список словарей с информацией о фразах
         """
-        logger.info(f"[START_FUNCTION][get_all_phrases] Получение фраз, изученные: {include_learned}")
+        logger.debug("[START_FUNCTION][get_all_phrases] Получение фраз, изученные: %s", include_learned)
+        
+        cache_key = ('all_phrases', include_learned)
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            logger.debug("[END_FUNCTION][get_all_phrases] Получено %s фраз из кэша", len(cached))
+            return [dict(phrase) for phrase in cached]
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                if include_learned:
-                    # Получаем все фразы, включая изученные
-                    cursor.execute("""
-                        SELECT id, english_text, russian_text, is_learned, total_progress_score, date_added
-                        FROM phrases
-                        WHERE is_active = 1
-                        ORDER BY id
-                    """)
-                else:
-                    # Получаем только не изученные фразы
-                    cursor.execute("""
-                        SELECT id, english_text, russian_text, is_learned, total_progress_score, date_added
-                        FROM phrases
-                        WHERE is_active = 1 AND is_learned = 0
-                        ORDER BY id
-                    """)
-                
-                results = cursor.fetchall()
-                
-                phrases = []
-                for row in results:
-                    phrase = {
-                        'id': row[0],
-                        'phrase': row[1],  # english_text
-                        'context': row[2] if row[2] else '',  # russian_text
-                        'is_learned': bool(row[3]) if len(row) > 3 else False,  # is_learned
-                        'total_progress_score': row[4] if len(row) > 4 and row[4] else 0.0,  # total_progress_score
-                        'date_added': row[5] if len(row) > 5 else None  # date_added
-                    }
-                    phrases.append(phrase)
-                
-                logger.info(f"[END_FUNCTION][get_all_phrases] Получено {len(phrases)} фраз")
-                return phrases
-                
+            phrases = list(self.iter_phrases(include_learned))
+            
+            self._set_cached(cache_key, phrases)
+            logger.debug("[END_FUNCTION][get_all_phrases] Получено %s фраз", len(phrases))
+            return [dict(phrase) for phrase in phrases]
+            
         except sqlite3.Error as e:
-            logger.error(f"[ERROR][get_all_phrases] Ошибка получения фраз: {e}")
+            logger.error("[ERROR][get_all_phrases] Ошибка получения фраз: %s", e)
             raise
     # endregion FUNCTION get_all_phrases
     
@@ -742,101 +1584,153 @@ class DatabaseManager:
         Returns:
             Кортеж (phrase_id, english_text, russian_text) или None
         """
-        logger.info(f"[START_FUNCTION][get_weighted_random_phrase] Поиск взвешенной фразы для пользователя {user_id}")
+        logger.debug("[START_FUNCTION][get_weighted_random_phrase] Поиск взвешенной фразы для пользователя %s", user_id)
         
         try:
-            with sqlite3.connect(self.db_path, timeout=10) as conn:
-                cursor = conn.cursor()
-                
-                # Получаем все не изученные фразы с датой добавления
-                cursor.execute("""
-                    SELECT p.id, p.english_text, p.russian_text, p.date_added
-                    FROM phrases p
-                    LEFT JOIN user_progress up ON p.id = up.phrase_id AND up.user_id = ?
-                    WHERE p.is_active = 1
-                    AND p.is_learned = 0
-                    AND (up.status IS NULL OR up.status != 'learned')
-                    AND (up.current_score IS NULL OR up.current_score < ?)
-                """, (user_id, MAX_SCORE))
-                
-                results = cursor.fetchall()
-                
-                if not results:
-                    logger.info(f"[END_FUNCTION][get_weighted_random_phrase] Фразы для изучения не найдены")
-                    return None
-                
-                # Вычисляем веса для каждой фразы на основе даты добавления
-                now = datetime.now()
-                phrases_with_weights = []
-                
-                for row in results:
-                    phrase_id, english_text, russian_text, date_added_str = row
+            key = (user_id, new_phrase_priority, decay_days)
+            with self._read_cursor() as cursor:
+                for attempt in range(WEIGHTED_PICK_ATTEMPTS):
+                    table = self._alias_tables.get(key)
+                    if attempt or table is None or time.monotonic() - table[0] >= WEIGHTED_ALIAS_TTL_SECONDS:
+                        table = self._build_weighted_alias_table(cursor, key)
+                        if table is None:
+                            logger.debug("[END_FUNCTION][get_weighted_random_phrase] Фразы для изучения не найдены")
+                            return None
                     
-                    # Парсим дату добавления
-                    if date_added_str:
-                        try:
-                            # Пробуем разные форматы даты
-                            if isinstance(date_added_str, str):
-                                # SQLite формат: YYYY-MM-DD HH:MM:SS
-                                date_added = datetime.strptime(date_added_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                            else:
-                                date_added = datetime.fromisoformat(str(date_added_str))
-                        except (ValueError, AttributeError):
-                            # Если не удалось распарсить, считаем фразу новой
-                            date_added = now
+                    _, phrase_ids, prob, alias = table
+                    if alias is None:
+                        # Малый набор: prob - накопленные веса; min() - на случай округления u * total до total
+                        index = min(bisect_right(prob, random.random() * prob[-1]), len(phrase_ids) - 1)
                     else:
-                        # Если даты нет, считаем фразу новой
-                        date_added = now
-                    
-                    # Вычисляем возраст фразы в днях
-                    age_days = (now - date_added).total_seconds() / 86400  # секунды в день
-                    
-                    # Вычисляем вес: новые фразы имеют больший вес
-                    # Используем экспоненциальное затухание: weight = new_phrase_priority * exp(-age_days / decay_days)
-                    # Минимальный вес = 1.0 (чтобы старые фразы тоже показывались)
-                    weight = max(1.0, new_phrase_priority * math.exp(-age_days / decay_days))
+                        # Одно случайное число на выбор: целая часть u * n - столбец таблицы,
+                        # дробная - равномерная монета для сравнения с prob
+                        draw = random.random() * len(phrase_ids)
+                        index = int(draw)
+                        if draw - index >= prob[index]:
+                            index = alias[index]
+                    phrase_id = phrase_ids[index]
                     
-                    phrases_with_weights.append({
-                        'phrase_id': phrase_id,
-                        'english_text': english_text,
-                        'russian_text': russian_text,
-                        'weight': weight,
-                        'age_days': age_days
-                    })
-                
-                # Выбираем фразу с учетом весов (взвешенная случайная выборка)
-                total_weight = sum(p['weight'] for p in phrases_with_weights)
-                
-                if total_weight == 0:
-                    # Если все веса нулевые, выбираем случайно
-                    selected = random.choice(phrases_with_weights)
-                else:
-                    # Взвешенная случайная выборка
-                    random_value = random.uniform(0, total_weight)
-                    cumulative_weight = 0
-                    
-                    for phrase in phrases_with_weights:
-                        cumulative_weight += phrase['weight']
-                        if random_value <= cumulative_weight:
-                            selected = phrase
-                            break
-                    else:
-                        # Fallback на последнюю фразу
-                        selected = phrases_with_weights[-1]
+                    # Таблица могла устареть (фраза выучена или выключена) - проверяем выбор
+                    cursor.execute("""
+                        SELECT p.english_text, p.russian_text
+                        FROM phrases p
+                        LEFT JOIN user_progress up ON p.id = up.phrase_id AND up.user_id = ?
+                        WHERE p.id = ?
+                        AND p.is_active = 1
+                        AND p.is_learned = 0
+                        AND (up.status IS NULL OR up.status != 'learned')
+                        AND (up.current_score IS NULL OR up.current_score < ?)
+                    """, (user_id, phrase_id, MAX_SCORE))
+                    row = cursor.fetchone()
+                    if row:
+                        logger.debug("[END_FUNCTION][get_weighted_random_phrase] Выбрана фраза ID: %s", phrase_id)
+                        return phrase_id, row[0], row[1]
                 
-                logger.info(f"[END_FUNCTION][get_weighted_random_phrase] Выбрана фраза ID: {selected['phrase_id']}, возраст: {selected['age_days']:.1f} дней, вес: {selected['weight']:.2f}")
-                return selected['phrase_id'], selected['english_text'], selected['russian_text']
+                # Фразы меняются быстрее, чем строятся таблицы - выбираем прямо в SQLite
+                logger.warning("[WARNING][get_weighted_random_phrase] Выбор не подтвердился после %s попыток", WEIGHTED_PICK_ATTEMPTS)
+                cursor.execute(
+                    PICK_WEIGHTED_PHRASE_SQL,
+                    (user_id, MAX_SCORE, new_phrase_priority, decay_days)
+                )
+                selected = cursor.fetchone()
+            
+            if not selected:
+                logger.debug("[END_FUNCTION][get_weighted_random_phrase] Фразы для изучения не найдены")
+                return None
+            logger.debug("[END_FUNCTION][get_weighted_random_phrase] Выбрана фраза ID: %s", selected[0])
+            return tuple(selected)
                 
         except sqlite3.Error as e:
-            logger.error(f"[ERROR][get_weighted_random_phrase] Ошибка получения фразы: {e}")
+            logger.error("[ERROR][get_weighted_random_phrase] Ошибка получения фразы: %s", e)
             raise
         except Exception as e:
-            logger.error(f"[ERROR][get_weighted_random_phrase] Неожиданная ошибка: {e}")
+            logger.error("[ERROR][get_weighted_random_phrase] Неожиданная ошибка: %s", e)
             # Fallback на обычный случайный выбор
             return self.get_random_phrase(user_id)
     
     # endregion FUNCTION get_weighted_random_phrase
     
+    # region FUNCTION _build_weighted_alias_table
+    def _build_weighted_alias_table(
+        self,
+        cursor: sqlite3.Cursor,
+        key: Tuple[int, float, int]
+    ) -> Optional[Tuple[float, array, array, Optional[array]]]:
+        """
+        Считает веса доступных фраз и строит по ним таблицу псевдонимов.
+        
+        Веса считает SQLite (PHRASE_WEIGHT_SQL), в Python приходят только пары (id, вес).
+        Не больше WEIGHTED_BISECT_MAX_PHRASES фраз - вместо таблицы псевдонимов
+        только накопленные веса (alias = None) для выбора через bisect.
+        
+        Returns:
+            (момент построения, phrase_id[], prob[], alias[]) или None, если фраз нет
+        """
+        user_id, new_phrase_priority, decay_days = key
+        # Голые кортежи вместо sqlite3.Row: столбцы раскладываются через zip() в C,
+        # без Python-цикла по строкам (row_factory соединения из пула не меняется)
+        cursor.row_factory = None
+        cursor.execute(
+            WEIGHTED_PHRASE_WEIGHTS_SQL,
+            (new_phrase_priority, decay_days, user_id, MAX_SCORE)
+        )
+        rows = cursor.fetchall()
+        
+        if not rows:
+            self._alias_tables.pop(key, None)
+            return None
+        
+        phrase_ids, weights = zip(*rows)
+        if len(weights) <= WEIGHTED_BISECT_MAX_PHRASES:
+            prob, alias = array('d', accumulate(weights)), None
+        else:
+            prob, alias = self._build_alias_table(weights)
+        # Столбцы в array: 8 байт на элемент вместо ссылки на отдельный объект int/float.
+        # Таблицы живут до WEIGHTED_ALIAS_TTL_SECONDS на каждого пользователя
+        table = (time.monotonic(), array('q', phrase_ids), prob, alias)
+        self._alias_tables[key] = table
+        return table
+    
+    @staticmethod
+    def _build_alias_table(weights: Sequence[float]) -> Tuple[array, array]:
+        """
+        Строит таблицу псевдонимов Воуза: после O(n) подготовки выбор занимает O(1).
+        
+        Индекс i выбирается равновероятно; с вероятностью prob[i] результат - i,
+        иначе alias[i]. Итоговая вероятность индекса пропорциональна его весу.
+        """
+        count = len(weights)
+        factor = count / math.fsum(weights)
+        scaled = [weight * factor for weight in weights]
+        prob = array('d', [1.0]) * count
+        alias = array('q', range(count))
+        
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            prob[less] = scaled[less]
+            alias[less] = more
+            scaled[more] += scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Остатки - из-за погрешности округления их доля равна 1
+        return prob, alias
+    
+    def _forget_alias_tables(self, user_id: Optional[int] = None) -> None:
+        """Сбрасывает таблицы псевдонимов пользователя (или всех, если user_id=None)."""
+        if user_id is None:
+            self._alias_tables.clear()
+            return
+        # list() - снимок ключей: словарь могут менять другие потоки
+        for key in list(self._alias_tables):
+            if key[0] == user_id:
+                self._alias_tables.pop(key, None)
+    
+    def _forget_phrase_queues(self) -> None:
+        """Сбрасывает очереди get_random_phrase всех пользователей после изменения фраз."""
+        self._phrase_queues.clear()
+    # endregion FUNCTION _build_weighted_alias_table
+    
     # region FUNCTION get_learned_phrases_stats
     # CONTRACT
     # Args:
@@ -858,47 +1752,39 @@ class DatabaseManager:
         Returns:
             Словарь со статистикой изучения
         """
-        logger.info("[START_FUNCTION][get_learned_phrases_stats] Получение статистики изученных фраз")
+        logger.debug("[START_FUNCTION][get_learned_phrases_stats] Получение статистики изученных фраз")
+        
+        # Кэш чтений сбрасывается любой записью через DatabaseManager
+        cache_key = ('learned_phrases_stats',)
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            logger.debug("[END_FUNCTION][get_learned_phrases_stats] Статистика взята из кэша")
+            return dict(cached)
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
+            with self._read_cursor() as cursor:
                 # Получаем общую статистику
+                # Агрегат без GROUP BY всегда возвращает одну строку; NULL на пустой
+                # таблице заменяет COALESCE
                 cursor.execute("""
                     SELECT 
                         COUNT(*) as total_phrases,
-                        SUM(CASE WHEN is_learned = 1 THEN 1 ELSE 0 END) as learned_phrases,
-                        SUM(CASE WHEN is_learned = 0 THEN 1 ELSE 0 END) as active_phrases,
-                        AVG(CASE WHEN is_learned = 1 THEN total_progress_score ELSE NULL END) as avg_learned_score
+                        COALESCE(SUM(CASE WHEN is_learned = 1 THEN 1 ELSE 0 END), 0) as learned_phrases,
+                        COALESCE(SUM(CASE WHEN is_learned = 0 THEN 1 ELSE 0 END), 0) as active_phrases,
+                        ROUND(COALESCE(AVG(CASE WHEN is_learned = 1 THEN total_progress_score ELSE NULL END), 0), 2) as avg_learned_score,
+                        COALESCE(ROUND(100.0 * SUM(is_learned = 1) / NULLIF(COUNT(*), 0), 1), 0) as learning_percentage
                     FROM phrases 
                     WHERE is_active = 1
                 """)
                 
-                result = cursor.fetchone()
-                
-                if result:
-                    stats = {
-                        'total_phrases': result[0] or 0,
-                        'learned_phrases': result[1] or 0,
-                        'active_phrases': result[2] or 0,
-                        'avg_learned_score': round(result[3] or 0, 2),
-                        'learning_percentage': round((result[1] or 0) / (result[0] or 1) * 100, 1) if result[0] else 0
-                    }
-                else:
-                    stats = {
-                        'total_phrases': 0,
-                        'learned_phrases': 0,
-                        'active_phrases': 0,
-                        'avg_learned_score': 0.0,
-                        'learning_percentage': 0.0
-                    }
-                
-                logger.info(f"[END_FUNCTION][get_learned_phrases_stats] Статистика: {stats}")
-                return stats
+                stats = dict(cursor.fetchone())
+            
+            self._set_cached(cache_key, stats)
+            logger.debug("[END_FUNCTION][get_learned_phrases_stats] Статистика: %s", stats)
+            return dict(stats)
                 
         except sqlite3.Error as e:
-                logger.error(f"[ERROR][get_learned_phrases_stats] Ошибка получения статистики: {e}")
+                logger.error("[ERROR][get_learned_phrases_stats] Ошибка получения статистики: %s", e)
                 raise
     # endregion FUNCTION get_learned_phrases_stats
     
@@ -912,31 +1798,36 @@ class DatabaseManager:
         exercise_type: str = 'translate_to_russian'
     ) -> None:
         """Сохраняет ожидаемый ответ пользователя в БД."""
-        logger.info(f"[START_FUNCTION][save_expected_answer] Сохранение ожидаемого ответа для user_id={user_id}, phrase_id={phrase_id}")
+        logger.debug("[START_FUNCTION][save_expected_answer] Сохранение ожидаемого ответа для user_id=%s, phrase_id=%s", user_id, phrase_id)
         
         try:
-            with sqlite3.connect(self.db_path, timeout=10) as conn:
-                cursor = conn.cursor()
+            # Запись идет на каждое упражнение: кэш прогресса и фраз она не затрагивает.
+            # UPSERT обновляет строку на месте, а не удаляет и вставляет ее заново, как REPLACE
+            with self._transaction(invalidate_reads=False) as cursor:
                 cursor.execute("""
-                    INSERT OR REPLACE INTO user_expected_answers 
+                    INSERT INTO user_expected_answers 
                     (user_id, phrase_id, english_phrase, russian_translation, exercise_type, created_at)
-                    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    VALUES (?, ?, ?, ?, ?, unixepoch())
+                    ON CONFLICT(user_id) DO UPDATE SET
+                        phrase_id = excluded.phrase_id,
+                        english_phrase = excluded.english_phrase,
+                        russian_translation = excluded.russian_translation,
+                        exercise_type = excluded.exercise_type,
+                        created_at = excluded.created_at
                 """, (user_id, phrase_id, english_phrase, russian_translation, exercise_type))
-                conn.commit()
-                logger.info(f"[END_FUNCTION][save_expected_answer] Ожидаемый ответ сохранен")
+                logger.debug("[END_FUNCTION][save_expected_answer] Ожидаемый ответ сохранен")
         except sqlite3.Error as e:
-            logger.error(f"[ERROR][save_expected_answer] Ошибка сохранения: {e}")
+            logger.error("[ERROR][save_expected_answer] Ошибка сохранения: %s", e)
             raise
     # endregion FUNCTION save_expected_answer
     
     # region FUNCTION get_expected_answer
     def get_expected_answer(self, user_id: int) -> Optional[Dict]:
         """Получает ожидаемый ответ пользователя из БД."""
-        logger.info(f"[START_FUNCTION][get_expected_answer] Получение ожидаемого ответа для user_id={user_id}")
+        logger.debug("[START_FUNCTION][get_expected_answer] Получение ожидаемого ответа для user_id=%s", user_id)
         
         try:
-            with sqlite3.connect(self.db_path, timeout=10) as conn:
-                cursor = conn.cursor()
+            with self._read_cursor() as cursor:
                 cursor.execute("""
                     SELECT phrase_id, english_phrase, russian_translation, exercise_type
                     FROM user_expected_answers
@@ -945,40 +1836,189 @@ class DatabaseManager:
                 row = cursor.fetchone()
                 
                 if row:
-                    result = {
-                        'phrase_id': row[0],
-                        'english_phrase': row[1],
-                        'russian_translation': row[2],
-                        'exercise_type': row[3]
-                    }
-                    logger.info(f"[END_FUNCTION][get_expected_answer] Найден ожидаемый ответ для user_id={user_id}")
+                    result = dict(row)
+                    logger.debug("[END_FUNCTION][get_expected_answer] Найден ожидаемый ответ для user_id=%s", user_id)
                     return result
                 else:
-                    logger.info(f"[END_FUNCTION][get_expected_answer] Ожидаемый ответ не найден для user_id={user_id}")
+                    logger.debug("[END_FUNCTION][get_expected_answer] Ожидаемый ответ не найден для user_id=%s", user_id)
                     return None
         except sqlite3.Error as e:
-            logger.error(f"[ERROR][get_expected_answer] Ошибка получения: {e}")
+            logger.error("[ERROR][get_expected_answer] Ошибка получения: %s", e)
             return None
     # endregion FUNCTION get_expected_answer
     
+    # region FUNCTION get_all_expected_answers
+    def get_all_expected_answers(self) -> Dict[int, Dict]:
+        """Получает ожидаемые ответы всех пользователей (user_id -> ответ) для восстановления после перезапуска."""
+        logger.debug("[START_FUNCTION][get_all_expected_answers] Получение всех ожидаемых ответов")
+        
+        try:
+            with self._read_cursor() as cursor:
+                cursor.execute("""
+                    SELECT user_id, phrase_id, english_phrase, russian_translation, exercise_type
+                    FROM user_expected_answers
+                """)
+                result = {row['user_id']: dict(row) for row in cursor.fetchall()}
+                for answer in result.values():
+                    del answer['user_id']
+            
+            logger.debug("[END_FUNCTION][get_all_expected_answers] Найдено ожидаемых ответов: %s", len(result))
+            return result
+        except sqlite3.Error as e:
+            logger.error("[ERROR][get_all_expected_answers] Ошибка получения: %s", e)
+            raise
+    # endregion FUNCTION get_all_expected_answers
+    
     # region FUNCTION delete_expected_answer
     def delete_expected_answer(self, user_id: int) -> None:
         """Удаляет ожидаемый ответ пользователя из БД."""
-        logger.info(f"[START_FUNCTION][delete_expected_answer] Удаление ожидаемого ответа для user_id={user_id}")
+        logger.debug("[START_FUNCTION][delete_expected_answer] Удаление ожидаемого ответа для user_id=%s", user_id)
         
         try:
-            with sqlite3.connect(self.db_path, timeout=10) as conn:
-                cursor = conn.cursor()
+            with self._transaction(invalidate_reads=False) as cursor:
                 cursor.execute("DELETE FROM user_expected_answers WHERE user_id = ?", (user_id,))
-                conn.commit()
-                logger.info(f"[END_FUNCTION][delete_expected_answer] Ожидаемый ответ удален")
+                logger.debug("[END_FUNCTION][delete_expected_answer] Ожидаемый ответ удален")
         except sqlite3.Error as e:
-            logger.error(f"[ERROR][delete_expected_answer] Ошибка удаления: {e}")
+            logger.error("[ERROR][delete_expected_answer] Ошибка удаления: %s", e)
             raise
     # endregion FUNCTION delete_expected_answer
     
+    # region FUNCTION bulk_import_history
+    # CONTRACT
+    # Args:
+    #   - rows: Кортежи (user_id, phrase_id, user_answer, ai_score, timestamp), timestamp - unix time
+    # Returns:
+    #   - int: Количество добавленных записей
+    # Side Effects:
+    #   - Добавляет записи в answer_history одной транзакцией
+    # Raises:
+    #   - sqlite3.Error: при ошибках записи в БД (транзакция откатывается)
+    # Tests:
+    #   - rows=[(1, 1, "Привет", 1.0, 1700000000)]: возвращает 1
+    
+    def bulk_import_history(self, rows: Iterable[Tuple[int, int, str, float, int]]) -> int:
+        """
+        Импортирует историю ответов одной транзакцией (executemany).
+        
+        Args:
+            rows: Кортежи (user_id, phrase_id, user_answer, ai_score, timestamp)
+            
+        Returns:
+            Количество добавленных записей
+        """
+        logger.debug("[START_FUNCTION][bulk_import_history] Импорт истории ответов")
+        
+        try:
+            with self._transaction() as cursor:
+                cursor.executemany("""
+                    INSERT INTO answer_history (user_id, phrase_id, user_answer, ai_score, timestamp)
+                    VALUES (?, ?, ?, ?, ?)
+                """, rows)
+                added = cursor.rowcount
+            
+            logger.debug("[END_FUNCTION][bulk_import_history] Добавлено записей: %s", added)
+            return added
+            
+        except sqlite3.Error as e:
+            logger.error("[ERROR][bulk_import_history] Ошибка импорта истории ответов: %s", e)
+            raise
+    # endregion FUNCTION bulk_import_history
+    
+    # region FUNCTION prune_history
+    def prune_history(self, days: int = ANSWER_HISTORY_RETENTION_DAYS) -> int:
+        """
+        Удаляет из answer_history ответы старше days дней.
+        
+        Прогресс и статистика хранятся в user_progress/statistics, поэтому
+        старая история не нужна; удаление идет по индексу idx_ah_timestamp.
+        В БД, не прошедших migrate_database.py, timestamp хранится строкой
+        CURRENT_TIMESTAMP: в SQLite любая строка больше любого числа, поэтому
+        такие записи сравниваются со строковой датой datetime().
+        Предназначено для периодического обслуживания.
+        
+        Args:
+            days: Сколько дней истории оставить
+            
+        Returns:
+            Количество удаленных записей
+        """
+        try:
+            with self._transaction() as cursor:
+                modifier = f"-{int(days)} days"
+                cursor.execute("""
+                    DELETE FROM answer_history
+                    WHERE timestamp < unixepoch('now', ?1)
+                    OR (typeof(timestamp) = 'text' AND timestamp < datetime('now', ?1))
+                """, (modifier,))
+                deleted = cursor.rowcount
+            
+            if deleted:
+                logger.info("[INFO][prune_history] Удалено старых ответов: %s", deleted)
+            return deleted
+            
+        except sqlite3.Error as e:
+            logger.error("[ERROR][prune_history] Ошибка очистки истории ответов: %s", e)
+            return 0
+    # endregion FUNCTION prune_history
+    
+    # region FUNCTION incremental_vacuum
+    def incremental_vacuum(self, pages: int = INCREMENTAL_VACUUM_PAGES) -> int:
+        """
+        Возвращает файловой системе до pages свободных страниц БД.
+        
+        Работает для БД, созданных с auto_vacuum=INCREMENTAL; для остальных
+        ничего не делает. Предназначено для периодического обслуживания.
+        
+        Args:
+            pages: Максимум освобождаемых страниц за вызов
+            
+        Returns:
+            Количество освобожденных страниц
+        """
+        try:
+            with self._lock:
+                free_before = self.connection.execute("PRAGMA freelist_count").fetchone()[0]
+                # execute() делает один шаг и освобождает одну страницу;
+                # executescript() выполняет PRAGMA до конца
+                self.connection.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+                free_after = self.connection.execute("PRAGMA freelist_count").fetchone()[0]
+            
+            freed = free_before - free_after
+            if freed:
+                logger.info("[INFO][incremental_vacuum] Освобождено страниц: %s", freed)
+            return freed
+            
+        except sqlite3.Error as e:
+            logger.error("[ERROR][incremental_vacuum] Ошибка очистки БД: %s", e)
+            return 0
+    # endregion FUNCTION incremental_vacuum
+    
+    # region FUNCTION optimize
+    def optimize(self) -> None:
+        """
+        Обновляет статистику планировщика (PRAGMA optimize).
+        
+        SQLite сам решает, для каких таблиц нужен ANALYZE, поэтому вызов дешевый,
+        если данные почти не менялись. Предназначено для периодического обслуживания.
+        """
+        try:
+            with self._lock:
+                self.connection.execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            logger.error("[ERROR][optimize] Ошибка обновления статистики БД: %s", e)
+    # endregion FUNCTION optimize
+    
     def close(self):
         """Закрывает соединение с базой данных."""
-        if self.connection:
-            self.connection.close()
-            logger.info("[INFO] Соединение с БД закрыто")
+        with self._lock:
+            while not self._read_pool.empty():
+                self._read_pool.get_nowait().close()
+            if self.connection:
+                # Перед закрытием - как рекомендует SQLite для долгоживущих соединений
+                try:
+                    self.connection.execute("PRAGMA optimize")
+                except sqlite3.Error as e:
+                    logger.warning("[WARNING][close] PRAGMA optimize не выполнен: %s", e)
+                self.connection.close()
+                self.connection = None
+                logger.info("[INFO] Соединение с БД закрыто")
@@ -15,7 +15,7 @@
 import os
 import json
 import logging
-import sqlite3
+from functools import lru_cache
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 
@@ -25,10 +25,45 @@ from googleapiclient.errors import HttpError
 
 from .database import DatabaseManager
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+# Логирование настраивает точка входа приложения
 logger = logging.getLogger(__name__)
 
+# Форматы дат в столбце Date Added таблицы Google Sheets, кроме ISO
+# (YYYY-MM-DD и YYYY-MM-DD HH:MM:SS разбирает datetime.fromisoformat)
+SHEET_DATE_FORMATS = (
+    '%d.%m.%Y',
+    '%d/%m/%Y',
+    '%d.%m.%Y %H:%M:%S',
+)
+# Различных дат в таблице немного: фразы добавляют пачками в один день
+SHEET_DATE_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=SHEET_DATE_CACHE_SIZE)
+def _parse_sheet_date(text: str) -> Optional[int]:
+    """
+    Переводит дату из Google Sheets в unix timestamp.
+    
+    Кэшируется по исходной строке: strptime с перебором форматов дорог,
+    а одна и та же дата повторяется у многих строк таблицы. ISO-даты
+    разбирает fromisoformat (реализован на C, без локали и регулярных выражений).
+    
+    Returns:
+        Unix timestamp или None, если ни один формат не подошел
+    """
+    text = text.strip()
+    try:
+        return int(datetime.fromisoformat(text).timestamp())
+    except ValueError:
+        pass
+    for fmt in SHEET_DATE_FORMATS:
+        try:
+            return int(datetime.strptime(text, fmt).timestamp())
+        except ValueError:
+            continue
+    return None
+
+
 class GoogleSheetsSync:
     """Класс для синхронизации с Google Sheets."""
     
@@ -64,7 +99,7 @@ class GoogleSheetsSync:
             logger.info("Аутентификация Google Sheets API успешно настроена")
             
         except Exception as e:
-            logger.error(f"Ошибка настройки аутентификации: {e}")
+            logger.error("Ошибка настройки аутентификации: %s", e)
             raise
     
     def get_phrases_from_sheets(self, range_name: str = "english!A:E") -> List[Dict]:
@@ -92,7 +127,7 @@ class GoogleSheetsSync:
             
             # Обрабатываем заголовки
             headers = values[0]
-            logger.info(f"Найдено {len(values) - 1} строк с данными")
+            logger.info("Найдено %s строк с данными", len(values) - 1)
             
             # Преобразуем данные в список словарей
             phrases = []
@@ -123,30 +158,32 @@ class GoogleSheetsSync:
                     if phrase_data['english_text'] and phrase_data['russian_text']:
                         phrases.append(phrase_data)
                     else:
-                        logger.warning(f"Строка {i}: пропущена - неполные данные")
+                        logger.warning("Строка %s: пропущена - неполные данные", i)
             
-            logger.info(f"Обработано {len(phrases)} валидных фраз")
+            logger.info("Обработано %s валидных фраз", len(phrases))
             return phrases
             
         except HttpError as e:
-            logger.error(f"Ошибка Google Sheets API: {e}")
+            logger.error("Ошибка Google Sheets API: %s", e)
             raise
         except Exception as e:
-            logger.error(f"Ошибка чтения данных: {e}")
+            logger.error("Ошибка чтения данных: %s", e)
             raise
     
     def sync_phrases_to_database(self, phrases: List[Dict]) -> Tuple[int, int, int]:
         """
         Синхронизация фраз с базой данных SQLite.
         
+        Все фразы записываются одной транзакцией (DatabaseManager.sync_phrases)
+        вместо отдельных поиска и вставки/обновления на каждую строку таблицы.
+        
         Args:
             phrases: Список фраз из Google Sheets
             
         Returns:
             Кортеж (добавлено, обновлено, ошибок)
         """
-        added_count = 0
-        updated_count = 0
+        rows = []
         error_count = 0
         
         for phrase_data in phrases:
@@ -157,37 +194,37 @@ class GoogleSheetsSync:
                 # Определяем сложность на основе длины текста
                 difficulty = self._determine_difficulty(english_text)
                 
-                # Проверяем, существует ли фраза в БД
-                existing_phrase = self._find_existing_phrase(english_text)
-                
-                if existing_phrase:
-                    # Обновляем существующую фразу
-                    self._update_existing_phrase(existing_phrase['id'], russian_text, difficulty)
-                    updated_count += 1
-                    logger.debug(f"Обновлена фраза: {english_text}")
-                else:
-                    # Добавляем новую фразу напрямую в БД с датой из Google Sheets
-                    date_added = phrase_data.get('date')
-                    phrase_id = self._add_phrase_to_db(english_text, russian_text, difficulty, date_added)
-                    added_count += 1
-                    logger.debug(f"Добавлена новая фраза (ID: {phrase_id}): {english_text}, дата: {date_added}")
+                # Дата из Google Sheets; неразборчивая или пустая - текущая дата
+                date_added = phrase_data.get('date')
+                date_added = _parse_sheet_date(date_added) if isinstance(date_added, str) and date_added else None
                 
-                # Обновляем прогресс фразы из Google Sheets
-                if phrase_data.get('progress_score', 0) > 0:
-                    try:
-                        phrase_id = existing_phrase['id'] if existing_phrase else phrase_id
-                        self._update_phrase_progress_in_db(phrase_id, phrase_data['progress_score'])
-                        logger.debug(f"Обновлен прогресс фразы {phrase_id}: {phrase_data['progress_score']}")
-                    except Exception as e:
-                        logger.warning(f"Не удалось обновить прогресс фразы {english_text}: {e}")
+                rows.append((english_text, russian_text, difficulty, date_added, phrase_data.get('progress_score', 0)))
                     
             except Exception as e:
                 error_count += 1
-                logger.error(f"Ошибка обработки фразы '{phrase_data.get('english_text', 'N/A')}': {e}")
+                logger.error("Ошибка обработки фразы '%s': %s", phrase_data.get('english_text', 'N/A'), e)
         
-        logger.info(f"Синхронизация завершена: добавлено {added_count}, обновлено {updated_count}, ошибок {error_count}")
+        try:
+            added_count, updated_count = self._get_database().sync_phrases(rows)
+        except Exception as e:
+            # Транзакция откатилась целиком - не записана ни одна фраза
+            logger.error("Ошибка записи фраз в БД: %s", e)
+            return 0, 0, error_count + len(rows)
+        
+        logger.info("Синхронизация завершена: добавлено %s, обновлено %s, ошибок %s", added_count, updated_count, error_count)
         return added_count, updated_count, error_count
     
+    def _get_database(self) -> DatabaseManager:
+        """
+        Возвращает менеджер БД; если он не передан, создает его для config.DATABASE_PATH.
+        
+        Все обращения к SQLite идут через одно долгоживущее соединение менеджера,
+        а не через новое подключение на каждый вызов.
+        """
+        if self.database_manager is None:
+            self.database_manager = DatabaseManager()
+        return self.database_manager
+    
     def _determine_difficulty(self, english_text: str) -> str:
         """
         Определение сложности фразы на основе длины и содержания.
@@ -207,67 +244,6 @@ class GoogleSheetsSync:
         else:
             return 'hard'
     
-    def _find_existing_phrase(self, english_text: str) -> Optional[Dict]:
-        """
-        Поиск существующей фразы в базе данных.
-        
-        Args:
-            english_text: Английский текст для поиска
-            
-        Returns:
-            Словарь с данными фразы или None
-        """
-        try:
-            # Простой поиск по точному совпадению
-            # В будущем можно улучшить поиск (например, игнорировать регистр)
-            from config.config import DATABASE_PATH
-            db_path = DATABASE_PATH
-            
-            with sqlite3.connect(db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT id, english_text, russian_text, difficulty FROM phrases WHERE english_text = ?",
-                    (english_text,)
-                )
-                result = cursor.fetchone()
-                
-                if result:
-                    return {
-                        'id': result[0],
-                        'english_text': result[1],
-                        'russian_text': result[2],
-                        'difficulty': result[3]
-                    }
-                return None
-                
-        except Exception as e:
-            logger.error(f"Ошибка поиска фразы: {e}")
-            return None
-    
-    def _update_existing_phrase(self, phrase_id: int, russian_text: str, difficulty: str) -> None:
-        """
-        Обновление существующей фразы в базе данных.
-        
-        Args:
-            phrase_id: ID фразы для обновления
-            russian_text: Новый русский перевод
-            difficulty: Новая сложность
-        """
-        try:
-            from config.config import DATABASE_PATH
-            db_path = DATABASE_PATH
-            
-            with sqlite3.connect(db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "UPDATE phrases SET russian_text = ?, difficulty = ? WHERE id = ?",
-                    (russian_text, difficulty, phrase_id)
-                )
-                
-        except Exception as e:
-            logger.error(f"Ошибка обновления фразы {phrase_id}: {e}")
-            raise
-    
     def full_sync(self) -> Dict[str, int]:
         """
         Полная синхронизация фраз из Google Sheets в базу данных.
@@ -295,11 +271,11 @@ class GoogleSheetsSync:
                 'total': len(phrases)
             }
             
-            logger.info(f"Синхронизация завершена успешно: {result}")
+            logger.info("Синхронизация завершена успешно: %s", result)
             return result
             
         except Exception as e:
-            logger.error(f"Ошибка полной синхронизации: {e}")
+            logger.error("Ошибка полной синхронизации: %s", e)
             raise
     
     def get_sync_status(self) -> Dict[str, any]:
@@ -314,13 +290,8 @@ class GoogleSheetsSync:
             sheets_phrases = self.get_phrases_from_sheets("english!A:E")
             sheets_count = len(sheets_phrases)
             
-            # Получаем количество фраз в базе данных напрямую
-            from config.config import DATABASE_PATH
-            db_path = DATABASE_PATH
-            with sqlite3.connect(db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM phrases")
-                db_count = cursor.fetchone()[0]
+            # Количество фраз в базе данных - через общий менеджер БД
+            db_count = self._get_database().count_phrases()
             
             # Вычисляем процент синхронизации
             sync_percentage = (db_count / sheets_count * 100) if sheets_count > 0 else 0
@@ -334,7 +305,7 @@ class GoogleSheetsSync:
             }
             
         except Exception as e:
-            logger.error(f"Ошибка получения статуса синхронизации: {e}")
+            logger.error("Ошибка получения статуса синхронизации: %s", e)
             # Возвращаем безопасный результат с ошибкой
             return {
                 'sheets_count': 0,
@@ -353,7 +324,7 @@ class GoogleSheetsSync:
             phrase_id: ID фразы для обновления
             new_progress: Новый общий прогресс фразы
         """
-        logger.info(f"[START_FUNCTION][update_phrase_progress_in_sheets] Обновление прогресса фразы {phrase_id} в Google Sheets: {new_progress}")
+        logger.info("[START_FUNCTION][update_phrase_progress_in_sheets] Обновление прогресса фразы %s в Google Sheets: %s", phrase_id, new_progress)
         
         try:
             # Используем переменные окружения
@@ -363,8 +334,8 @@ class GoogleSheetsSync:
             spreadsheet_id = GOOGLE_SHEETS_SPREADSHEET_ID
             
             # Отладочная информация
-            logger.info(f"[DEBUG] credentials_path: {credentials_path}")
-            logger.info(f"[DEBUG] spreadsheet_id: {spreadsheet_id}")
+            logger.debug("[DEBUG] credentials_path: %s", credentials_path)
+            logger.debug("[DEBUG] spreadsheet_id: %s", spreadsheet_id)
             
             # Если сервис не настроен, настраиваем его
             if not self.service:
@@ -375,37 +346,24 @@ class GoogleSheetsSync:
             # Получаем данные фразы из БД для поиска в Google Sheets
             phrase_data = self._get_phrase_by_id(phrase_id)
             if not phrase_data:
-                logger.warning(f"[WARNING][update_phrase_progress_in_sheets] Фраза {phrase_id} не найдена в БД")
+                logger.warning("[WARNING][update_phrase_progress_in_sheets] Фраза %s не найдена в БД", phrase_id)
                 return
             
-            # Получаем все фразы из Google Sheets
-            sheets_phrases = self.get_phrases_from_sheets("english!A:E")
-            
-            logger.info(f"[DEBUG] Найдено {len(sheets_phrases)} фраз в Google Sheets")
-            logger.info(f"[DEBUG] Ищем фразу: '{phrase_data['english_text'][:50]}...'")
+            logger.debug("[DEBUG] Ищем фразу: '%.50s...'", phrase_data['english_text'])
             
             # Ищем соответствующую фразу в Google Sheets
-            target_row = None
-            for i, phrase in enumerate(sheets_phrases):
-                if phrase.get('english_text') == phrase_data['english_text']:
-                    target_row = i + 2  # +2 потому что Google Sheets начинается с 1, а мы с 0
-                    logger.info(f"[DEBUG] Найдена фраза в строке {target_row}")
-                    break
+            target_row = self._find_sheet_row(phrase_data['english_text'])
             
             if target_row is None:
-                logger.warning(f"[WARNING][update_phrase_progress_in_sheets] Фраза '{phrase_data['english_text']}' не найдена в Google Sheets")
-                # Выводим первые 3 фразы для отладки
-                logger.info(f"[DEBUG] Первые 3 фразы в Google Sheets:")
-                for i, p in enumerate(sheets_phrases[:3]):
-                    logger.info(f"[DEBUG] {i+1}: {p.get('english_text', 'N/A')[:50]}...")
+                logger.warning("[WARNING][update_phrase_progress_in_sheets] Фраза '%s' не найдена в Google Sheets", phrase_data['english_text'])
                 return
             
             # Обновляем прогресс в Google Sheets (столбец E, индекс 4)
             # Формируем диапазон для обновления (вкладка english, столбец E, строка target_row)
             range_name = f"english!E{target_row}"
             
-            logger.info(f"[DEBUG] Обновляем диапазон: {range_name} значением: {new_progress}")
-            logger.info(f"[DEBUG] Записываем на лист 'english', столбец E, строка {target_row}")
+            logger.debug("[DEBUG] Обновляем диапазон: %s значением: %s", range_name, new_progress)
+            logger.debug("[DEBUG] Записываем на лист 'english', столбец E, строка %s", target_row)
             
             # Обновляем значение
             update_result = self.service.spreadsheets().values().update(
@@ -415,154 +373,60 @@ class GoogleSheetsSync:
                 body={'values': [[new_progress]]}
             ).execute()
             
-            logger.info(f"[DEBUG] Результат обновления: {update_result}")
-            logger.info(f"[END_FUNCTION][update_phrase_progress_in_sheets] Google Sheets обновлен: лист 'english', строка {target_row}, столбец E, прогресс {new_progress}")
+            logger.debug("[DEBUG] Результат обновления: %s", update_result)
+            logger.info("[END_FUNCTION][update_phrase_progress_in_sheets] Google Sheets обновлен: лист 'english', строка %s, столбец E, прогресс %s", target_row, new_progress)
             
         except Exception as e:
-            logger.error(f"[ERROR][update_phrase_progress_in_sheets] Ошибка обновления Google Sheets: {e}")
+            logger.error("[ERROR][update_phrase_progress_in_sheets] Ошибка обновления Google Sheets: %s", e)
             raise e
     
-    def _get_phrase_by_id(self, phrase_id: int) -> Optional[Dict]:
+    def _find_sheet_row(self, english_text: str) -> Optional[int]:
         """
-        Получает данные фразы по ID из базы данных.
+        Находит номер строки фразы на листе english.
+        
+        Читается только столбец B (английский текст) одним списком
+        (majorDimension=COLUMNS), а не весь диапазон A:E с разбором строк
+        в словари: прогресс обновляется после каждого ответа пользователя.
         
         Args:
-            phrase_id: ID фразы
+            english_text: Английский текст фразы
             
         Returns:
-            Словарь с данными фразы или None
-        """
-        try:
-            # Используем тот же путь к БД что и в других методах
-            from config.config import DATABASE_PATH
-            db_path = DATABASE_PATH
-            
-            with sqlite3.connect(db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT id, english_text, russian_text, difficulty
-                    FROM phrases
-                    WHERE id = ?
-                """, (phrase_id,))
-                
-                result = cursor.fetchone()
-                
-                if result:
-                    return {
-                        'id': result[0],
-                        'english_text': result[1],
-                        'russian_text': result[2],
-                        'difficulty': result[3]
-                    }
-                return None
-                
-        except Exception as e:
-            logger.error(f"[ERROR][_get_phrase_by_id] Ошибка получения фразы {phrase_id}: {e}")
-            return None
-
-    def _update_phrase_progress_in_db(self, phrase_id: int, progress_score: float) -> None:
+            Номер строки (с 1, как в Google Sheets) или None
         """
-        Обновляет прогресс фразы в базе данных.
+        result = self.service.spreadsheets().values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range="english!B:B",
+            majorDimension='COLUMNS'
+        ).execute()
         
-        Args:
-            phrase_id: ID фразы
-            progress_score: Новый прогресс
-        """
-        try:
-            from config.config import DATABASE_PATH
-            db_path = DATABASE_PATH
-            
-            with sqlite3.connect(db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE phrases 
-                    SET total_progress_score = ?, is_learned = ?
-                    WHERE id = ?
-                """, (progress_score, progress_score >= 3.0, phrase_id))
-                conn.commit()
-                
-        except Exception as e:
-            logger.error(f"Ошибка обновления прогресса фразы {phrase_id}: {e}")
-            raise
+        columns = result.get('values', [])
+        column = columns[0] if columns else []
+        logger.debug("[DEBUG] Найдено %s строк в столбце B", len(column))
+        
+        # Первая строка - заголовок; тексты сравниваются без крайних пробелов,
+        # как их сохраняет get_phrases_from_sheets
+        for row_number, cell in enumerate(column[1:], start=2):
+            if cell.strip() == english_text:
+                logger.debug("[DEBUG] Найдена фраза в строке %s", row_number)
+                return row_number
+        return None
     
-    def _add_phrase_to_db(self, english_text: str, russian_text: str, difficulty: str, date_added: str = None) -> int:
+    def _get_phrase_by_id(self, phrase_id: int) -> Optional[Dict]:
         """
-        Добавляет новую фразу в базу данных.
+        Получает данные фразы по ID из базы данных.
         
         Args:
-            english_text: Английский текст
-            russian_text: Русский перевод
-            difficulty: Сложность
-            date_added: Дата добавления из Google Sheets (опционально)
+            phrase_id: ID фразы
             
         Returns:
-            ID добавленной фразы
+            Словарь с данными фразы или None
         """
         try:
-            from config.config import DATABASE_PATH
-            db_path = DATABASE_PATH
-            
-            with sqlite3.connect(db_path) as conn:
-                cursor = conn.cursor()
-                
-                if date_added:
-                    # Парсим дату из Google Sheets и добавляем с указанной датой
-                    try:
-                        # Пробуем разные форматы даты из Google Sheets
-                        from datetime import datetime
-                        if isinstance(date_added, str):
-                            # Пробуем разные форматы
-                            date_formats = [
-                                '%Y-%m-%d',
-                                '%d.%m.%Y',
-                                '%d/%m/%Y',
-                                '%Y-%m-%d %H:%M:%S',
-                                '%d.%m.%Y %H:%M:%S'
-                            ]
-                            parsed_date = None
-                            for fmt in date_formats:
-                                try:
-                                    parsed_date = datetime.strptime(date_added.strip(), fmt)
-                                    break
-                                except ValueError:
-                                    continue
-                            
-                            if parsed_date:
-                                cursor.execute("""
-                                    INSERT INTO phrases (english_text, russian_text, difficulty, total_progress_score, is_learned, date_added)
-                                    VALUES (?, ?, ?, 0.0, 0, ?)
-                                """, (english_text, russian_text, difficulty, parsed_date.strftime('%Y-%m-%d %H:%M:%S')))
-                            else:
-                                # Если не удалось распарсить, используем текущую дату
-                                cursor.execute("""
-                                    INSERT INTO phrases (english_text, russian_text, difficulty, total_progress_score, is_learned)
-                                    VALUES (?, ?, ?, 0.0, 0)
-                                """, (english_text, russian_text, difficulty))
-                        else:
-                            # Если не строка, используем текущую дату
-                            cursor.execute("""
-                                INSERT INTO phrases (english_text, russian_text, difficulty, total_progress_score, is_learned)
-                                VALUES (?, ?, ?, 0.0, 0)
-                            """, (english_text, russian_text, difficulty))
-                    except Exception as e:
-                        logger.warning(f"Не удалось распарсить дату '{date_added}', используем текущую дату: {e}")
-                        cursor.execute("""
-                            INSERT INTO phrases (english_text, russian_text, difficulty, total_progress_score, is_learned)
-                            VALUES (?, ?, ?, 0.0, 0)
-                        """, (english_text, russian_text, difficulty))
-                else:
-                    # Если дата не указана, используем текущую дату (по умолчанию)
-                    cursor.execute("""
-                        INSERT INTO phrases (english_text, russian_text, difficulty, total_progress_score, is_learned)
-                        VALUES (?, ?, ?, 0.0, 0)
-                    """, (english_text, russian_text, difficulty))
-                
-                conn.commit()
-                return cursor.lastrowid
-                
+            return self._get_database().get_phrase(phrase_id)
         except Exception as e:
-            logger.error(f"Ошибка добавления фразы: {e}")
-            raise
+            logger.error("[ERROR][_get_phrase_by_id] Ошибка получения фразы %s: %s", phrase_id, e)
+            return None
 
 
 def main():
@@ -600,4 +464,5 @@ def main():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     main()
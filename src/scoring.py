@@ -0,0 +1,87 @@
+"""
+Файл: scoring.py
+
+Назначение:
+    Единая шкала баллов AI-оценки ответов (0.0-1.0 с шагом 0.1)
+    и таблицы для нормализации произвольного score к этой шкале.
+
+Константы:
+    - SCORE_LEVELS: Допустимые значения балла и их текстовое описание
+    - SOFT_THRESHOLDS: Диапазоны исходного score для каждого уровня
+    - PERFECT_SCORE_THRESHOLD: Граница, выше которой score нормализуется к 1.0
+
+Функции:
+    - normalize_score: Приводит произвольный score к шкале SCORE_LEVELS
+"""
+
+import logging
+import math
+from types import MappingProxyType
+from typing import Final, Mapping, Tuple
+
+# region Константы системы баллов
+SCORE_LEVELS: Final[Mapping[float, str]] = MappingProxyType({
+    0.0: "неправильно",
+    0.1: "очень плохо",
+    0.2: "плохо", 
+    0.3: "почти неправильно",
+    0.4: "слабо",
+    0.5: "частично правильно",
+    0.6: "неплохо",
+    0.7: "почти правильно",
+    0.8: "хорошо",
+    0.9: "очень хорошо",
+    1.0: "правильно"
+})
+
+# Пороги для мягкой нормализации
+SOFT_THRESHOLDS: Final[Mapping[float, Tuple[float, float]]] = MappingProxyType({
+    0.0: (0.0, 0.1),     # 0.0-0.1 → 0.0
+    0.1: (0.11, 0.2),    # 0.11-0.2 → 0.1
+    0.2: (0.21, 0.3),    # 0.21-0.3 → 0.2
+    0.3: (0.31, 0.4),    # 0.31-0.4 → 0.3
+    0.4: (0.41, 0.5),    # 0.41-0.5 → 0.4
+    0.5: (0.51, 0.6),    # 0.51-0.6 → 0.5
+    0.6: (0.61, 0.7),    # 0.61-0.7 → 0.6
+    0.7: (0.71, 0.8),    # 0.71-0.8 → 0.7
+    0.8: (0.81, 0.9),    # 0.81-0.9 → 0.8
+    0.9: (0.91, 0.95),   # 0.91-0.95 → 0.9
+    1.0: (0.96, 1.0)     # 0.96-1.0 → 1.0
+})
+
+# Score выше этой границы сразу считается правильным ответом (1.0);
+# ниже нее уровень вычисляется как (ceil(score * 10) - 1) / 10
+PERFECT_SCORE_THRESHOLD: Final[float] = SOFT_THRESHOLDS[0.9][1]
+# endregion
+
+logger = logging.getLogger(__name__)
+
+
+# region FUNCTION normalize_score
+def normalize_score(score: float) -> float:
+    """
+    Нормализует score к ближайшему допустимому значению с мягкой системой.
+    
+    Args:
+        score: Исходный score (0.0-1.0)
+        
+    Returns:
+        Нормализованный score (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+    """
+    # NaN (score != score) и значения не выше нуля - неправильный ответ
+    if score != score or score <= 0.0:
+        return 0.0
+    if score > PERFECT_SCORE_THRESHOLD:
+        return 1.0
+    
+    # Проверяем, является ли score уже допустимым значением
+    if score in SCORE_LEVELS:
+        return score
+    
+    # Диапазоны SOFT_THRESHOLDS (0.1k, 0.1(k+1)] -> 0.1k без перебора таблицы
+    normalized_score = (math.ceil(score * 10) - 1) / 10
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[normalize_score] Score %s нормализован к %s", score, normalized_score)
+    return normalized_score
+# endregion FUNCTION normalize_score
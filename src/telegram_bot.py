@@ -59,7 +59,6 @@ from src.database import DatabaseManager
 from src.ai_analysis import AIAnalyzer
 from src.google_sync import GoogleSheetsSync
 from config.config import TELEGRAM_BOT_TOKEN, OPENAI_API_KEY, GOOGLE_SHEETS_CREDENTIALS_FILE, GOOGLE_SHEETS_SPREADSHEET_ID
-import sqlite3
 
 # Отладочная информация
 print(f"[DEBUG] GOOGLE_SHEETS_CREDENTIALS_FILE: {GOOGLE_SHEETS_CREDENTIALS_FILE}")
@@ -184,22 +183,10 @@ class EnglishLearningBot:
         """Загружает ожидаемые ответы из БД при старте бота."""
         self.logger.info("[START_FUNCTION][_load_expected_answers_from_db] Загрузка ожидаемых ответов из БД")
         try:
-            # Загружаем все ожидаемые ответы из БД
-            with sqlite3.connect(self.database.db_path, timeout=10) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT user_id, phrase_id, english_phrase, russian_translation, exercise_type FROM user_expected_answers")
-                rows = cursor.fetchall()
-                
-                for row in rows:
-                    user_id, phrase_id, english_phrase, russian_translation, exercise_type = row
-                    self.expected_answers[user_id] = {
-                        'phrase_id': phrase_id,
-                        'english_phrase': english_phrase,
-                        'russian_translation': russian_translation,
-                        'exercise_type': exercise_type
-                    }
-                
-                self.logger.info(f"[END_FUNCTION][_load_expected_answers_from_db] Загружено {len(self.expected_answers)} ожидаемых ответов")
+            # Загружаем все ожидаемые ответы из БД через общее соединение DatabaseManager
+            self.expected_answers.update(self.database.get_all_expected_answers())
+            
+            self.logger.info(f"[END_FUNCTION][_load_expected_answers_from_db] Загружено {len(self.expected_answers)} ожидаемых ответов")
         except Exception as e:
             self.logger.error(f"[ERROR][_load_expected_answers_from_db] Ошибка загрузки: {e}")
     # endregion FUNCTION _load_expected_answers_from_db
@@ -658,21 +645,35 @@ class EnglishLearningBot:
         russian_translation = expected_data['russian_translation']
         exercise_type = expected_data.get('exercise_type', 'translate_to_russian')
         
+        # Предварительное сообщение с оценкой: отправляется, как только оценка
+        # появится в потоковом ответе AI, и затем заменяется полным разбором
+        score_message = None
+        
+        async def show_score(score: float) -> None:
+            nonlocal score_message
+            score_message = await message.answer(
+                f"{self._get_score_emoji(score)} Оценка: {score:.1f}/1.0\n⏳ Готовлю подробный разбор..."
+            )
+        
         # Анализируем ответ через AI
         try:
             if exercise_type == 'translate_to_english':
                 # Обратное упражнение: русский -> английский
-                ai_score = self.ai_analyzer.analyze_reverse_answer(
+                ai_score = await self.ai_analyzer.aanalyze_reverse_answer(
                     russian_phrase=russian_translation,
                     english_translation=english_phrase,
-                    user_answer=user_answer
+                    user_answer=user_answer,
+                    rich=True,  # Бот показывает альтернативы, примеры и мини-диалог
+                    on_score=show_score
                 )
             else:
                 # Обычное упражнение: английский -> русский
-                ai_score = self.ai_analyzer.analyze_answer(
+                ai_score = await self.ai_analyzer.aanalyze_answer(
                     english_phrase=english_phrase,
                     russian_translation=russian_translation,
-                    user_answer=user_answer
+                    user_answer=user_answer,
+                    rich=True,
+                    on_score=show_score
                 )
             
             # Сохраняем ответ пользователя
@@ -756,7 +757,14 @@ class EnglishLearningBot:
             parts.append(f"\n🔁 Используйте {next_command} для получения новой {next_command_text}!")
             result_message = "\n\n".join(parts)
             
-            await message.answer(result_message, parse_mode='Markdown')
+            if score_message is not None:
+                try:
+                    await score_message.edit_text(result_message, parse_mode='Markdown')
+                except Exception as e:
+                    self.logger.warning(f"[WARNING][handle_answer] Не удалось обновить сообщение с оценкой: {e}")
+                    await message.answer(result_message, parse_mode='Markdown')
+            else:
+                await message.answer(result_message, parse_mode='Markdown')
             
             # Очищаем ожидаемый ответ (из кэша и БД)
             if user_id in self.expected_answers:
@@ -911,7 +919,8 @@ class EnglishLearningBot:
             # Создаем экземпляр синхронизации с учетными данными
             google_sync = GoogleSheetsSync(
                 credentials_path=GOOGLE_SHEETS_CREDENTIALS_FILE,
-                spreadsheet_id=GOOGLE_SHEETS_SPREADSHEET_ID
+                spreadsheet_id=GOOGLE_SHEETS_SPREADSHEET_ID,
+                database_manager=self.database
             )
             
             # Получаем текущий прогресс фразы из БД
@@ -1167,6 +1176,14 @@ class EnglishLearningBot:
                     for user_id in list(self.last_auto_send.keys()):
                         await self.auto_send_phrase(user_id)
                     
+                    # Удаляем старую историю ответов, возвращаем освободившееся место
+                    # и обновляем статистику планировщика запросов. Это долгие синхронные
+                    # операции SQLite - выполняем их в потоке, чтобы не останавливать
+                    # обработку сообщений в цикле событий
+                    await asyncio.to_thread(self.database.prune_history)
+                    await asyncio.to_thread(self.database.incremental_vacuum)
+                    await asyncio.to_thread(self.database.optimize)
+                    
                     # Ждем 1 час перед следующей проверкой
                     await asyncio.sleep(3600)  # 1 час
                     
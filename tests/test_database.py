@@ -0,0 +1,69 @@
+"""
+Тесты взвешенной выборки фраз DatabaseManager (get_weighted_random_phrase).
+"""
+
+import random
+from collections import Counter
+
+import pytest
+
+from src import database
+from src.database import DatabaseManager
+
+
+# Веса 1:1:3:3 - две старые фразы (вес 1) и две новые (вес new_phrase_priority = 3)
+WEIGHTS = [1.0, 1.0, 3.0, 3.0]
+DRAWS = 40000
+
+
+def _alias_probabilities(prob, alias):
+    """Итоговая вероятность каждого индекса при выборе по таблице псевдонимов."""
+    count = len(prob)
+    result = [0.0] * count
+    for index in range(count):
+        result[index] += prob[index] / count
+        result[alias[index]] += (1.0 - prob[index]) / count
+    return result
+
+
+@pytest.fixture
+def db(tmp_path):
+    """БД с четырьмя фразами: id 1, 2 добавлены давно, id 3, 4 - только что."""
+    manager = DatabaseManager(str(tmp_path / "test.db"))
+    manager.add_phrases([(f"phrase {i}", f"фраза {i}", "easy") for i in range(4)])
+    manager.connection.execute(
+        "UPDATE phrases SET date_added = unixepoch() - 300 * 86400 WHERE id IN (1, 2)"
+    )
+    yield manager
+    manager.close()
+
+
+@pytest.mark.parametrize("weights", [WEIGHTS, [1.0], [5.0, 1.0, 1.0, 1.0, 2.0, 0.5]])
+def test_build_alias_table_matches_weights(weights):
+    prob, alias = DatabaseManager._build_alias_table(weights)
+    total = sum(weights)
+    for actual, weight in zip(_alias_probabilities(prob, alias), weights):
+        assert actual == pytest.approx(weight / total)
+
+
+@pytest.mark.parametrize("bisect_max_phrases", [0, database.WEIGHTED_BISECT_MAX_PHRASES])
+def test_weighted_pick_distribution(db, monkeypatch, bisect_max_phrases):
+    # 0 - таблица псевдонимов с выбором по одному случайному числу, иначе - bisect
+    monkeypatch.setattr(database, "WEIGHTED_BISECT_MAX_PHRASES", bisect_max_phrases)
+    random.seed(12345)
+
+    counts = Counter(db.get_weighted_random_phrase(1)[0] for _ in range(DRAWS))
+
+    total = sum(WEIGHTS)
+    for phrase_id, weight in zip((1, 2, 3, 4), WEIGHTS):
+        assert counts[phrase_id] / DRAWS == pytest.approx(weight / total, abs=0.01)
+
+
+def test_weighted_pick_skips_learned_phrases(db):
+    for phrase_id in (1, 3, 4):
+        db.update_progress(1, phrase_id, database.MAX_SCORE, "ответ")
+
+    assert {db.get_weighted_random_phrase(1)[0] for _ in range(50)} == {2}
+
+    db.update_progress(1, 2, database.MAX_SCORE, "ответ")
+    assert db.get_weighted_random_phrase(1) is None